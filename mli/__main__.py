@@ -18,12 +18,20 @@
 
 import sys
 from os import path
-from PyQt6.QtWidgets import QApplication
 
-from mli.gui.main_window import MainWindow
+from mli.lib.log import StartupProfiler
 
 if __name__ == "__main__":
+    # With the flag --profile-startup, time of every phase of the start is
+    # printed.
+    oProfiler = StartupProfiler('--profile-startup' in sys.argv)
+    from PyQt6.QtWidgets import QApplication
+    oProfiler.mark('import PyQt6')
+    from mli.gui.main_window import MainWindow
+    oProfiler.mark('import main window')
+
     path = path.dirname(path.realpath(__file__))
     app = QApplication(sys.argv)
-    sheet = MainWindow(path)
+    oProfiler.mark('create application')
+    sheet = MainWindow(path, oProfiler)
     sys.exit(app.exec())
@@ -206,6 +206,21 @@ class VComboBox(QVBoxLayout):
         oComboBox = self.itemAt(1).widget()
         oComboBox.addItems(lItems)
 
+    def set_combo_model(self, oModel):
+        """ Set up a model of QComboBox instead of a list. The model can be
+        shared by several widgets, so QComboBox doesn't add typed text to it.
+
+        :param oModel: A model of elements for QComboBox.
+        :type oModel: QAbstractItemModel
+        """
+        oComboBox = self.itemAt(1).widget()
+        if oComboBox.model() is oModel:
+            return
+
+        oComboBox.setInsertPolicy(QComboBox.InsertPolicy.NoInsert)
+        oComboBox.view().setUniformItemSizes(True)
+        oComboBox.setModel(oModel)
+
     def set_combo_width(self, iSize=300):
         """ Set up width of QComboBox.
 
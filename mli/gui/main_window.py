@@ -17,31 +17,32 @@
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 from gettext import gettext as _
+from PyQt6.QtCore import QTimer, Qt
 from PyQt6.QtGui import QAction, QIcon
-from PyQt6.QtWidgets import QApplication, QComboBox, QCompleter, \
-    QInputDialog, QMainWindow, QTextBrowser
-
-from mli.gui.color_dialogs import NewColor, EditColor
-from mli.gui.file_dialogs import OpenFileDialog
-from mli.gui.substract_dialogs import EditSubstrateDialog, NewSubstrateDialog
-from mli.gui.help_dialog import About
-from mli.gui.setting_dialog import SettingDialog
+from PyQt6.QtWidgets import QApplication, QCompleter, QHeaderView, \
+    QInputDialog, QLineEdit, QMainWindow, QTextBrowser, QTreeView
+
+# Modules of dialogs are imported by the methods which open them, so they
+# aren't loaded at the start of the program.
 from mli.gui.tab_widget import CentralTabWidget
-from mli.gui.table_widget import TableWidget
-from mli.gui.taxon_dialogs import EditTaxonDialog, EditSynonymDialog,\
-    NewTaxonDialog
+from mli.gui.table_widget import TableModel, TableWidget
 from mli.gui.taxon_info import TaxonBrowser
+from mli.gui.taxon_models import NAME_ROLE, TaxonSearchModel, \
+    TaxonTreeModel
 
 from mli.lib.config import ConfigProgram
-from mli.lib.sql import SQL, check_connect_db
+from mli.lib.log import StartupProfiler
+from mli.lib.page_cache import PageCache
+from mli.lib.sql import SQL, check_connect_db, get_db_profile
 from mli.lib.str import str_get_file_patch, str_get_path
 
 
 class MainWindow(QMainWindow):
-    def __init__(self, sPath):
+    def __init__(self, sPath, oProfiler=None):
         super().__init__()
 
         self.sPathApp = sPath
+        self.oProfiler = oProfiler or StartupProfiler()
         oConfigProgram = ConfigProgram(self.sPathApp)
         sBasePath = oConfigProgram.sDir
         sDBPath = oConfigProgram.get_config_value('DB', 'db_path')
@@ -51,17 +52,20 @@ class MainWindow(QMainWindow):
             sDBPath = str_get_file_patch(sBasePath, sDBDir)
             sDBPath = str_get_file_patch(sDBPath, sDBFile)
 
-        self.oConnector = SQL(sDBPath)
-        check_connect_db(self.oConnector, sBasePath, sDBDir)
+        self.oConnector = SQL(sDBPath, get_db_profile(oConfigProgram))
+        self.sBasePath, self.sDBDir = sBasePath, sDBDir
+        self.oPageCache = PageCache(
+            self.oConnector,
+            oConfigProgram.getint('DB', 'page_cache_size', fallback=128),
+            oConfigProgram.getboolean('DB', 'page_cache_persist',
+                                      fallback=False))
 
         self.setWindowTitle(_('Manual Lichen identification'))
         self.oCentralWidget = CentralTabWidget(self)
 
-        dKeyTable = {_('Name'): [''],
-                     _('Life form'): [''],
-                     _('Thallus color'): ['']}
-        oTableWidget = TableWidget(dKeyTable,
-                                   len(dKeyTable['Name']), len(dKeyTable))
+        lHeaders = [_('Life form'), _('Name'), _('Thallus color')]
+        oTableWidget = TableWidget(TableModel(lHeaders, [('', '', '')],
+                                              bEditable=True))
 
         self.oCentralWidget.add_tab(oTableWidget, _('Simple indications'))
         self.create_actions()
@@ -69,8 +73,11 @@ class MainWindow(QMainWindow):
         self.set_menu_bar()
         self.setCentralWidget(self.oCentralWidget)
         self.onSetStatusBarMessage()
+        self.oProfiler.mark('create main window')
 
         self.showMaximized()
+        # The database is checked when the window is already shown.
+        QTimer.singleShot(0, self.onStartDB)
 
     def create_actions(self):
         """ Method collect all actions which can do from GUI of program. """
@@ -101,6 +108,7 @@ class MainWindow(QMainWindow):
 
         # Tools
         self.oTaxonInfo = QAction(_('Information on Taxon...'))
+        self.oRebuildTree = QAction(_('Rebuild taxon tree'))
 
         # Help
         self.oOpenHelp = QAction(_('&Help'), self)
@@ -146,6 +154,7 @@ class MainWindow(QMainWindow):
         # Create Tool menu
         oTools = oMenuBar.addMenu(_('&Tools'))
         oTools.addAction(self.oTaxonInfo)
+        oTools.addAction(self.oRebuildTree)
 
         # Create Help menu
         oHelpMenu = oMenuBar.addMenu(_('&Help'))
@@ -173,20 +182,38 @@ class MainWindow(QMainWindow):
 
         # Tool menu
         self.oTaxonInfo.triggered.connect(self.onTaxonInfo)
+        self.oRebuildTree.triggered.connect(self.onRebuildTree)
 
         # Menu Help
         self.oAbout.triggered.connect(self.onDisplayAbout)
 
     def get_page_taxon_info(self, sTaxonName):
-        return TaxonBrowser(self.oConnector, sTaxonName)
-
-    def get_taxon_list(self):
-        tTaxonList = self.oConnector.get_full_taxon_list()
-
-        return [tRow[0] for tRow in tTaxonList]
+        return TaxonBrowser(self.oConnector, sTaxonName, self.oPageCache)
+
+    def get_taxon_tree(self):
+        """ Creates the tree of taxa, which opens the page of the taxon by
+        double click. """
+        oTreeView = QTreeView(self)
+        oTreeView.setUniformRowHeights(True)
+        oTreeView.setModel(TaxonTreeModel(self.oConnector, oTreeView))
+        oTreeView.header().setSectionResizeMode(
+            0, QHeaderView.ResizeMode.Stretch)
+        oTreeView.header().setStretchLastSection(False)
+        oTreeView.doubleClicked.connect(self.onTaxonTreeDoubleClicked)
+
+        return oTreeView
+
+    def open_taxon_page(self, sTaxonName):
+        oTaxonInfo = self.get_page_taxon_info(sTaxonName)
+        self.oCentralWidget.add_tab(oTaxonInfo, sTaxonName)
+        dStats = self.oPageCache.get_stats()
+        self.onSetStatusBarMessage(
+            _('Page cache: {} hits, {} misses ({:.0%} hits).').format(
+                dStats['hits'], dStats['misses'], dStats['hit_rate']))
 
     def onDisplayAbout(self):
         """ Method open dialog window with information about the program. """
+        from mli.gui.help_dialog import About
         oAbout = About(self)
         oAbout.exec()
 
@@ -194,10 +221,12 @@ class MainWindow(QMainWindow):
         pass
 
     def onOpenSetting(self):
+        from mli.gui.setting_dialog import SettingDialog
         oSettingDialog = SettingDialog(self.oConnector, self.sPathApp, self)
         oSettingDialog.exec()
 
     def onEditColor(self):
+        from mli.gui.color_dialogs import EditColor
         oEditColor = EditColor(self.oConnector, self)
         oEditColor.exec()
 
@@ -205,18 +234,22 @@ class MainWindow(QMainWindow):
         pass
 
     def onEditSubstrate(self):
+        from mli.gui.substract_dialogs import EditSubstrateDialog
         oEditSubstrate = EditSubstrateDialog(self.oConnector, self)
         oEditSubstrate.exec()
 
     def onEditSynonym(self):
+        from mli.gui.taxon_dialogs import EditSynonymDialog
         oEditSynonym = EditSynonymDialog(self.oConnector, self)
         oEditSynonym.exec()
 
     def onEditTaxon(self):
+        from mli.gui.taxon_dialogs import EditTaxonDialog
         oEditTaxonDialog = EditTaxonDialog(self.oConnector, self)
         oEditTaxonDialog.exec()
 
     def onNewColor(self):
+        from mli.gui.color_dialogs import NewColor
         oNewColor = NewColor(self.oConnector, self)
         oNewColor.exec()
 
@@ -224,30 +257,66 @@ class MainWindow(QMainWindow):
         pass
 
     def onNewSubstrate(self):
+        from mli.gui.substract_dialogs import NewSubstrateDialog
         oNewSubstrate = NewSubstrateDialog(self.oConnector, self)
         oNewSubstrate.exec()
 
     def onNewTaxon(self):
+        from mli.gui.taxon_dialogs import NewTaxonDialog
         oNewTaxonDialog = NewTaxonDialog(self.oConnector, self)
         oNewTaxonDialog.exec()
 
+    def onRebuildTree(self):
+        """ Fills the closure of the taxon tree again. """
+        if self.oConnector.rebuild_closure():
+            self.onSetStatusBarMessage(_('The taxon tree is rebuilt.'))
+        else:
+            self.onSetStatusBarMessage(_('The taxon tree is not rebuilt.'))
+
     def onSetStatusBarMessage(self, sMassage='Ready'):
         """ Method create Status Bar on main window of program GUI. """
         self.statusBar().showMessage(sMassage)
 
+    def onStartDB(self):
+        """ Checks the database and brings its schema up-to-date after the
+        first paint of the window, then opens tabs which need the database.
+        """
+        QApplication.processEvents()
+        self.oProfiler.mark('show main window')
+        fTime = check_connect_db(self.oConnector, self.sBasePath, self.sDBDir)
+        self.oProfiler.mark('check database')
+        if fTime:
+            self.onSetStatusBarMessage(
+                _('The database is created in {:.2f} s.').format(fTime))
+        elif fTime is False:
+            self.onSetStatusBarMessage(_('The database is not created.'))
+        self.oCentralWidget.add_tab(self.get_taxon_tree(), _('Taxonomy'))
+        self.oCentralWidget.setCurrentIndex(0)
+        self.oProfiler.mark('load taxonomy tree')
+        self.oProfiler.report()
+
     def onTaxonInfo(self):
-        lTaxonList = self.get_taxon_list()
         oInputDialog = QInputDialog(self)
         oInputDialog.setWindowTitle('Taxon choosing')
         oInputDialog.setLabelText(_('Taxon list:'))
-        oInputDialog.setComboBoxItems(lTaxonList)
-        oInputDialog.setComboBoxEditable(True)
-        oComboBox = oInputDialog.findChild(QComboBox)
-        if oComboBox is not None:
-            oCompleter = QCompleter(lTaxonList, oComboBox)
-            oComboBox.setCompleter(oCompleter)
+        oInputDialog.setInputMode(QInputDialog.InputMode.TextInput)
+        oLineEdit = oInputDialog.findChild(QLineEdit)
+        if oLineEdit is not None:
+            # Names of accepted taxa and synonyms are searched by the index
+            # of the database while the user types.
+            oModel = TaxonSearchModel(self.oConnector, oParent=oLineEdit)
+            oCompleter = QCompleter(oModel, oLineEdit)
+            oCompleter.setCompletionRole(NAME_ROLE)
+            oCompleter.setCompletionMode(
+                QCompleter.CompletionMode.UnfilteredPopupCompletion)
+            oLineEdit.setCompleter(oCompleter)
+            oLineEdit.textEdited.connect(oModel.search)
         ok = oInputDialog.exec()
         if ok:
-            sTaxonName = oInputDialog.textValue()
-            oTaxonInfo = self.get_page_taxon_info(sTaxonName)
-            self.oCentralWidget.add_tab(oTaxonInfo, sTaxonName)
+            self.open_taxon_page(oInputDialog.textValue())
+
+    def onTaxonTreeDoubleClicked(self, oIndex):
+        iTaxonID = oIndex.model().get_taxon_id(oIndex)
+        tNames = self.oConnector.get_taxonomy().get_names(iTaxonID)
+        if tNames:
+            self.open_taxon_page(tNames[0])
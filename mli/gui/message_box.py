@@ -20,8 +20,11 @@
 actions.
 
 *Function*:
+    | warning_main_taxon(sName, sMainName)
     | warning_no_synonyms(sName)
+    | warning_not_saved(sName)
     | warning_lat_name()
+    | warning_name_not_parsed(sName)
     | warning_restart_app()
     | warning_this_exist(sThis, sThisName)
 
@@ -39,6 +42,22 @@ from gettext import gettext as _
 from PyQt6.QtWidgets import QMessageBox
 
 
+def warning_main_taxon(sName, sMainName):
+    """ Create a message dialog window with warning that the taxon can't be
+    moved under the main taxon, because the main taxon is under it.
+
+    :param sName: The name of the taxon which is moved.
+    :type sName: str
+    :param sMainName: The name of the chosen main taxon.
+    :type sMainName: str
+    """
+    oMsgBox = QMessageBox()
+    oMsgBox.setWindowTitle(_('Wrong main taxon!'))
+    sString = _('is under the taxon')
+    oMsgBox.setText(f'{sMainName} {sString} {sName}.')
+    oMsgBox.exec()
+
+
 def warning_no_synonyms(sName):
     oMsgBox = QMessageBox()
     oMsgBox.setWindowTitle(_('There are no synonyms!'))
@@ -47,6 +66,20 @@ def warning_no_synonyms(sName):
     oMsgBox.exec()
 
 
+def warning_not_saved(sName):
+    """ Create a message dialog window with warning that changes of the
+    taxon weren't saved, and the database has the previous values.
+
+    :param sName: The name of the taxon which is edited.
+    :type sName: str
+    """
+    oMsgBox = QMessageBox()
+    oMsgBox.setWindowTitle(_('Changes are not saved!'))
+    sString = _('Changes were rolled back for the taxon')
+    oMsgBox.setText(f'{sString} {sName}.')
+    oMsgBox.exec()
+
+
 def warning_lat_name():
     """ Create a message dialog window with warning that a Latin name of taxon
     isn't specified.
@@ -57,6 +90,22 @@ def warning_lat_name():
     oMsgBox.exec()
 
 
+def warning_name_not_parsed(sName):
+    """ Create a message dialog window with warning that the name of the
+    taxon can't be split into the canonical name and the authorship, so it
+    isn't saved.
+
+    :param sName: The name of the taxon from the form.
+    :type sName: str
+    """
+    oMsgBox = QMessageBox()
+    oMsgBox.setWindowTitle(_('The name is not recognized!'))
+    sString = _('The name can not be split into the name and the author')
+    sHint = _('Write the name without notes, and the author in its field.')
+    oMsgBox.setText(f'{sString}: {sName}. {sHint}')
+    oMsgBox.exec()
+
+
 def warning_restart_app():
     """ Create a message dialog window with warning that app should be
     restarted.
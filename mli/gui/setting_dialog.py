@@ -22,7 +22,7 @@ from mli.gui.dialog_elements import ADialogApplyButtons
 from mli.gui.file_dialogs import OpenFileDialog
 from mli.gui.message_box import warning_restart_app
 from mli.lib.config import ConfigProgram
-from mli.lib.sql import SQL, check_connect_db
+from mli.lib.sql import SQL, check_connect_db, get_db_profile
 
 
 class SettingDialog(ADialogApplyButtons):
@@ -65,7 +65,7 @@ class SettingDialog(ADialogApplyButtons):
     def onClickApply(self):
         sDBPath = self.oTextFiled.text()
         self.oConfigProgram.set_config_value('DB', 'db_path', sDBPath)
-        self.oConnector = SQL(sDBPath)
+        self.oConnector = SQL(sDBPath, get_db_profile(self.oConfigProgram))
 
         sBasePath = self.oConfigProgram.sDir
         sDBDir = self.oConfigProgram.get_config_value('DB', 'db_dir')
@@ -18,6 +18,8 @@
 
 from PyQt6.QtWidgets import QWidget, QTabWidget, QVBoxLayout
 
+from mli.gui.taxon_info import TaxonBrowser
+
 
 class CentralTabWidget(QTabWidget):
     def __init__(self, oParent):
@@ -54,6 +56,10 @@ class CentralTabWidget(QTabWidget):
     def onCloseTab(self, index):
         if self.count() < 2:
             return
+
+        # Pages which are still built aren't needed anymore.
+        for oBrowser in self.widget(index).findChildren(TaxonBrowser):
+            oBrowser.cancel()
         self.removeTab(index)
 
     def update_tab_name(self, iTabIndex=0, sTabName='Table 1'):
@@ -16,25 +16,258 @@
 #     You should have received a copy of the GNU General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from PyQt6.QtWidgets import QTableWidget, QTableWidgetItem
-
-
-class TableWidget(QTableWidget):
-    def __init__(self, data, *args):
-        QTableWidget.__init__(self, *args)
-        self.data = data
-        self.setData()
-        self.resizeColumnsToContents()
-        self.resizeRowsToContents()
-
-    def setData(self):
-        horHeaders = []
-        for n, key in enumerate(sorted(self.data.keys())):
-            horHeaders.append(key)
-            for m, item in enumerate(self.data[key]):
-                newitem = QTableWidgetItem(item)
-                self.setItem(m, n, newitem)
-        self.setHorizontalHeaderLabels(horHeaders)
+from collections import OrderedDict
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt6.QtWidgets import QHeaderView, QTableView
+
+# The number of rows which are taken from the source at once.
+FETCH_ROWS = 256
+# The number of batches which the model keeps in memory.
+WINDOW_BATCHES = 8
+# The number of rows which the width of columns is measured by.
+SAMPLE_ROWS = 100
+
+
+def get_sql_model(oConnector, sSQL, sKey, tValues=None, iBatch=FETCH_ROWS):
+    """ Creates the model of the table which reads rows of the query lazily.
+    Headers of the table are names of columns of the query. Rows are ordered
+    by the key, and every batch is read by its own query from the key of the
+    last row of the previous batch through SQL.read_rows, so no cursor stays
+    open, and the batch at the end of the table is read as fast as the first
+    one.
+
+    :param oConnector: Instance attribute of SQL.
+    :type oConnector: SQL
+    :param sSQL: SQL query.
+    :type sSQL: str
+    :param sKey: The column of the query with unique values, which aren't
+        NULL, for example, taxonID.
+    :type sKey: str
+    :param tValues: Values of parameters of the query.
+    :type tValues: tuple or None
+    :param iBatch: The number of rows which are read at once.
+    :type iBatch: int
+    :return: The model, or None if the query has failed.
+    :rtype: TableModel or None
+    """
+    sSQL = f'SELECT * FROM ({sSQL.strip().rstrip(";")})'
+    tValues = tuple(tValues or ())
+    oCursor = oConnector.execute_query(f'{sSQL} LIMIT 0;', tValues)
+    if not oCursor:
+        return None
+
+    lHeaders = [tColumn[0] for tColumn in oCursor.description]
+    if sKey not in lHeaders:
+        return None
+
+    iKey = lHeaders.index(sKey)
+    sFirst = f'{sSQL} ORDER BY "{sKey}" LIMIT ?;'
+    sNext = f'{sSQL} WHERE "{sKey}" > ? ORDER BY "{sKey}" LIMIT ?;'
+
+    def fetch_rows(After, iLimit):
+        if After is None:
+            lRows = oConnector.read_rows(sFirst, tValues + (iLimit,))
+        else:
+            lRows = oConnector.read_rows(sNext, tValues + (After, iLimit,))
+        lRows = lRows or []
+        return lRows, lRows[-1][iKey] if lRows else After
+
+    return TableModel(lHeaders, fetch_rows, iBatch)
+
+
+class TableModel(QAbstractTableModel):
+    """ The model of the table which takes rows from the source by batches,
+    when the view scrolls to them. Rows aren't turned into items, so a large
+    table is shown without delay. Only the last used WINDOW_BATCHES batches
+    are kept in memory, and other batches are read again, when the view
+    comes back to them. Values, which the user typed in an editable table,
+    are kept apart from batches, so they aren't lost with them.
+    """
+
+    def __init__(self, lHeaders, Rows, iBatch=FETCH_ROWS,
+                 iWindow=WINDOW_BATCHES, bEditable=False, oParent=None):
+        """ Initiating a class.
+
+        :param lHeaders: Headers of columns.
+        :type lHeaders: list[str]
+        :param Rows: The function, which takes the key, after which the batch
+            starts (None for the first batch), and the number of rows, and
+            gives rows of the batch and the key, after which the next batch
+            starts. Or rows of the table, every row is a tuple of values.
+        :type Rows: Callable[[object, int], tuple[list[tuple], object]] or
+            Iterable[tuple]
+        :param iBatch: The number of rows which are taken at once.
+        :type iBatch: int
+        :param iWindow: The number of batches which are kept in memory.
+        :type iWindow: int
+        :param bEditable: Whether the user can change values of cells.
+        :type bEditable: bool
+        """
+        super(TableModel, self).__init__(oParent)
+        self.lHeaders = list(lHeaders)
+        if callable(Rows):
+            self.fFetch = Rows
+        else:
+            lRows = list(Rows)
+
+            def fetch_rows(After, iLimit):
+                iStart = After or 0
+                return lRows[iStart:iStart + iLimit], iStart + iLimit
+
+            self.fFetch = fetch_rows
+        self.iBatch = max(1, iBatch)
+        self.iWindow = max(1, iWindow)
+        self.bEditable = bEditable
+        self.dBatches = OrderedDict()
+        # Keys, after which batches start, the batch has the same index.
+        self.lAfter = [None]
+        self.dEdits = {}
+        self.iRows = 0
+        self.bFetched = False
+
+    def get_batch(self, iBatch):
+        """ Gives rows of the batch, reading it from the source, if it isn't
+        in memory. The batch, which was used the longest time ago, is
+        dropped.
+
+        :param iBatch: The number of the batch, batches are read in order
+            for the first time.
+        :type iBatch: int
+        :return: Rows of the batch.
+        :rtype: list[tuple]
+        """
+        if iBatch in self.dBatches:
+            self.dBatches.move_to_end(iBatch)
+            return self.dBatches[iBatch]
+
+        lRows, Next = self.fFetch(self.lAfter[iBatch], self.iBatch)
+        lRows = list(lRows)
+        if iBatch + 1 == len(self.lAfter):
+            self.lAfter.append(Next)
+        self.dBatches[iBatch] = lRows
+        if len(self.dBatches) > self.iWindow:
+            self.dBatches.popitem(last=False)
+
+        return lRows
+
+    def rowCount(self, oParent=QModelIndex()):
+        if oParent.isValid():
+            return 0
+        return self.iRows
+
+    def columnCount(self, oParent=QModelIndex()):
+        if oParent.isValid():
+            return 0
+        return len(self.lHeaders)
+
+    def data(self, oIndex, iRole=Qt.ItemDataRole.DisplayRole):
+        if not oIndex.isValid() or iRole not in (Qt.ItemDataRole.DisplayRole,
+                                                 Qt.ItemDataRole.EditRole):
+            return None
+
+        tCell = (oIndex.row(), oIndex.column())
+        if tCell in self.dEdits:
+            return self.dEdits[tCell]
+
+        iBatch, iRow = divmod(oIndex.row(), self.iBatch)
+        lRows = self.get_batch(iBatch)
+        # The source can become shorter, while the table is shown.
+        if iRow >= len(lRows):
+            return None
+
+        oValue = lRows[iRow][oIndex.column()]
+        return None if oValue is None else str(oValue)
+
+    def flags(self, oIndex):
+        iFlags = super(TableModel, self).flags(oIndex)
+        if self.bEditable and oIndex.isValid():
+            iFlags |= Qt.ItemFlag.ItemIsEditable
+        return iFlags
+
+    def setData(self, oIndex, Value, iRole=Qt.ItemDataRole.EditRole):
+        if not self.bEditable or not oIndex.isValid() or \
+                iRole != Qt.ItemDataRole.EditRole:
+            return False
+
+        self.dEdits[(oIndex.row(), oIndex.column())] = \
+            None if Value is None else str(Value)
+        self.dataChanged.emit(oIndex, oIndex, [Qt.ItemDataRole.DisplayRole,
+                                               Qt.ItemDataRole.EditRole])
+        return True
+
+    def headerData(self, iSection, oOrientation,
+                   iRole=Qt.ItemDataRole.DisplayRole):
+        if iRole != Qt.ItemDataRole.DisplayRole:
+            return None
+        if oOrientation == Qt.Orientation.Horizontal:
+            return self.lHeaders[iSection]
+        return str(iSection + 1)
+
+    def canFetchMore(self, oParent=QModelIndex()):
+        return not oParent.isValid() and not self.bFetched
+
+    def fetchMore(self, oParent=QModelIndex()):
+        """ Takes the next batch of rows from the source. """
+        if oParent.isValid():
+            return
+
+        lRows = self.get_batch(self.iRows // self.iBatch)
+        if len(lRows) < self.iBatch:
+            self.bFetched = True
+        if not lRows:
+            return
+
+        iFirst = self.iRows
+        self.beginInsertRows(QModelIndex(), iFirst, iFirst + len(lRows) - 1)
+        self.iRows = iFirst + len(lRows)
+        self.endInsertRows()
+
+    def get_sample(self, iColumn, iRows=SAMPLE_ROWS):
+        """ Gives values of the column in the first rows.
+
+        :param iColumn: The number of the column.
+        :type iColumn: int
+        :param iRows: The number of rows.
+        :type iRows: int
+        :return: Values of the column as strings.
+        :rtype: list[str]
+        """
+        if not self.iRows:
+            return []
+
+        return [str(tRow[iColumn]) for tRow in self.get_batch(0)[:iRows]
+                if tRow[iColumn] is not None]
+
+
+class TableWidget(QTableView):
+    """ The view of TableModel. All rows have the same height, and the width
+    of columns is measured by the first rows only, so the view doesn't go
+    through the whole table. """
+
+    def __init__(self, oModel, oParent=None):
+        super(TableWidget, self).__init__(oParent)
+        self.setModel(oModel)
+        oVerticalHeader = self.verticalHeader()
+        oVerticalHeader.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        oVerticalHeader.setDefaultSectionSize(
+            self.fontMetrics().height() + 6)
+        self.resize_columns()
+
+    def resize_columns(self):
+        """ Sets the width of columns by headers and the first rows. """
+        oModel = self.model()
+        if oModel.canFetchMore():
+            oModel.fetchMore()
+
+        oMetrics = self.fontMetrics()
+        for iColumn in range(oModel.columnCount()):
+            lValues = oModel.get_sample(iColumn)
+            lValues.append(str(oModel.headerData(
+                iColumn, Qt.Orientation.Horizontal)))
+            iWidth = max(oMetrics.horizontalAdvance(sValue)
+                         for sValue in lValues)
+            self.setColumnWidth(iColumn, iWidth + 16)
 
 
 if __name__ == '__main__':
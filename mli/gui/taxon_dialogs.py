@@ -20,8 +20,11 @@ from gettext import gettext as _
 from PyQt6.QtWidgets import QHBoxLayout, QVBoxLayout
 
 from mli.gui.dialog_elements import ADialogApplyButtons, VComboBox, VLineEdit
-from mli.gui.message_box import warning_no_synonyms, warning_lat_name,\
+from mli.gui.message_box import warning_main_taxon, warning_no_synonyms,\
+    warning_lat_name, warning_name_not_parsed, warning_not_saved, \
     warning_this_exist
+from mli.gui.taxon_models import get_taxon_list_model
+from mli.lib.name_parser import get_authorship, parse_name
 from mli.lib.str import str_sep_name_taxon
 
 
@@ -84,14 +87,14 @@ class ATaxonDialog(ADialogApplyButtons):
 
     def clean_field(self):
         """ Clears all fields after use. """
-        self.oComboMainTaxon.clear_list()
+        self.oComboMainTaxon.set_text('')
         self.oComboTaxRank.clear_list()
         self.oComboStatus.clear_list()
         self.oLineEditLatName.set_text('')
         self.oLineEditAuthor.set_text('')
         self.oLineEditYear.set_text('')
         self.oLineEditLocaleName.set_text('')
-        self.oComboTaxNames.clear_list()
+        self.oComboTaxNames.set_text('')
 
     def create_level_list(self, sTaxon='', bGetAll=None):
         """ Generates a list of taxon levels depending on a condition. At the
@@ -132,16 +135,6 @@ class ATaxonDialog(ADialogApplyButtons):
 
         return lList
 
-    def create_taxon_list(self):
-        """ Creates a list of taxon names for further use in dialog elements.
-
-        :return: A list in form - (Taxon Rank) Taxon Name
-        :type: list[str]
-        """
-        tRows = self.oConnector.get_taxon_list('accepted')
-
-        return [f'({tRow[1]}) {tRow[2]}' for tRow in tRows]
-
     def fill_combobox(self):
         """ Fills the fields with the drop-down list during the first
         initialization and after applying the Apply button."""
@@ -151,8 +144,11 @@ class ATaxonDialog(ADialogApplyButtons):
         lTaxonRank = self.create_level_list(bGetAll=True)
         self.oComboTaxRank.set_combo_list(lTaxonRank)
         self.oComboTaxRank.set_text(lTaxonRank[0])
-        self.oComboMainTaxon.set_combo_list(self.create_taxon_list())
-        self.oComboTaxNames.set_combo_list(self.create_taxon_list())
+        # The list of taxa is shared by all dialogs and follows changes of
+        # the database itself, so it isn't filled again.
+        oTaxonList = get_taxon_list_model(self.oConnector)
+        self.oComboMainTaxon.set_combo_model(oTaxonList)
+        self.oComboTaxNames.set_combo_model(oTaxonList)
 
     def fill_form(self, sSciName):
         if not sSciName:
@@ -205,27 +201,33 @@ class ATaxonDialog(ADialogApplyButtons):
             warning_lat_name()
             return
 
-        if self.sOldTaxonName != sLatName:
-            self.save_('taxon_name', sLatName, self.iOldTaxonID)
+        # The canonical name and the authorship are taken from the changed
+        # name, so the name, which can't be split, isn't saved.
+        if sLatName != self.sOldTaxonName and not parse_name(sLatName):
+            warning_name_not_parsed(sLatName)
+            return
 
+        iMainTaxonID = None
         sMainSciName = str_sep_name_taxon(sMainTaxon)
         if sMainSciName != self.sOldMainTaxonName:
             iMainTaxonID = self.oConnector.get_taxon_id(sMainSciName)
-            self.save_('mainTaxonID', iMainTaxonID, self.iOldTaxonID)
-
-        if sTaxonRank != self.sOldTaxonRankName:
-            iRankID = self.oConnector.get_rank_id('rankLocalName', sTaxonRank)
-            self.save_('rankID', iRankID, self.iOldTaxonID)
-
-        if sAuthor and sAuthor != self.sOldAuthor:
-            self.save_('authorship', sAuthor, self.iOldTaxonID)
+            # A taxon can't be moved into its own subtree.
+            if iMainTaxonID == self.iOldTaxonID or \
+                    self.oConnector.is_descendant(iMainTaxonID,
+                                                  self.iOldTaxonID):
+                warning_main_taxon(self.sOldTaxonName, sMainSciName)
+                return
 
-        if sYear and sYear != self.sOldYear:
-            self.save_('yearPublishing', sYear, self.iOldTaxonID)
+        # All changes of the taxon are saved or discarded together.
+        with self.oConnector.transaction():
+            bSaved = self.save_taxon(sLatName, sAuthor, sYear, iMainTaxonID,
+                                     sTaxonRank, sStatus)
+            if not bSaved:
+                self.oConnector.fail_transaction()
 
-        if sStatus != self.sOldStatus:
-            iStatusID = self.oConnector.get_status_id(sStatus)
-            self.save_('statusID', iStatusID, self.iOldTaxonID)
+        if not bSaved:
+            warning_not_saved(self.sOldTaxonName)
+            return
 
         self.clean_field()
         self.fill_combobox()
@@ -244,11 +246,85 @@ class ATaxonDialog(ADialogApplyButtons):
             self.oComboTaxRank.set_combo_list(lTaxonRank)
             self.oComboTaxRank.set_text(lTaxonRank[0])
 
+    def save_taxon(self, sLatName, sAuthor, sYear, iMainTaxonID,
+                   sTaxonRank, sStatus):
+        """ Writes changed values of the taxon. It is called inside the
+        transaction, and it stops at the first failed write.
+
+        :param sLatName: The scientific name from the form.
+        :type sLatName: str
+        :param sAuthor: The authorship from the form.
+        :type sAuthor: str
+        :param sYear: The year from the form.
+        :type sYear: str
+        :param iMainTaxonID: ID of the new main taxon, or None if it isn't
+            changed.
+        :type iMainTaxonID: int or None
+        :param sTaxonRank: The local name of the rank.
+        :type sTaxonRank: str
+        :param sStatus: The local name of the status.
+        :type sStatus: str
+        :return: True if all changes are written, otherwise False.
+        :rtype: bool
+        """
+        # The form shows the scientific name, so the canonical name is taken
+        # from it, if it is changed. The field of the author has priority
+        # over the authorship, which is written in the name, if the user has
+        # changed the field, and it can be cleared.
+        bNameChanged = sLatName != self.sOldTaxonName
+        bAuthorChanged = sAuthor != (self.sOldAuthor or '')
+        if bNameChanged or bAuthorChanged:
+            if bNameChanged:
+                dName = parse_name(sLatName)
+                if not dName:
+                    return False
+                sName = dName['canonicalName']
+                # The year, which is written in the name, is taken, if its
+                # field is empty.
+                if not sYear and dName.get('year'):
+                    sYear = str(dName['year'])
+            else:
+                sName = self.oConnector.sql_get_id(
+                    'Taxa', 'canonicalName', 'taxonID', (self.iOldTaxonID,))
+                if not sName:
+                    return False
+
+            if bNameChanged and not bAuthorChanged:
+                sAuthor = get_authorship(dName) or sAuthor
+            sSciName = f'{sName} {sAuthor}' if sAuthor else sName
+            if not self.oConnector.update(
+                    'Taxa', 'scientificName, canonicalName, authorship',
+                    'taxonID', (sSciName, sName, sAuthor or None,
+                                self.iOldTaxonID,)):
+                return False
+
+        if iMainTaxonID and not self.oConnector.set_main_taxon(
+                self.iOldTaxonID, iMainTaxonID):
+            return False
+
+        if sTaxonRank != self.sOldTaxonRankName:
+            iRankID = self.oConnector.get_rank_id('rankLocalName', sTaxonRank)
+            if not iRankID or not self.save_('rankID', iRankID,
+                                             self.iOldTaxonID):
+                return False
+
+        if sYear and sYear != self.sOldYear and \
+                not self.save_('yearPublishing', sYear, self.iOldTaxonID):
+            return False
+
+        if sStatus != self.sOldStatus:
+            iStatusID = self.oConnector.get_status_id(sStatus)
+            if not iStatusID or not self.oConnector.set_taxon_status(
+                    self.iOldTaxonID, iStatusID):
+                return False
+
+        return True
+
     def save_(self, sSetCol, sUpdate, sWhere,
               sTable='Taxa', sWhereCol='taxonID'):
 
         tValues = (sUpdate, sWhere,)
-        self.oConnector.update(sTable, sSetCol, sWhereCol, tValues)
+        return self.oConnector.update(sTable, sSetCol, sWhereCol, tValues)
 
 
 class EditSynonymDialog(ATaxonDialog):
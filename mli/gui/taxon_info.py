@@ -17,74 +17,84 @@
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 from gettext import gettext as _
+from PyQt6.QtCore import QLocale, QObject, QRunnable, QThreadPool, \
+    pyqtSignal, pyqtSlot
 from PyQt6.QtWidgets import QTextBrowser
 
 from mli.lib.str import HTMLDoc
 
 
-class TaxonBrowser(QTextBrowser):
-    def __init__(self, oConnector, sSciName):
-        super().__init__()
+class TaxonPage:
+    """ Builds the HTML page of the taxon. It doesn't use widgets, so the
+    page can be built in another thread. """
 
+    def __init__(self, oConnector):
         self.oConnector = oConnector
-        self.sSciName = sSciName
+        self.lDependencies = []
         self.sNoData = _('There is no data.')
         self.oHTML = HTMLDoc()
 
-        self.initUI()
+    def get_page_taxon_info(self, iTaxonID):
+        # The whole page is loaded by one query.
+        dPage = self.oConnector.get_taxon_page(iTaxonID)
+        if not dPage:
+            self.oHTML.set_no_data(self.sNoData)
+            return self.oHTML.get_doc()
 
-    def initUI(self):
-        self.setOpenExternalLinks(True)
-        self.setText(self.get_page_taxon_info())
+        # The page is outdated when any of the shown taxa is changed.
+        self.lDependencies = [iTaxonID, dPage['mainTaxonID']]
+        for sList in ('lineage', 'synonyms', 'children'):
+            self.lDependencies.extend(lRow[0] for lRow in dPage[sList])
 
-    def get_page_taxon_info(self):
-        iStatusID, sStatusName = \
-            self.oConnector.get_status_taxon(self.sSciName)
-        iLevelID, sRankName = self.oConnector.get_taxon_rank(self.sSciName)
-        iTaxonID = self.oConnector.get_taxon_id(self.sSciName)
-        sName, sAuthor = self.oConnector.get_name_author(iTaxonID)[0]
-        self.oHTML.set_title_doc(sRankName, sName, sAuthor)
+        sName, sAuthor = dPage['canonicalName'], dPage['authorship']
+        self.oHTML.set_title_doc(dPage['rankName'], sName, sAuthor)
 
-        if iStatusID != 1:
-            sMainName, sMainAuthor = self.oConnector.get_main_taxon(iTaxonID)
-            self.oHTML.set_is_synonym(sName, sAuthor, sMainName, sMainAuthor)
+        iStatusID = dPage['statusID']
+        if iStatusID != 1 and dPage['mainTaxonID']:
+            self.oHTML.set_is_synonym(sName, sAuthor, dPage['mainName'],
+                                      dPage['mainAuthorship'])
 
         self.oHTML.set_title_chart(_('Status:'))
-        self.oHTML.set_string(sStatusName)
+        if iStatusID:
+            self.oHTML.set_string(dPage['statusName'])
+        else:
+            self.oHTML.set_no_data(self.sNoData)
 
         if iStatusID == 1:
-            self.get_accepted_taxon_info(iTaxonID, sStatusName)
+            self.get_accepted_taxon_info(dPage)
 
-        self.get_taxon_db_links(iTaxonID, iLevelID, sName)
+        self.get_taxon_db_links(dPage['links'], dPage['rankID'], sName)
         self.get_taxon_ref_links(iTaxonID)
 
         return self.oHTML.get_doc()
 
-    def get_accepted_taxon_info(self, iTaxonID, sStatusName):
+    def get_accepted_taxon_info(self, dPage):
+        self.oHTML.set_title_chart(_('Classification:'))
+        self.get_name(dPage['lineage'])
+
         self.oHTML.set_title_chart(_('Synonyms:'))
-        tSynonyms = self.oConnector.get_synonyms(iTaxonID)
-        self.get_name(tSynonyms)
+        self.get_name(dPage['synonyms'])
 
         self.oHTML.set_title_chart(_("Description:"))
         self.oHTML.set_no_data(self.sNoData)
 
         self.oHTML.set_title_chart(_('Children:'))
-        tChildren = \
-            self.oConnector.get_taxon_children(iTaxonID, sStatusName)
-        self.get_name(tChildren)
-
-    def get_name(self, tValues):
-        if tValues:
-            for sRank, sNameSyn, sAuthor in tValues:
-                self.oHTML.set_rang_name(sRank, sNameSyn, sAuthor)
+        self.get_name(dPage['children'])
+
+        self.oHTML.set_title_chart(_('Number of descendants:'))
+        self.oHTML.set_string(str(dPage['descendants']))
+
+    def get_name(self, lValues):
+        if lValues:
+            for iTaxonID, sRank, sName, sAuthor in lValues:
+                self.oHTML.set_rang_name(sRank, sName, sAuthor)
         else:
             self.oHTML.set_no_data(self.sNoData)
 
-    def get_taxon_db_links(self, iTaxonID, iLevelID, sName):
-        tTaxonDB = self.oConnector.get_taxon_db_link(iTaxonID)
+    def get_taxon_db_links(self, lLinks, iLevelID, sName):
         self.oHTML.set_title_chart(_("Database links:"))
-        if tTaxonDB:
-            for sSource, sLink, sIndex in tTaxonDB:
+        if lLinks:
+            for sSource, sLink, sIndex in lLinks:
                 self.oHTML.set_link(sSource, sLink, sIndex)
         else:
             self.oHTML.set_no_data(self.sNoData)
@@ -98,5 +108,107 @@ class TaxonBrowser(QTextBrowser):
         self.oHTML.set_no_data(self.sNoData)
 
 
+class PageSignals(QObject):
+    """ Signals of PageWorker, QRunnable can't have its own signals. """
+    finished = pyqtSignal(int, str, list)
+
+
+class PageWorker(QRunnable):
+    """ Builds the page of the taxon in a thread of QThreadPool. The worker
+    reads the database by a read-only connection from the pool of SQL. """
+
+    def __init__(self, oConnector, iTaxonID):
+        super().__init__()
+
+        self.oConnector = oConnector
+        self.iTaxonID = iTaxonID
+        self.bCancelled = False
+        self.oSignals = PageSignals()
+        # The browser keeps the worker to cancel it, so the pool mustn't
+        # delete it.
+        self.setAutoDelete(False)
+
+    def run(self):
+        if self.bCancelled:
+            return
+
+        oPage = TaxonPage(self.oConnector)
+        try:
+            sPage = oPage.get_page_taxon_info(self.iTaxonID)
+        finally:
+            self.oConnector.release_connection()
+
+        if not self.bCancelled:
+            self.oSignals.finished.emit(self.iTaxonID, sPage,
+                                        oPage.lDependencies)
+
+
+class TaxonBrowser(QTextBrowser):
+    def __init__(self, oConnector, sSciName, oPageCache=None):
+        super().__init__()
+
+        self.oConnector = oConnector
+        self.sSciName = sSciName
+        self.oPageCache = oPageCache
+        self.sLang = QLocale().name()
+        self.oWorker = None
+        self.bCancelled = False
+        self.iCacheVersion = None
+
+        self.initUI()
+
+    def initUI(self):
+        self.setOpenExternalLinks(True)
+        iTaxonID = self.oConnector.get_taxonomy().get_id(self.sSciName)
+        sPage = None
+        if self.oPageCache is not None and iTaxonID is not None:
+            sPage = self.oPageCache.get(iTaxonID, self.sLang)
+        if sPage is not None:
+            self.setText(sPage)
+            return
+
+        # Without the pool of connections, the database can be read only
+        # in the main thread.
+        if self.oConnector.oPool is None or iTaxonID is None:
+            oPage = TaxonPage(self.oConnector)
+            sPage = oPage.get_page_taxon_info(iTaxonID)
+            self.onPageBuilt(iTaxonID, sPage, oPage.lDependencies)
+            return
+
+        self.setText(_('The page is loading...'))
+        if self.oPageCache is not None:
+            self.iCacheVersion = self.oPageCache.iVersion
+        self.oWorker = PageWorker(self.oConnector, iTaxonID)
+        self.oWorker.oSignals.finished.connect(self.onPageBuilt)
+        QThreadPool.globalInstance().start(self.oWorker)
+
+    def cancel(self):
+        """ Stops building of the page, if it isn't built yet. """
+        if self.oWorker is None:
+            return
+
+        self.bCancelled = True
+        self.oWorker.bCancelled = True
+        QThreadPool.globalInstance().tryTake(self.oWorker)
+        self.oWorker = None
+
+    def is_loading(self):
+        return self.oWorker is not None
+
+    @pyqtSlot(int, str, list)
+    def onPageBuilt(self, iTaxonID, sPage, lDependencies):
+        if self.bCancelled:
+            return
+
+        self.oWorker = None
+        self.setText(sPage)
+        if self.oPageCache is None or iTaxonID is None:
+            return
+
+        # A page built before a write to the database can be outdated.
+        if self.iCacheVersion in (None, self.oPageCache.iVersion):
+            self.oPageCache.put(iTaxonID, self.sLang, sPage, lDependencies)
+
+
 if __name__ == '__main__':
     pass
@@ -0,0 +1,660 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" The module provides Qt models of taxa, which are shared by all widgets
+of the program.
+
+Function:
+    get_taxon_list_model(oConnector)
+    is_subsequence(lItems, lSequence)
+    set_rows(lNodes, iFirst=0)
+
+Class:
+    TaxonListModel
+    TaxonNode
+    TaxonSearchModel
+    TaxonTreeModel
+"""
+
+from bisect import bisect_left
+from gettext import gettext as _
+from weakref import WeakKeyDictionary
+
+from PyQt6.QtCore import QAbstractItemModel, QAbstractListModel, \
+    QModelIndex, QTimer, Qt
+
+# The role which gives the scientific name of the taxon without its rank.
+NAME_ROLE = Qt.ItemDataRole.UserRole + 1
+# The tables which rows of the list are made from.
+TAXON_LIST_TABLES = ('Taxa', 'TaxonTree', 'TaxonRanks', 'TaxonStatuses')
+# Rows are sorted in Python too, so empty values are replaced.
+TAXON_LIST_SQL = 'SELECT IFNULL(Taxa.rankID, 0), ' \
+                 'IFNULL(Taxa.scientificName, \'\'), Taxa.taxonID ' \
+                 'FROM Taxa ' \
+                 'JOIN TaxonTree ON TaxonTree.taxonID=Taxa.taxonID ' \
+                 'WHERE TaxonTree.statusID=1'
+
+# The number of children of the node which are added to the tree at once.
+FETCH_CHILDREN = 500
+# The max number of taxa, which are found for the completer.
+SEARCH_LIMIT = 50
+
+dTaxonListModels = WeakKeyDictionary()
+
+
+def is_subsequence(lItems, lSequence):
+    """ Checks that items go in the sequence in the same order, maybe with
+    other items between them.
+
+    :param lItems: Items.
+    :type lItems: list
+    :param lSequence: The sequence.
+    :type lSequence: list
+    :return: True if they go in the same order, otherwise False.
+    :rtype: bool
+    """
+    oSequence = iter(lSequence)
+    return all(Item in oSequence for Item in lItems)
+
+
+def set_rows(lNodes, iFirst=0):
+    """ Sets numbers of rows of nodes after the list of nodes is changed.
+
+    :param lNodes: Nodes of the same parent.
+    :type lNodes: list[TaxonNode]
+    :param iFirst: The first changed row.
+    :type iFirst: int
+    """
+    for iRow in range(iFirst, len(lNodes)):
+        lNodes[iRow].iRow = iRow
+
+
+def get_taxon_list_model(oConnector):
+    """ Gives the list of accepted taxa of the database. The list is loaded
+    on the first request, and then the same model is given to all widgets.
+
+    :param oConnector: Instance attribute of SQL.
+    :type oConnector: SQL
+    :return: The model of the list.
+    :rtype: TaxonListModel
+    """
+    oModel = dTaxonListModels.get(oConnector)
+    if oModel is None:
+        oModel = TaxonListModel(oConnector)
+        dTaxonListModels[oConnector] = oModel
+
+    return oModel
+
+
+class TaxonListModel(QAbstractListModel):
+    """ The list of accepted taxa in the form '(Taxon rank) Taxon name',
+    ordered by rank and name. The list follows writes to the database
+    through SQL: changed taxa are read again and moved to their place, and
+    the whole list is loaded again only if changed taxa are unknown.
+
+    Rows give the text by DisplayRole and EditRole, the scientific name by
+    NAME_ROLE and ID of the taxon by UserRole.
+    """
+
+    def __init__(self, oConnector, oParent=None):
+        """ Initiating a class.
+
+        :param oConnector: Instance attribute of SQL.
+        :type oConnector: SQL
+        """
+        super(TaxonListModel, self).__init__(oParent)
+        self.oConnector = oConnector
+        # Every row is a tuple of rankID, scientificName and taxonID, so
+        # the list is sorted in the same order as the query.
+        self.lRows = []
+        self.dRows = {}
+        self.dRanks = {}
+        self.setChanged = set()
+        self.bReload = False
+        self.bPending = False
+        self.load()
+        oConnector.add_write_listener(self.onWrite)
+
+    def rowCount(self, oParent=QModelIndex()):
+        if oParent.isValid():
+            return 0
+        return len(self.lRows)
+
+    def data(self, oIndex, iRole=Qt.ItemDataRole.DisplayRole):
+        if not oIndex.isValid():
+            return None
+
+        iRankID, sSciName, iTaxonID = self.lRows[oIndex.row()]
+        if iRole in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return f'({self.dRanks.get(iRankID)}) {sSciName}'
+        if iRole == NAME_ROLE:
+            return sSciName
+        if iRole == Qt.ItemDataRole.UserRole:
+            return iTaxonID
+
+        return None
+
+    def get_row(self, iTaxonID):
+        """ Gives the number of the row of the taxon.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :return: The number of the row, or -1 if the taxon isn't in the list.
+        :rtype: int
+        """
+        tRow = self.dRows.get(iTaxonID)
+        if tRow is None:
+            return -1
+        return bisect_left(self.lRows, tRow)
+
+    def load(self):
+        """ Loads the whole list from the database. """
+        self.beginResetModel()
+        oCursor = self.oConnector.execute_query(
+            'SELECT rankID, rankLocalName FROM TaxonRanks;')
+        self.dRanks = dict(oCursor) if oCursor else {}
+        oCursor = self.oConnector.execute_query(
+            f'{TAXON_LIST_SQL} ORDER BY 1, 2;')
+        self.lRows = sorted(oCursor) if oCursor else []
+        self.dRows = {tRow[2]: tRow for tRow in self.lRows}
+        self.endResetModel()
+
+    def onWrite(self, sTable, tTaxonIDs=()):
+        """ Remembers changed taxa. The list is changed later, when the
+        current transaction is finished, so rolled back writes don't get
+        into it.
+
+        :param sTable: The changed table, or None if it is unknown.
+        :type sTable: str or None
+        :param tTaxonIDs: IDs of changed taxa, if they are known.
+        :type tTaxonIDs: tuple
+        """
+        if sTable is not None and sTable not in TAXON_LIST_TABLES:
+            return
+
+        if sTable in ('Taxa', 'TaxonTree') and tTaxonIDs:
+            self.setChanged.update(tTaxonIDs)
+        else:
+            self.bReload = True
+        if not self.bPending:
+            self.bPending = True
+            QTimer.singleShot(0, self.refresh)
+
+    def refresh(self):
+        """ Applies remembered changes to the list. """
+        if self.oConnector.lTransactions:
+            QTimer.singleShot(0, self.refresh)
+            return
+
+        self.bPending = False
+        if self.bReload:
+            self.bReload = False
+            self.setChanged.clear()
+            self.load()
+            return
+
+        setChanged, self.setChanged = self.setChanged, set()
+        for iTaxonID in setChanged:
+            self.update_taxon(iTaxonID)
+
+    def update_taxon(self, iTaxonID):
+        """ Reads the taxon from the database again and moves it to its place
+        in the list, or removes it if it isn't an accepted taxon anymore.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        """
+        oCursor = self.oConnector.execute_query(
+            f'{TAXON_LIST_SQL} AND Taxa.taxonID=?;', (iTaxonID,))
+        tNewRow = oCursor.fetchone() if oCursor else None
+        tOldRow = self.dRows.get(iTaxonID)
+        if tNewRow == tOldRow:
+            return
+
+        if tOldRow is not None:
+            iRow = bisect_left(self.lRows, tOldRow)
+            self.beginRemoveRows(QModelIndex(), iRow, iRow)
+            del self.lRows[iRow]
+            del self.dRows[iTaxonID]
+            self.endRemoveRows()
+
+        if tNewRow is not None:
+            iRow = bisect_left(self.lRows, tNewRow)
+            self.beginInsertRows(QModelIndex(), iRow, iRow)
+            self.lRows.insert(iRow, tNewRow)
+            self.dRows[iTaxonID] = tNewRow
+            self.endInsertRows()
+
+
+class TaxonSearchModel(QAbstractListModel):
+    """ Taxa, which are found by the full-text index for the typed text,
+    accepted taxa and synonyms, the best matches go first. Only found taxa
+    are kept, and the model is filled again on every change of the text.
+
+    Rows give the text '(Taxon rank) Taxon name' by DisplayRole, the
+    scientific name by EditRole and NAME_ROLE and ID of the taxon by
+    UserRole, as rows of TaxonListModel.
+    """
+
+    def __init__(self, oConnector, iLimit=SEARCH_LIMIT, oParent=None):
+        """ Initiating a class.
+
+        :param oConnector: Instance attribute of SQL.
+        :type oConnector: SQL
+        :param iLimit: The max number of found taxa.
+        :type iLimit: int
+        """
+        super(TaxonSearchModel, self).__init__(oParent)
+        self.oConnector = oConnector
+        self.iLimit = iLimit
+        # Every row is a tuple of taxonID and scientificName.
+        self.lRows = []
+
+    def rowCount(self, oParent=QModelIndex()):
+        if oParent.isValid():
+            return 0
+        return len(self.lRows)
+
+    def data(self, oIndex, iRole=Qt.ItemDataRole.DisplayRole):
+        if not oIndex.isValid():
+            return None
+
+        iTaxonID, sSciName = self.lRows[oIndex.row()]
+        if iRole == Qt.ItemDataRole.DisplayRole:
+            tRank = self.oConnector.get_taxonomy().get_rank(iTaxonID)
+            return f'({tRank[2] if tRank else ""}) {sSciName}'
+        if iRole in (Qt.ItemDataRole.EditRole, NAME_ROLE):
+            return sSciName
+        if iRole == Qt.ItemDataRole.UserRole:
+            return iTaxonID
+
+        return None
+
+    def search(self, sText):
+        """ Fills the model with taxa found for the text.
+
+        :param sText: The typed text.
+        :type sText: str
+        """
+        self.beginResetModel()
+        self.lRows = self.oConnector.search_taxa(sText, self.iLimit)
+        self.endResetModel()
+
+
+class TaxonNode:
+    """ The node of TaxonTreeModel. IDs of children are taken from the index
+    of the taxonomy, and nodes of children are created when the node is
+    expanded. """
+
+    __slots__ = ('iTaxonID', 'oParent', 'iRow', 'lChildIDs', 'lChildren')
+
+    def __init__(self, iTaxonID, oParent, iRow, lChildIDs):
+        self.iTaxonID = iTaxonID
+        self.oParent = oParent
+        self.iRow = iRow
+        self.lChildIDs = lChildIDs
+        self.lChildren = []
+
+
+class TaxonTreeModel(QAbstractItemModel):
+    """ The tree of accepted taxa. Children of the node are added to the
+    model only when the node is expanded, by batches of FETCH_CHILDREN
+    nodes, so the tree of any size is opened at once. Names and the number
+    of children are taken from TaxonomyIndex, not from queries.
+
+    After a change of the taxonomy through SQL, only nodes of changed taxa
+    and their old and new parents are updated, so the tree keeps expanded
+    nodes. The tree is loaded again from the top, only if changed taxa are
+    unknown.
+    """
+
+    def __init__(self, oConnector, oParent=None):
+        """ Initiating a class.
+
+        :param oConnector: Instance attribute of SQL.
+        :type oConnector: SQL
+        """
+        super(TaxonTreeModel, self).__init__(oParent)
+        self.oConnector = oConnector
+        self.oTaxonomy = oConnector.get_taxonomy()
+        self.lHeaders = [_('Taxon'), _('Children')]
+        self.oRoot = None
+        # Nodes, which were created, by IDs of their taxa.
+        self.dNodes = {}
+        self.setChanged = set()
+        self.bReload = False
+        self.bPending = False
+        # Children aren't fetched by views, while nodes are updated.
+        self.bUpdating = False
+        self.load()
+        oConnector.add_write_listener(self.onWrite)
+
+    def load(self):
+        """ Loads the tree again from the top. """
+        self.bUpdating = True
+        self.beginResetModel()
+        self.oRoot = TaxonNode(None, None, 0, self.oTaxonomy.get_roots())
+        self.dNodes = {}
+        self.endResetModel()
+        self.bUpdating = False
+
+    def onWrite(self, sTable, tTaxonIDs=()):
+        """ Remembers changed taxa, and updates the tree, when the current
+        transaction is finished, if the taxonomy has been changed.
+
+        :param sTable: The changed table, or None if it is unknown.
+        :type sTable: str or None
+        :param tTaxonIDs: IDs of changed taxa, if they are known.
+        :type tTaxonIDs: tuple
+        """
+        if sTable is not None and sTable not in TAXON_LIST_TABLES:
+            return
+
+        # Ranks and statuses change names of many taxa.
+        if sTable in ('Taxa', 'TaxonTree') and tTaxonIDs:
+            self.setChanged.update(tTaxonIDs)
+        else:
+            self.bReload = True
+
+        if not self.bPending:
+            self.bPending = True
+            QTimer.singleShot(0, self.refresh)
+
+    def refresh(self):
+        """ Updates the tree after writes. """
+        if self.oConnector.lTransactions:
+            QTimer.singleShot(0, self.refresh)
+            return
+
+        self.bPending = False
+        setChanged, self.setChanged = self.setChanged, set()
+        bReload, self.bReload = self.bReload, False
+        self.bUpdating = True
+        try:
+            bUpdated = not bReload and self.update_nodes(setChanged)
+        finally:
+            self.bUpdating = False
+        if not bUpdated:
+            self.load()
+
+    def update_nodes(self, setChanged):
+        """ Updates nodes of changed taxa, and children of their old and new
+        parents.
+
+        :param setChanged: IDs of changed taxa.
+        :type setChanged: set[int]
+        :return: True if the tree is updated, False if it should be loaded
+            again.
+        :rtype: bool
+        """
+        try:
+            setChanged = {int(iTaxonID) for iTaxonID in setChanged}
+        except (TypeError, ValueError):
+            return False
+
+        # Old parents have changed taxa among children, which they had,
+        # even if nodes of these taxa weren't created.
+        lParents = [oNode for oNode in
+                    [self.oRoot, *self.dNodes.values()]
+                    if not setChanged.isdisjoint(oNode.lChildIDs)]
+        for iTaxonID in setChanged:
+            oNode = self.dNodes.get(iTaxonID)
+            if oNode is not None:
+                lParents.append(oNode)
+            iParentID = self.oTaxonomy.get_parent(iTaxonID)
+            if iParentID is None or \
+                    self.oTaxonomy.get_row(iParentID) is None:
+                lParents.append(self.oRoot)
+            elif iParentID in self.dNodes:
+                lParents.append(self.dNodes[iParentID])
+
+        # Parents go from the top, so a removed subtree isn't updated.
+        for oNode in sorted(set(lParents), key=self.get_depth):
+            if oNode is not self.oRoot and \
+                    self.dNodes.get(oNode.iTaxonID) is not oNode:
+                continue
+            if not self.update_children(oNode, setChanged):
+                return False
+
+        for iTaxonID in setChanged:
+            oNode = self.dNodes.get(iTaxonID)
+            if oNode is not None:
+                self.dataChanged.emit(
+                    self.createIndex(oNode.iRow, 0, oNode),
+                    self.createIndex(oNode.iRow, len(self.lHeaders) - 1,
+                                     oNode))
+
+        return True
+
+    def update_children(self, oNode, setChanged):
+        """ Removes children of the node, which aren't there any more, and
+        inserts new ones among loaded children. Changed children, which
+        have another place in the order, are inserted again.
+
+        :param oNode: The node, which children are updated.
+        :type oNode: TaxonNode
+        :param setChanged: IDs of changed taxa.
+        :type setChanged: set[int]
+        :return: True if children are updated, otherwise False.
+        :rtype: bool
+        """
+        if oNode is self.oRoot:
+            lChildIDs = self.oTaxonomy.get_roots()
+            oParent = QModelIndex()
+        else:
+            lChildIDs = self.oTaxonomy.get_children(oNode.iTaxonID)
+            oParent = self.createIndex(oNode.iRow, 0, oNode)
+
+        setChildIDs = set(lChildIDs)
+        self.remove_children(oParent, oNode, lambda oChild:
+                             oChild.iTaxonID not in setChildIDs)
+        if not is_subsequence([oChild.iTaxonID for oChild in oNode.lChildren],
+                              lChildIDs):
+            self.remove_children(oParent, oNode, lambda oChild:
+                                 oChild.iTaxonID in setChanged)
+            if not is_subsequence([oChild.iTaxonID
+                                   for oChild in oNode.lChildren], lChildIDs):
+                return False
+
+        # Loaded children stay the beginning of the list of children.
+        iLoaded = 0
+        if oNode.lChildren:
+            iLoaded = lChildIDs.index(oNode.lChildren[-1].iTaxonID) + 1
+        for iRow, iTaxonID in enumerate(lChildIDs[:iLoaded]):
+            if oNode.lChildren[iRow].iTaxonID == iTaxonID:
+                continue
+            self.beginInsertRows(oParent, iRow, iRow)
+            oChild = TaxonNode(iTaxonID, oNode, iRow,
+                               self.oTaxonomy.get_children(iTaxonID))
+            oNode.lChildren.insert(iRow, oChild)
+            self.dNodes[iTaxonID] = oChild
+            set_rows(oNode.lChildren, iRow)
+            self.endInsertRows()
+
+        bHadChildren = bool(oNode.lChildIDs)
+        bCount = len(oNode.lChildIDs) != len(lChildIDs)
+        oNode.lChildIDs = lChildIDs
+        if oNode is self.oRoot:
+            return True
+
+        # The view asks if the node has children again only after the
+        # change of the layout.
+        if bHadChildren != bool(lChildIDs):
+            self.layoutAboutToBeChanged.emit()
+            self.layoutChanged.emit()
+        elif bCount:
+            oIndex = self.createIndex(oNode.iRow, 1, oNode)
+            self.dataChanged.emit(oIndex, oIndex)
+        return True
+
+    def remove_children(self, oParent, oNode, fRemove):
+        """ Removes loaded children of the node, for which the function
+        returns True, together with their subtrees.
+
+        :param oParent: The index of the node.
+        :type oParent: QModelIndex
+        :param oNode: The node.
+        :type oNode: TaxonNode
+        :param fRemove: The function, which takes the child node.
+        :type fRemove: Callable[[TaxonNode], bool]
+        """
+        for iRow in range(len(oNode.lChildren) - 1, -1, -1):
+            oChild = oNode.lChildren[iRow]
+            if not fRemove(oChild):
+                continue
+            self.beginRemoveRows(oParent, iRow, iRow)
+            del oNode.lChildren[iRow]
+            self.forget_nodes(oChild)
+            set_rows(oNode.lChildren, iRow)
+            self.endRemoveRows()
+
+    def forget_nodes(self, oNode):
+        """ Removes the node and its loaded descendants from dNodes.
+
+        :param oNode: The node.
+        :type oNode: TaxonNode
+        """
+        lNodes = [oNode]
+        while lNodes:
+            oNode = lNodes.pop()
+            if self.dNodes.get(oNode.iTaxonID) is oNode:
+                del self.dNodes[oNode.iTaxonID]
+            lNodes.extend(oNode.lChildren)
+
+    def get_depth(self, oNode):
+        """ Counts ancestors of the node.
+
+        :param oNode: The node.
+        :type oNode: TaxonNode
+        :return: The depth, 0 for the root.
+        :rtype: int
+        """
+        iDepth = 0
+        while oNode.oParent is not None:
+            oNode = oNode.oParent
+            iDepth = iDepth + 1
+        return iDepth
+
+    def get_node(self, oIndex):
+        """ Gives the node of the index.
+
+        :param oIndex: The index of the model.
+        :type oIndex: QModelIndex
+        :return: The node, the root for the invalid index.
+        :rtype: TaxonNode
+        """
+        if oIndex.isValid():
+            return oIndex.internalPointer()
+        return self.oRoot
+
+    def get_taxon_id(self, oIndex):
+        """ Gives ID of the taxon of the index.
+
+        :param oIndex: The index of the model.
+        :type oIndex: QModelIndex
+        :return: ID of the taxon, or None for the invalid index.
+        :rtype: int or None
+        """
+        return self.get_node(oIndex).iTaxonID
+
+    def index(self, iRow, iColumn, oParent=QModelIndex()):
+        oNode = self.get_node(oParent)
+        if not 0 <= iRow < len(oNode.lChildren) or \
+                not 0 <= iColumn < len(self.lHeaders):
+            return QModelIndex()
+
+        return self.createIndex(iRow, iColumn, oNode.lChildren[iRow])
+
+    def parent(self, oIndex):
+        if not oIndex.isValid():
+            return QModelIndex()
+
+        oParent = oIndex.internalPointer().oParent
+        if oParent is None or oParent is self.oRoot:
+            return QModelIndex()
+
+        return self.createIndex(oParent.iRow, 0, oParent)
+
+    def rowCount(self, oParent=QModelIndex()):
+        if oParent.column() > 0:
+            return 0
+        return len(self.get_node(oParent).lChildren)
+
+    def columnCount(self, oParent=QModelIndex()):
+        return len(self.lHeaders)
+
+    def hasChildren(self, oParent=QModelIndex()):
+        if oParent.column() > 0:
+            return False
+        return bool(self.get_node(oParent).lChildIDs)
+
+    def canFetchMore(self, oParent=QModelIndex()):
+        if self.bUpdating:
+            return False
+        oNode = self.get_node(oParent)
+        return len(oNode.lChildren) < len(oNode.lChildIDs)
+
+    def fetchMore(self, oParent=QModelIndex()):
+        """ Adds the next batch of children of the node. """
+        if self.bUpdating:
+            return
+        oNode = self.get_node(oParent)
+        iFirst = len(oNode.lChildren)
+        iLast = min(iFirst + FETCH_CHILDREN, len(oNode.lChildIDs)) - 1
+        if iLast < iFirst:
+            return
+
+        self.beginInsertRows(oParent, iFirst, iLast)
+        for iRow in range(iFirst, iLast + 1):
+            iTaxonID = oNode.lChildIDs[iRow]
+            oChild = TaxonNode(iTaxonID, oNode, iRow,
+                               self.oTaxonomy.get_children(iTaxonID))
+            oNode.lChildren.append(oChild)
+            self.dNodes[iTaxonID] = oChild
+        self.endInsertRows()
+
+    def data(self, oIndex, iRole=Qt.ItemDataRole.DisplayRole):
+        if not oIndex.isValid():
+            return None
+
+        oNode = oIndex.internalPointer()
+        if iRole == Qt.ItemDataRole.UserRole:
+            return oNode.iTaxonID
+        if iRole != Qt.ItemDataRole.DisplayRole:
+            return None
+
+        if oIndex.column() == 1:
+            return len(oNode.lChildIDs)
+
+        # The taxon can be deleted before the tree is loaded again.
+        tNames = self.oTaxonomy.get_names(oNode.iTaxonID)
+        tRank = self.oTaxonomy.get_rank(oNode.iTaxonID)
+        if not tNames:
+            return None
+        return f'({tRank[2] if tRank else ""}) {tNames[0]}'
+
+    def headerData(self, iSection, oOrientation,
+                   iRole=Qt.ItemDataRole.DisplayRole):
+        if oOrientation == Qt.Orientation.Horizontal and \
+                iRole == Qt.ItemDataRole.DisplayRole:
+            return self.lHeaders[iSection]
+        return None
+
+
+if __name__ == '__main__':
+    pass
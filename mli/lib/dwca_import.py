@@ -0,0 +1,452 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" The module imports lichens from the GBIF Backbone Taxonomy, which is
+downloaded as the Darwin Core Archive, without requests to the server.
+
+The file Taxon.tsv is read from the zip archive as a stream, so the archive
+isn't unpacked, and only the current batch of rows is kept in memory. The
+import has two stages:
+
+1. Rows of lichens are selected by the rules of gbif_is_lichen and written
+   into the stage table DwCATaxa of the database.
+2. Taxa are moved from the stage table into Taxa, TaxonTree and DBIndexes
+   by batches, rank after rank, so the parent of a taxon is always loaded
+   before it. Synonyms are loaded after accepted taxa.
+
+Every batch is written in its own transaction. The closure of TaxonTree is
+rebuilt once at the end.
+
+Function:
+    get_taxon_rows(sArchive, sFile=TAXON_FILE)
+
+Class:
+    DwCAImporter
+
+Using:
+    oImporter = DwCAImporter(oConnector)
+    dStats = oImporter.run('backbone.zip')
+    print(f'{dStats["rows_per_second"]:.0f} rows/s')
+"""
+
+import csv
+import io
+import logging
+import re
+import sys
+from time import perf_counter
+from zipfile import BadZipFile, ZipFile
+
+from mli.lib.gbif_parser import GBIF_SOURCE_ID, gbif_get_rank_id, \
+    gbif_get_status_id, gbif_is_lichen
+from mli.lib.name_parser import parse_authorship
+from mli.lib.sql import SQL
+
+# The file of taxa in the archive of the backbone.
+TAXON_FILE = 'Taxon.tsv'
+# The number of rows, which are written in one transaction.
+BATCH_SIZE = 5000
+# Columns of the higher classification from the lowest rank to the highest.
+LINEAGE = ('genus', 'family', 'order', 'class', 'phylum', 'kingdom')
+
+STAGE_STRUCTURE = 'DROP TABLE IF EXISTS DwCATaxa;' \
+                  'CREATE TABLE DwCATaxa (' \
+                  'gbifID         TEXT PRIMARY KEY, ' \
+                  'parentID       TEXT, ' \
+                  'acceptedID     TEXT, ' \
+                  'scientificName TEXT, ' \
+                  'canonicalName  TEXT, ' \
+                  'authorship     TEXT, ' \
+                  'year           INTEGER, ' \
+                  'publishedIn    TEXT, ' \
+                  'rankID         INTEGER, ' \
+                  'statusID       INTEGER, ' \
+                  'lineage        TEXT, ' \
+                  'stage          INTEGER, ' \
+                  'localID        INTEGER) WITHOUT ROWID;'
+STAGE_COLUMNS = 'gbifID, parentID, acceptedID, scientificName, ' \
+                'canonicalName, authorship, year, publishedIn, rankID, ' \
+                'statusID, lineage, stage'
+
+
+def get_taxon_rows(sArchive, sFile=TAXON_FILE):
+    """ Reads rows of the file of taxa from the zip archive one by one
+    without unpacking it.
+
+    :param sArchive: The path to the zip archive.
+    :type sArchive: str
+    :param sFile: The name of the file of taxa in the archive.
+    :type sFile: str
+    :return: Rows as dictionaries, where keys are names of columns from the
+        head of the file.
+    :rtype: Iterator[dict[str, str]]
+    """
+    with ZipFile(sArchive) as oZip:
+        sName = next((sName for sName in oZip.namelist()
+                      if sName.rsplit('/', 1)[-1] == sFile), None)
+        if sName is None:
+            raise KeyError(f'{sFile} is not found in {sArchive}.')
+
+        # Remarks of taxa can be longer than the default limit of a field.
+        csv.field_size_limit(max(csv.field_size_limit(), sys.maxsize >> 32))
+        with oZip.open(sName) as oFile:
+            oText = io.TextIOWrapper(oFile, encoding='utf-8', newline='')
+            yield from csv.DictReader(oText, delimiter='\t',
+                                      quoting=csv.QUOTE_NONE)
+
+
+class DwCAImporter:
+    """ Imports lichens from the archive of the GBIF Backbone Taxonomy into
+    the database.
+
+    *Methods*
+      * __init__ -- Method sets the database and the size of batches.
+      * run -- Method imports the archive.
+      * stage -- Method writes rows of lichens into the stage table.
+      * get_stage_row -- Method converts the row of the archive.
+      * load -- Method moves taxa from the stage table into the database.
+      * get_batches -- Method reads the stage table by batches.
+      * load_batch -- Method writes the batch of taxa.
+      * get_local_id -- Method finds the taxon by its key in GBIF.
+      * get_existing_id -- Method finds the taxon, which is in the database.
+      * get_lineage_id -- Method finds the nearest higher taxon by names.
+      * report -- Method counts the rate and reports the progress.
+    """
+
+    def __init__(self, oConnector, iBatch=BATCH_SIZE, fProgress=None):
+        """ Sets the database and the size of batches.
+
+        :param oConnector: An instance of the sqlite database api class.
+        :type oConnector: SQL
+        :param iBatch: The number of rows in one transaction.
+        :type iBatch: int
+        :param fProgress: The function, which is called after every batch
+            with the name of the stage and the dictionary of statistics.
+        :type fProgress: function or None
+        """
+        self.oConnector = oConnector
+        self.iBatch = max(1, iBatch)
+        self.fProgress = fProgress
+        self.dRanks = {}
+        self.dStatuses = {}
+        self.fStart = perf_counter()
+        self.dStats = {'read': 0, 'lichens': 0, 'staged': 0, 'inserted': 0,
+                       'existing': 0, 'skipped': 0, 'seconds': 0.0,
+                       'rows_per_second': 0.0}
+
+    def run(self, sArchive):
+        """ Imports the archive. The stage table is removed at the end.
+
+        :param sArchive: The path to the zip archive of the backbone.
+        :type sArchive: str
+        :return: Statistics: numbers of read rows, rows of lichens, staged,
+            inserted, existing and skipped taxa, the time in seconds, and
+            the number of read rows per second. None is returned, if the
+            import failed.
+        :rtype: dict[str, int|float] or None
+        """
+        self.fStart = perf_counter()
+        if not self.oConnector.execute_script(STAGE_STRUCTURE):
+            return None
+
+        try:
+            bDone = self.stage(sArchive) and self.load()
+        finally:
+            self.oConnector.execute_script('DROP TABLE IF EXISTS DwCATaxa;')
+
+        if not bDone or not self.oConnector.rebuild_closure():
+            return None
+
+        self.report('done')
+        logging.info(f'{sArchive} is imported: {self.dStats}.')
+        return dict(self.dStats)
+
+    def stage(self, sArchive):
+        """ Writes rows of lichens into the stage table by batches.
+
+        :param sArchive: The path to the zip archive of the backbone.
+        :type sArchive: str
+        :return: True if rows are written, otherwise False.
+        :rtype: bool
+        """
+        lBatch = []
+        try:
+            for dRow in get_taxon_rows(sArchive):
+                self.dStats['read'] += 1
+                if not gbif_is_lichen(dRow):
+                    continue
+
+                self.dStats['lichens'] += 1
+                tRow = self.get_stage_row(dRow)
+                if tRow is None:
+                    self.dStats['skipped'] += 1
+                    continue
+
+                lBatch.append(tRow)
+                if len(lBatch) >= self.iBatch:
+                    if not self.oConnector.insert_rows('DwCATaxa',
+                                                       STAGE_COLUMNS, lBatch):
+                        return False
+                    self.dStats['staged'] += len(lBatch)
+                    lBatch = []
+                    self.report('stage')
+        except (OSError, KeyError, BadZipFile, csv.Error) as e:
+            logging.error(f'The archive {sArchive} can not be read: {e}.')
+            return False
+
+        if lBatch:
+            if not self.oConnector.insert_rows('DwCATaxa', STAGE_COLUMNS,
+                                               lBatch):
+                return False
+            self.dStats['staged'] += len(lBatch)
+        self.report('stage')
+        return True
+
+    def get_stage_row(self, dRow):
+        """ Converts the row of the archive to the row of the stage table.
+
+        :param dRow: The row of the file of taxa.
+        :type dRow: dict[str, str]
+        :return: Values of STAGE_COLUMNS, or None if the taxon can't be
+            imported: it has no canonical name, or its rank or status is
+            unknown.
+        :rtype: tuple or None
+        """
+        sCanonical = dRow.get('canonicalName') or ''
+        sRank = (dRow.get('taxonRank') or '').lower()
+        # Exclude informal names as SH1169675.09FU and unranked taxa.
+        if not sCanonical or re.search(r'\d', sCanonical) or \
+                not sRank or sRank == 'unranked':
+            return None
+
+        if sRank not in self.dRanks:
+            self.dRanks[sRank] = gbif_get_rank_id(self.oConnector, sRank)
+        sStatus = dRow.get('taxonomicStatus') or 'accepted'
+        if sStatus not in self.dStatuses:
+            self.dStatuses[sStatus] = gbif_get_status_id(self.oConnector,
+                                                         sStatus)
+        iRankID, iStatusID = self.dRanks[sRank], self.dStatuses[sStatus]
+        if not iRankID or not iStatusID:
+            return None
+
+        sAuthor = dRow.get('scientificNameAuthorship') or ''
+        iYear = None
+        tAuthorship = parse_authorship(sAuthor)
+        if tAuthorship:
+            sAuthor, iYear = tAuthorship
+        sAuthor = sAuthor or None
+        sSciName = f'{sCanonical} {sAuthor}' if sAuthor else sCanonical
+        sAccepted = dRow.get('acceptedNameUsageID') or None
+        sLineage = '|'.join(dRow.get(sColumn) or '' for sColumn in LINEAGE)
+
+        return (dRow['taxonID'], dRow.get('parentNameUsageID') or None,
+                sAccepted, sSciName, sCanonical, sAuthor, iYear,
+                dRow.get('namePublishedIn') or None, iRankID, iStatusID,
+                sLineage, 1 if sAccepted else 0,)
+
+    def load(self):
+        """ Moves taxa from the stage table into the database by batches.
+
+        :return: True if all batches are written, otherwise False.
+        :rtype: bool
+        """
+        self.oConnector.execute_script(
+            'CREATE INDEX IF NOT EXISTS idxDwCATaxaOrder '
+            'ON DwCATaxa (stage, rankID, gbifID);')
+        for lRows in self.get_batches():
+            if not self.load_batch(lRows):
+                return False
+            self.report('load')
+
+        return True
+
+    def get_batches(self):
+        """ Reads the stage table by batches in the order of stages and
+        ranks. All rows of the batch have the same rank, so parents of taxa
+        of the batch are already loaded.
+
+        :return: Batches of rows.
+        :rtype: Iterator[list[tuple]]
+        """
+        sSQL = f'SELECT {STAGE_COLUMNS} FROM DwCATaxa ' \
+               'WHERE (stage, rankID, gbifID)>(?, ?, ?) ' \
+               'ORDER BY stage, rankID, gbifID LIMIT ?;'
+        tKey = (-1, -1, '',)
+        while True:
+            oCursor = self.oConnector.execute_query(sSQL,
+                                                    tKey + (self.iBatch,))
+            lRows = oCursor.fetchall() if oCursor else []
+            if not lRows:
+                return
+
+            tFirst = (lRows[0][11], lRows[0][8])
+            lRows = [tRow for tRow in lRows if (tRow[11], tRow[8]) == tFirst]
+            tKey = (lRows[-1][11], lRows[-1][8], lRows[-1][0],)
+            yield lRows
+
+    def load_batch(self, lRows):
+        """ Writes the batch of taxa in one transaction. A taxon, which is in
+        the database, gets only the key of GBIF.
+
+        :param lRows: Rows of the stage table.
+        :type lRows: list[tuple]
+        :return: True if the batch is written, otherwise False.
+        :rtype: bool
+        """
+        lLinks = []
+        lNew = []
+        lTree = []
+        with self.oConnector.transaction():
+            for tRow in lRows:
+                sGBIF_id, sParent, sAccepted = tRow[:3]
+                iTaxonID = self.get_existing_id(tRow)
+                if iTaxonID:
+                    self.dStats['existing'] += 1
+                    lLinks.append((iTaxonID, sGBIF_id,))
+                    continue
+
+                iMainID = self.get_local_id(sAccepted or sParent)
+                if not iMainID and not sAccepted:
+                    iMainID = self.get_lineage_id(tRow[10], tRow[4])
+                if not iMainID:
+                    self.dStats['skipped'] += 1
+                    continue
+
+                lNew.append(tRow[3:9])
+                lTree.append((iMainID, tRow[9], sGBIF_id,))
+
+            if lNew:
+                tResult = self.oConnector.insert_rows(
+                    'Taxa', 'scientificName, canonicalName, authorship, '
+                    'yearPublishing, namePublishedIn, rankID', lNew)
+                if not tResult:
+                    self.oConnector.fail_transaction()
+                    return False
+
+                lIDs = [iTaxonID for iFirst, iLast in tResult[1]
+                        for iTaxonID in range(iFirst, iLast + 1)]
+                if not self.oConnector.insert_rows(
+                        'TaxonTree', 'taxonID, mainTaxonID, statusID',
+                        [(iTaxonID, iMainID, iStatusID,)
+                         for iTaxonID, (iMainID, iStatusID, _)
+                         in zip(lIDs, lTree)]):
+                    self.oConnector.fail_transaction()
+                    return False
+                lLinks.extend((iTaxonID, tTree[2],)
+                              for iTaxonID, tTree in zip(lIDs, lTree))
+                self.dStats['inserted'] += len(lIDs)
+
+            if lLinks and not (
+                    self.oConnector.execute_many(
+                        'INSERT OR IGNORE INTO DBIndexes '
+                        '(taxonID, sourceID, taxonIndex) VALUES (?, ?, ?);',
+                        [(iTaxonID, GBIF_SOURCE_ID, sGBIF_id,)
+                         for iTaxonID, sGBIF_id in lLinks]) and
+                    self.oConnector.execute_many(
+                        'UPDATE DwCATaxa SET localID=? WHERE gbifID=?;',
+                        lLinks)):
+                return False
+
+        self.oConnector.notify_write('DBIndexes')
+        return True
+
+    def get_local_id(self, sGBIF_id):
+        """ Finds the taxon by its key in GBIF among loaded taxa and indexes
+        of the database.
+
+        :param sGBIF_id: The key of the taxon in GBIF.
+        :type sGBIF_id: str or None
+        :return: ID of the taxon, or None if it isn't found.
+        :rtype: int or None
+        """
+        if not sGBIF_id:
+            return None
+
+        oCursor = self.oConnector.execute_query(
+            'SELECT localID FROM DwCATaxa WHERE gbifID=? '
+            'AND localID IS NOT NULL '
+            'UNION ALL SELECT taxonID FROM DBIndexes '
+            'WHERE sourceID=? AND taxonIndex=? LIMIT 1;',
+            (sGBIF_id, GBIF_SOURCE_ID, sGBIF_id,))
+        tRow = oCursor.fetchone() if oCursor else None
+        return tRow[0] if tRow else None
+
+    def get_existing_id(self, tRow):
+        """ Finds the taxon of the stage row, which is in the database, by
+        its key in GBIF, or by the name and the rank. The authorship has to
+        be the same, if both taxa have it.
+
+        :param tRow: The row of the stage table.
+        :type tRow: tuple
+        :return: ID of the taxon, or None if it isn't found.
+        :rtype: int or None
+        """
+        iTaxonID = self.oConnector.sql_get_id('DBIndexes', 'taxonID',
+                                              'sourceID, taxonIndex',
+                                              (GBIF_SOURCE_ID, tRow[0],))
+        if iTaxonID:
+            return iTaxonID
+
+        sAuthor = tRow[5] or ''
+        oCursor = self.oConnector.execute_query(
+            'SELECT taxonID FROM Taxa WHERE canonicalName=? AND rankID=? '
+            "AND (IFNULL(authorship, '')='' OR ?='' OR authorship=?) "
+            'ORDER BY authorship=? DESC, taxonID LIMIT 1;',
+            (tRow[4], tRow[8], sAuthor, sAuthor, sAuthor,))
+        tRow = oCursor.fetchone() if oCursor else None
+        return tRow[0] if tRow else None
+
+    def get_lineage_id(self, sLineage, sCanonical):
+        """ Finds the nearest accepted higher taxon by names of the higher
+        classification, when the parent isn't a lichen and isn't in the
+        archive.
+
+        :param sLineage: Names of the higher classification from LINEAGE
+            separated by '|'.
+        :type sLineage: str
+        :param sCanonical: The canonical name of the taxon itself.
+        :type sCanonical: str
+        :return: ID of the taxon, or None if it isn't found.
+        :rtype: int or None
+        """
+        for sName in (sLineage or '').split('|'):
+            if not sName or sName == sCanonical:
+                continue
+            iTaxonID = self.oConnector.get_id_by_name_status((sName, 1,))
+            if iTaxonID:
+                return iTaxonID
+
+        return None
+
+    def report(self, sStage):
+        """ Counts the rate of the import and calls the function of progress.
+
+        :param sStage: The name of the stage: 'stage', 'load' or 'done'.
+        :type sStage: str
+        :return: None
+        """
+        fSeconds = perf_counter() - self.fStart
+        self.dStats['seconds'] = fSeconds
+        self.dStats['rows_per_second'] = \
+            self.dStats['read'] / fSeconds if fSeconds else 0.0
+        if self.fProgress:
+            self.fProgress(sStage, dict(self.dStats))
+
+
+if __name__ == '__main__':
+    pass
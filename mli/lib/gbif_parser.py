@@ -19,31 +19,49 @@
 """ The module provides a means to get information from a taxon, as specified
 in gbif .
 
+Requests are sent by the shared harvester, so they use keep-alive
+connections and the common limit of rate. The update of the database is
+done by jobs of synchronization, which can be continued after a crash.
+
 function:
-    gbif_get_children(sGBIF_id)
-    gbif_get_id_from_gbif(sName, sLevel='species')
-    gbif_get_id(oConnector, sName, sLevelEn)
-    gbif_get_many(sURL, sGBIF_id)
+    gbif_fetch_task(tTask, sLevel, oHarvester)
+    gbif_get_children(sGBIF_id, oHarvester=None)
+    gbif_get_id_from_gbif(sName, sLevel='species', oHarvester=None)
+    gbif_get_many(sURL, sGBIF_id, oHarvester=None)
+    gbif_get_rank_id(oConnector, sRank)
     gbif_get_status_id(oConnector, sStatus)
-    gbif_get_synonyms(sGBIF_id)
-    gbif_get_taxon_info(sGBIF_id, sLevel='species')
-    gbif_get_update(oConnector, iLevel)
+    gbif_get_synonyms(sGBIF_id, oHarvester=None)
+    gbif_get_taxon_info(sGBIF_id, sLevel='species', oHarvester=None)
+    gbif_get_update(oConnector, iLevel, oHarvester=None)
     gbif_is_lichen(dTaxon)
     gbif_parser_name(sString)
-    gbif_parser_taxon(dData)
-    gbif_parsing_answer(oConnector, lAnswer, sType)
-    gbif_parsing_species(oConnector, dAnswer)
-    gbif_save_species(oConnector, dAnswer, iLevel)
+    gbif_parser_names(lNames)
+    gbif_parser_page(lData)
+    gbif_parser_taxon(dData, dNames=None)
+    gbif_parsing_answer(oConnector, lAnswer, sType, iMainTaxonID=None)
+    gbif_parsing_species(oConnector, dAnswer, iMainTaxonID=None)
+    gbif_save_index(oConnector, iTaxonID, sGBIF_id)
+    gbif_save_species(oConnector, dAnswer, iLevel, iMainTaxonID=None)
+    gbif_sync(oConnector, oJob, oHarvester=None)
     gbif_update(oConnector, dAnswer, iTaxonID)
 """
 
+import logging
 import re
-import requests
-from time import sleep
 
 from pygbif import species
+from mli.lib.harvester import Harvester, get_harvester
+from mli.lib.name_parser import get_authorship, parse_names
 from mli.lib.sql import SQL
 from mli.lib.str import str_sep_name_taxon
+from mli.lib.sync_job import SyncJob, create_job, get_last_job
+
+# The abbreviation and ID of gbif in the table DBSources.
+GBIF_SOURCE = 'GBIF'
+GBIF_SOURCE_ID = 12
+# Ranks and statuses of gbif, which have other names in the database.
+GBIF_RANKS = {'phylum': 'division'}
+GBIF_STATUSES = {'doubtful': 'doubful'}
 
 
 def gbif_is_lichen(dTaxon):
@@ -81,13 +99,15 @@ def gbif_is_lichen(dTaxon):
     return False
 
 
-def gbif_get_id_from_gbif(sName, sLevel='species'):
+def gbif_get_id_from_gbif(sName, sLevel='species', oHarvester=None):
     """ Looks up a taxon name in the gbif database.
 
     :param sName: The name of a taxon.
     :type sName: str
     :param sLevel: The rank of a taxon.
     :type sLevel: str
+    :param oHarvester: The harvester, by default, the shared one.
+    :type oHarvester: Harvester or None
     :return: Key ID of the taxon in gbif.
     :rtype: str
     """
@@ -95,14 +115,8 @@ def gbif_get_id_from_gbif(sName, sLevel='species'):
         return
 
     sLevel = sLevel.upper()
-    PARAMS = {
-        'q': sName,
-    }
-    URL = 'https://api.gbif.org/v1/species/suggest'
-    oSession = requests.Session()
-    oRequest = oSession.get(url=URL, params=PARAMS)
-    lData = oRequest.json()
-    sleep(0.5)
+    oHarvester = oHarvester or get_harvester()
+    lData = oHarvester.get_json('species/suggest', {'q': sName})
     if not lData:
         return
 
@@ -114,13 +128,15 @@ def gbif_get_id_from_gbif(sName, sLevel='species'):
     return
 
 
-def gbif_get_taxon_info(sGBIF_id, sLevel='species'):
+def gbif_get_taxon_info(sGBIF_id, sLevel='species', oHarvester=None):
     """ General information about the taxon by its ID.
 
     :param sGBIF_id: A key ID of taxon in gbif.
     :type: str
     :param sLevel: A level of the taxon.
     :type sLevel: str
+    :param oHarvester: The harvester, by default, the shared one.
+    :type oHarvester: Harvester or None
     :return: A normalized dictionary of taxon information.
     :rtype: dict[str, bool, str, str, str, str, str, int]|None
     """
@@ -128,98 +144,116 @@ def gbif_get_taxon_info(sGBIF_id, sLevel='species'):
         return
 
     sLevel = sLevel.upper()
-    URL = f'https://api.gbif.org/v1/species/{sGBIF_id}'
-    oSession = requests.Session()
-    oRequest = oSession.get(url=URL)
-    dData = oRequest.json()
-    sleep(0.5)
-    if dData['rank'] == sLevel:
+    oHarvester = oHarvester or get_harvester()
+    dData = oHarvester.get_json(f'species/{sGBIF_id}')
+    if dData and dData.get('rank') == sLevel:
         return gbif_parser_taxon(dData)
 
     return
 
 
-def gbif_get_synonyms(sGBIF_id):
+def gbif_get_synonyms(sGBIF_id, oHarvester=None):
     """ Generates an api link for obtaining synonyms from the server and
         returns a normalized response.
 
     :param sGBIF_id: A key ID of taxon in gbif.
     :type: str
+    :param oHarvester: The harvester, by default, the shared one.
+    :type oHarvester: Harvester or None
     :return: A normalized response.
     :rtype: list[dict[str, bool, str, str, str, str, str, int]|None]
     """
-    sURL = f'https://api.gbif.org/v1/species/{sGBIF_id}/synonyms'
-    return gbif_get_many(sURL, sGBIF_id)
+    sURL = f'species/{sGBIF_id}/synonyms'
+    return gbif_get_many(sURL, sGBIF_id, oHarvester)
 
 
-def gbif_get_children(sGBIF_id):
+def gbif_get_children(sGBIF_id, oHarvester=None):
     """ Generates an api link for obtaining children from the server and
         returns a normalized response.
 
     :param sGBIF_id: A key ID of taxon in gbif.
     :type: str
+    :param oHarvester: The harvester, by default, the shared one.
+    :type oHarvester: Harvester or None
     :return: A normalized response.
     :rtype: list[dict[str, bool, str, str, str, str, str, int]|None]
     """
-    sURL = f'https://api.gbif.org/v1/species/{sGBIF_id}/children'
-    return gbif_get_many(sURL, sGBIF_id)
+    sURL = f'species/{sGBIF_id}/children'
+    return gbif_get_many(sURL, sGBIF_id, oHarvester)
 
 
-def gbif_get_many(sURL, sGBIF_id):
+def gbif_get_many(sURL, sGBIF_id, oHarvester=None):
     """ Generates an api link for obtaining children from the server and
         returns a normalized response.
 
-    :param sURL: An URL for sending to gbif server.
+    :param sURL: An URL or a path relative to the root of API for sending to
+        gbif server.
     :type sURL: str
     :param sGBIF_id: A key ID of taxon in gbif.
     :type: str
+    :param oHarvester: The harvester, by default, the shared one.
+    :type oHarvester: Harvester or None
     :return: A normalized response.
     :rtype: list[dict[str, bool, str, str, str, str, str, int]|None]
     """
     if not sGBIF_id:
         return
 
-    bEndOfRecords = False
-    iOffset = 0
+    oHarvester = oHarvester or get_harvester()
     lAnswer = []
-    oSession = requests.Session()
-    while not bEndOfRecords:
-        PARAMS = {
-            'limit': 1000,
-            'offset': iOffset
-        }
-        oRequest = oSession.get(url=sURL, params=PARAMS)
-        dJSON = oRequest.json()
-        sleep(0.5)
-        if type(dJSON) == str:
+    for _, dJSON in oHarvester.get_pages(sURL):
+        if dJSON is None:
             return
 
-        bEndOfRecords = dJSON['endOfRecords']
-        iOffset = iOffset + 1000
         lData = dJSON['results']
-        if not lData and bEndOfRecords:
+        if not lData and dJSON['endOfRecords']:
             return lAnswer
         if not lData:
             return
 
-        for dData in lData:
-            lAnswer.append(gbif_parser_taxon(dData))
+        lAnswer.extend(gbif_parser_page(lData))
 
     return lAnswer
 
 
-def gbif_parser_taxon(dData):
+def gbif_parser_page(lData):
+    """ Selects the necessary information from records of the page of the
+    paged answer. Names of the whole page are parsed at once.
+
+    :param lData: Records of the page, the field 'results' of the answer.
+    :type lData: list[dict]
+    :return: Normalized records.
+    :rtype: list[dict[str, bool, str, str, str, str, str, int]]
+    """
+    lNames = [dData['scientificName'] for dData in lData]
+    lNames.extend(dData['accepted'] for dData in lData if dData['synonym'])
+    dNames = gbif_parser_names(lNames)
+
+    return [gbif_parser_taxon(dData, dNames) for dData in lData]
+
+
+def gbif_parser_taxon(dData, dNames=None):
     """ Selects from the server response the information necessary for further
      processing.
 
     :param dData: An answer of server.
     :type dData: dict
+    :param dNames: Parsed names from gbif_parser_names, which contain the
+        name of the taxon and the name of its accepted taxon. If it is None,
+        names are parsed here.
+    :type dNames: dict[str, tuple[str, str|None, int|None]] or None
     :return: Selection from the server response with the necessary information.
     :rtype: dict[str, bool, str, str, str, str, str, int]|None
     """
-    sName, sAuthor, iYear = gbif_parser_name(dData['scientificName'])
+    if dNames is None:
+        lNames = [dData['scientificName']]
+        if dData['synonym']:
+            lNames.append(dData['accepted'])
+        dNames = gbif_parser_names(lNames)
+
+    sName, sAuthor, iYear = dNames[dData['scientificName']]
     if dData['synonym']:
-        sParent = gbif_parser_name(dData['accepted'])[0]
+        sParent = dNames[dData['accepted']][0]
     else:
         sParent = dData['parent']
 
@@ -235,6 +269,29 @@ def gbif_parser_taxon(dData):
     return dAnswer
 
 
+def gbif_parser_names(lNames):
+    """ Parsing names of taxa separating canonical names from names of authors
+    and years. Names are parsed locally, and only names, which the local
+    parser can't parse, are sent to the parser of gbif at once.
+
+    :param lNames: Strings with names of taxa.
+    :type lNames: list[str]
+    :return: A dictionary, where a key is the string, and a value is a
+        canonical name, an author name and a naming year of the taxon.
+    :rtype: dict[str, tuple[str, str|None, int|None]]
+    """
+    lNames = list(dict.fromkeys(lNames))
+    dNames = {}
+    for sString, dName in zip(lNames,
+                              parse_names(lNames, species.name_parser)):
+        dNames[sString] = (dName.get('canonicalName') or
+                           dName['scientificName'],
+                           get_authorship(dName) or None,
+                           dName.get('year'))
+
+    return dNames
+
+
 def gbif_parser_name(sString):
     """ Parsing a name of the taxon separating the canonical name from the
     name of the author and year, if possible.
@@ -242,55 +299,12 @@ def gbif_parser_name(sString):
     :param sString: A string with a name of the taxon.
     :type sString: str
     :return: A canonical name, an author name and a naming year of the taxon.
-    :rtype: list[str, str, int]
-    """
-    lResponse = species.name_parser([sString])
-    sName = ''
-    sAuthor = ''
-    iYear = None
-    for dResponse in lResponse:
-        if 'canonicalName' in dResponse:
-            sName = dResponse['canonicalName']
-        else:
-            sName = dResponse['scientificName']
-        if 'bracketAuthorship' in dResponse:
-            sAuthor = f'({dResponse["bracketAuthorship"]}) '
-        if 'authorship' in dResponse:
-            sAuthor = f'{sAuthor}{dResponse["authorship"]}'
-        if 'year' in dResponse and type(dResponse['year']) == int:
-            iYear = int(dResponse['year'])
-
-        if not sAuthor:
-            sAuthor = None
-
-        sleep(0.7)
-
-        return sName, sAuthor, iYear
-
-
-def gbif_get_id(oConnector, sName, sLevelEn):
-    """ Checks if the taxon's id exists in the database, and if it doesn't,
-    it gets it from the site.
-
-    :param oConnector: An instance of the sqlite database api class.
-    :type oConnector: SQL
-    :param sName: A name of the taxon.
-    :type sName: str
-    :param sLevelEn: A name of the taxon rank in english language.
-    :type sLevelEn: str
-    :return: ID taxon in gbif.
-    :rtype: int
+    :rtype: tuple[str, str|None, int|None]
     """
-    sGBIF_id = oConnector.sql_get_id('DBIndexes', 'taxon_index',
-                                     'id_taxon, id_source',
-                                     (sName, 12,))
-    if not sGBIF_id:
-        sGBIF_id = gbif_get_id_from_gbif(sName, sLevelEn)
-
-    return sGBIF_id
+    return gbif_parser_names([sString])[sString]
 
 
-def gbif_parsing_answer(oConnector, lAnswer, sType):
+def gbif_parsing_answer(oConnector, lAnswer, sType, iMainTaxonID=None):
     """ Parses the response a list of dictionaries with taxon information.
 
     :param oConnector: An instance of the sqlite database api class.
@@ -300,97 +314,197 @@ def gbif_parsing_answer(oConnector, lAnswer, sType):
     :param sType: The first word to output to the string. It makes sense to
                   indicate either 'Synonym' or 'Children'.
     :type sType: str
+    :param iMainTaxonID: ID of the main taxon of taxa in the answer, by
+        default, it is looked up by the name of the parent.
+    :type iMainTaxonID: int or None
     :return: None
     """
     if lAnswer:
         for dAnswer in lAnswer:
             print(f'{sType}: {dAnswer["parent"]} - {dAnswer["name"]}')
-            gbif_parsing_species(oConnector, dAnswer)
+            gbif_parsing_species(oConnector, dAnswer, iMainTaxonID)
 
 
-def gbif_get_update(oConnector, iLevel):
+def gbif_get_update(oConnector, iLevel, oHarvester=None):
     """ Allows you to select all names from the database by level, start
     getting data from gbif and enter information into the database.
 
+    The update is done by the job of synchronization, so if it was
+    interrupted, the next call continues the unfinished job of the rank.
+
     :param oConnector: An instance of the sqlite database api class.
     :type oConnector: SQL
     :param iLevel: ID of a rank in database.
     :type iLevel: int
+    :param oHarvester: The harvester, by default, the shared one.
+    :type oHarvester: Harvester or None
     :return: None
     """
-    lRows = oConnector.get_all_by_level(iLevel)
-    sLevelEn = oConnector.get_level_name('level_en_name', iLevel)[0][0]
-    if lRows:
-        for sRow in lRows:
-            bBreak = oConnector.sql_get_id('UpdateTaxonGBIF',
-                                           'id', 'id_taxon_sp', (sRow[0],))
-            if bBreak:
-                continue
-
-            sGBIF_id = gbif_get_id(oConnector, sRow[1], sLevelEn)
-
-            dAnswer = gbif_get_taxon_info(sGBIF_id, sLevelEn)
-            if dAnswer:
-                print(f'Name: {sRow[0]}\t{sRow[1]}')
-                gbif_parsing_species(oConnector, dAnswer)
-
-            lAnswer = gbif_get_children(sGBIF_id)
-            gbif_parsing_answer(oConnector, lAnswer, 'Children')
-
-            oConnector.insert_row('UpdateTaxonGBIF', 'id_taxon_sp', (sRow[0],))
-
-        lRows = oConnector.get_all_by_level(iLevel)
-        for sRow in lRows:
-            bBreak = oConnector.sql_get_id('UpdateTaxonGBIF',
-                                           'id', 'id_taxon_sn', (sRow[0],))
-            if bBreak:
-                continue
-
-            sGBIF_id = gbif_get_id(oConnector, sRow[1], sLevelEn)
-            lAnswer = gbif_get_synonyms(sGBIF_id)
-
-            gbif_parsing_answer(oConnector, lAnswer, 'Synonym')
-            oConnector.insert_row('UpdateTaxonGBIF', 'id_taxon_sn', (sRow[0],))
-
+    oJob = get_last_job(oConnector, GBIF_SOURCE, iLevel) or \
+        create_job(oConnector, GBIF_SOURCE, iLevel)
+    if oJob:
+        gbif_sync(oConnector, oJob, oHarvester)
+
+
+def gbif_fetch_task(tTask, sLevel, oHarvester):
+    """ Fetches from gbif everything, which unfinished tasks of the taxon
+    need: the key of the taxon, information about it and pages of children
+    and synonyms from their saved offsets. It is called by workers of the
+    harvester, so it doesn't use the database.
+
+    :param tTask: ID of the taxon, its name, the key of the taxon in gbif or
+        None, and unfinished tasks from SyncJob.get_tasks.
+    :type tTask: tuple[int, str, str|None, dict[str, tuple[str|None, int]]]
+    :param sLevel: The rank of the taxon.
+    :type sLevel: str
+    :param oHarvester: The harvester.
+    :type oHarvester: Harvester
+    :return: A dictionary with the key 'key', the key 'taxon' with
+        information about the taxon or None if gbif has the taxon of other
+        rank, and the keys 'children' and 'synonyms'
+        with lists of pages: the offset of the next page, normalized records
+        of the page or None if it wasn't fetched, and the flag of the last
+        page.
+    :rtype: dict
+    """
+    _, sName, sGBIF_id, dTasks = tTask
+    sGBIF_id = sGBIF_id or gbif_get_id_from_gbif(sName, sLevel, oHarvester)
+    dResult = {'key': sGBIF_id}
+    if not sGBIF_id:
+        return dResult
+
+    if 'taxon' in dTasks:
+        # If the request failed, the task stays unfinished.
+        dData = oHarvester.get_json(f'species/{sGBIF_id}')
+        if dData is not None:
+            dResult['taxon'] = None
+            if dData.get('rank') == sLevel.upper():
+                dResult['taxon'] = gbif_parser_taxon(dData)
+    for sPhase in ('children', 'synonyms'):
+        if sPhase not in dTasks:
+            continue
+
+        lPages = []
+        for iOffset, dJSON in oHarvester.get_pages(
+                f'species/{sGBIF_id}/{sPhase}', dTasks[sPhase][1]):
+            if dJSON is None:
+                lPages.append((iOffset, None, False))
+                break
+
+            lData = dJSON['results']
+            lPages.append((iOffset + len(lData), gbif_parser_page(lData),
+                           dJSON['endOfRecords'] or not lData))
+        dResult[sPhase] = lPages
+
+    return dResult
+
+
+def gbif_sync(oConnector, oJob, oHarvester=None):
+    """ Runs the job of synchronization with gbif. Workers of the harvester
+    fetch taxa, and the calling thread writes answers into the database.
+    Every page is saved in one transaction with the offset of the next page,
+    so the interrupted job continues from the first page, which wasn't
+    saved.
 
-def gbif_parsing_species(oConnector, dAnswer):
+    :param oConnector: An instance of the sqlite database api class.
+    :type oConnector: SQL
+    :param oJob: The job from create_job or get_last_job.
+    :type oJob: SyncJob
+    :param oHarvester: The harvester, by default, the shared one.
+    :type oHarvester: Harvester or None
+    :return: True if all tasks of the job are finished, otherwise False.
+    :rtype: bool
+    """
+    oHarvester = oHarvester or get_harvester()
+    sLevel = oConnector.get_rank_name('rankName', oJob.iRankID)[0][0]
+
+    def get_tasks():
+        """ Gives unfinished tasks with keys of taxa in gbif, if they are
+        known. Tasks are read by the calling thread, when workers need the
+        next one.
+        """
+        for iTaxonID, sName, dTasks in oJob.get_tasks():
+            sGBIF_id = next((sKey for sKey, _ in dTasks.values() if sKey),
+                            None)
+            sGBIF_id = sGBIF_id or oConnector.sql_get_id(
+                'DBIndexes', 'taxonIndex', 'taxonID, sourceID',
+                (iTaxonID, GBIF_SOURCE_ID,)) or None
+            yield iTaxonID, sName, sGBIF_id, dTasks
+
+    for tTask, dResult in oHarvester.map(
+            lambda tTask: gbif_fetch_task(tTask, sLevel, oHarvester),
+            get_tasks()):
+        if dResult is None:
+            continue
+
+        iTaxonID, sName = tTask[:2]
+        if not dResult['key']:
+            logging.warning(f'{sName} is not found in gbif.')
+            oJob.fail_taxon(iTaxonID)
+            continue
+
+        with oConnector.transaction():
+            oJob.set_key(iTaxonID, dResult['key'])
+            gbif_save_index(oConnector, iTaxonID, dResult['key'])
+            if 'taxon' in dResult:
+                if dResult['taxon']:
+                    print(f'Name: {iTaxonID}\t{sName}')
+                    gbif_update(oConnector, dResult['taxon'], iTaxonID)
+                oJob.save_task(iTaxonID, 'taxon')
+
+        for sPhase, sType in (('children', 'Children'),
+                              ('synonyms', 'Synonym')):
+            for iOffset, lAnswer, bEnd in dResult.get(sPhase, []):
+                if lAnswer is None:
+                    break
+                with oConnector.transaction():
+                    gbif_parsing_answer(oConnector, lAnswer, sType, iTaxonID)
+                    oJob.save_task(iTaxonID, sPhase, iOffset, bEnd)
+
+    return oJob.finish()
+
+
+def gbif_parsing_species(oConnector, dAnswer, iMainTaxonID=None):
     """ Specifies whether to make changes to the database.
 
     :param oConnector: An instance of the sqlite database api class.
     :type oConnector: SQL
     :param dAnswer: A dictionary with information about the taxon.
     :type dAnswer: dict[str, bool, str, str, str, str, str, int]
-    :return: None
+    :param iMainTaxonID: ID of the main taxon, by default, it is looked up by
+        the name of the parent.
+    :type iMainTaxonID: int or None
+    :return: The taxon's ID in database, or False if it is skipped.
+    :rtype: int or bool
     """
     # Exclude taxa with type name SH1169675.09FU
     if bool(re.search(r'\d', dAnswer['name'])):
-        return
+        return False
     # Exclude taxa with missing rank
     if dAnswer['rank'] == 'UNRANKED':
-        return
-
-    iLevel = oConnector.get_level_id('level_en_name',
-                                     (dAnswer['rank'].lower(),))[0][0]
-
-    bContinue = oConnector.sql_get_id('Taxon', 'id_taxon',
-                                      'id_level, taxon_lat_name, author',
-                                      (iLevel, dAnswer['name'],
-                                       dAnswer['author'],))
-    if not bContinue:
-        bContinue = gbif_save_species(oConnector, dAnswer, iLevel)
+        return False
+
+    iRankID = gbif_get_rank_id(oConnector, dAnswer['rank'])
+    if not iRankID:
+        logging.warning(f'The rank {dAnswer["rank"]} of {dAnswer["name"]} '
+                        f'is unknown.')
+        return False
+
+    iTaxonID = oConnector.get_id_by_name_author((dAnswer['name'],
+                                                 dAnswer['author'],))
+    if not iTaxonID:
+        iTaxonID = gbif_save_species(oConnector, dAnswer, iRankID,
+                                     iMainTaxonID)
     else:
-        gbif_update(oConnector, dAnswer, bContinue)
+        gbif_update(oConnector, dAnswer, iTaxonID)
 
-    bID = oConnector.sql_get_id('DBIndexes', 'id_db_index',
-                                'id_taxon', (bContinue,))
-    if not bID:
-        tValues = (bContinue, 12, dAnswer['id'],)
-        oConnector.insert_row('DBIndexes',
-                              'id_taxon, id_source, taxon_index',
-                              tValues)
+    if iTaxonID:
+        gbif_save_index(oConnector, iTaxonID, dAnswer['id'])
 
+    return iTaxonID
 
-def gbif_save_species(oConnector, dAnswer, iLevel):
+
+def gbif_save_species(oConnector, dAnswer, iLevel, iMainTaxonID=None):
     """ Saving information about the taxon in database.
 
     :param oConnector: An instance of the sqlite database api class.
@@ -399,23 +513,66 @@ def gbif_save_species(oConnector, dAnswer, iLevel):
     :type dAnswer: dict[str, bool, str, str, str, str, str, int]
     :param iLevel: The level's ID in database.
     :type iLevel: int
+    :param iMainTaxonID: ID of the main taxon, by default, it is the accepted
+        taxon with the name of the parent.
+    :type iMainTaxonID: int or None
     :return: The taxon's ID in database.
     :rtype: int or bool
     """
     print(f'Insert row - {dAnswer["name"]}')
     iStatus = gbif_get_status_id(oConnector, dAnswer['tax_status'])
-    iParent = oConnector.get_id_by_name_status((dAnswer['parent'], 1,))
+    if iMainTaxonID is None:
+        iMainTaxonID = oConnector.get_id_by_name_status((dAnswer['parent'],
+                                                         1,))
+    if not iStatus or not iMainTaxonID:
+        logging.warning(f'{dAnswer["name"]} is skipped, its status or its '
+                        f'parent {dAnswer["parent"]} is unknown.')
+        return False
 
-    sColumns = 'id_level, id_main_taxon, ' \
-               'taxon_lat_name, author, year, id_status'
-    tValues = (iLevel, iParent, dAnswer['name'],
-               dAnswer['author'], dAnswer['year'], iStatus,)
+    return oConnector.insert_taxon(dAnswer['name'], dAnswer['author'],
+                                   dAnswer['year'], None, iLevel,
+                                   iMainTaxonID, iStatus)
 
-    return oConnector.insert_row('Taxon', sColumns, tValues)
+
+def gbif_save_index(oConnector, iTaxonID, sGBIF_id):
+    """ Saves the key of the taxon in gbif, if the database hasn't it.
+
+    :param oConnector: An instance of the sqlite database api class.
+    :type oConnector: SQL
+    :param iTaxonID: The taxon's ID in database.
+    :type iTaxonID: int
+    :param sGBIF_id: A key ID of taxon in gbif.
+    :type sGBIF_id: str or int
+    :return: True if the database has the key, otherwise False.
+    :rtype: bool
+    """
+    if oConnector.sql_get_id('DBIndexes', 'dbIndexID', 'taxonID, sourceID',
+                             (iTaxonID, GBIF_SOURCE_ID,)):
+        return True
+
+    return bool(oConnector.insert_row('DBIndexes',
+                                      'taxonID, sourceID, taxonIndex',
+                                      (iTaxonID, GBIF_SOURCE_ID,
+                                       str(sGBIF_id),)))
+
+
+def gbif_get_rank_id(oConnector, sRank):
+    """ Returns the rank id from the database.
+
+    :param oConnector: An instance of the sqlite database api class.
+    :type oConnector: SQL
+    :param sRank: The name of the rank, as is customary in gbif.
+    :type sRank: str
+    :return: the rank ID.
+    :rtype: int or bool
+    """
+    sRank = sRank.lower()
+    return oConnector.get_rank_id('rankName', GBIF_RANKS.get(sRank, sRank))
 
 
 def gbif_get_status_id(oConnector, sStatus):
-    """ Returns the status id from the database.
+    """ Returns the status id from the database. A status of gbif, which the
+    database hasn't, is taken as a synonym or as accepted.
 
     :param oConnector: An instance of the sqlite database api class.
     :type oConnector: SQL
@@ -425,8 +582,13 @@ def gbif_get_status_id(oConnector, sStatus):
     :rtype: int or bool
     """
     sStatus = sStatus.lower().replace('_', ' ')
-    return oConnector.sql_get_id('TaxonStatus', 'id_status',
-                                 'status_name', (sStatus,))
+    sStatus = GBIF_STATUSES.get(sStatus, sStatus)
+    iStatusID = oConnector.get_status_id(sStatus, 'statusName')
+    if not iStatusID:
+        sStatus = 'synonym' if 'synonym' in sStatus else 'accepted'
+        iStatusID = oConnector.get_status_id(sStatus, 'statusName')
+
+    return iStatusID
 
 
 def gbif_update(oConnector, dAnswer, iTaxonID):
@@ -441,19 +603,21 @@ def gbif_update(oConnector, dAnswer, iTaxonID):
     :return: None
     """
     sName = dAnswer['name']
-    lContinue = oConnector.sql_get_values('Taxon',
-                                          'author, year, id_status, '
-                                          'id_main_taxon',
-                                          'taxon_lat_name', (sName,))
+    lContinue = oConnector.sql_get_values('Taxa', 'authorship, '
+                                          'yearPublishing',
+                                          'taxonID', (iTaxonID,))
+    if not lContinue:
+        return
 
     if not lContinue[0][0] and dAnswer['author'] and \
             dAnswer['tax_status'] == 'ACCEPTED':
-        oConnector.update('Taxon', 'author', 'id_taxon',
-                          (dAnswer['author'], iTaxonID,))
+        oConnector.update('Taxa', 'authorship, scientificName', 'taxonID',
+                          (dAnswer['author'], f'{sName} {dAnswer["author"]}',
+                           iTaxonID,))
         print(f'Enter author: {sName} - {dAnswer["author"]}')
 
     if dAnswer['year'] and not lContinue[0][1]:
-        oConnector.update('Taxon', 'year', 'id_taxon',
+        oConnector.update('Taxa', 'yearPublishing', 'taxonID',
                           (dAnswer['year'], iTaxonID,))
         print(f'Enter year: {sName} - {dAnswer["year"]}')
 
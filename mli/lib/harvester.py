@@ -0,0 +1,533 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" The module provides the harvester, which fetches JSON from the GBIF API
+by several threads. All threads share one session with a pool of keep-alive
+connections, the rate of requests is limited by a token bucket, and failed
+requests are repeated with exponential backoff. Answers can be kept in the
+cache on the disk.
+
+Function:
+    get_harvester(dProfile=None)
+    get_harvester_profile(oConfig, sSection='GBIF', sBasePath=None)
+    get_retry_after(oResponse)
+
+Class:
+    Harvester
+    TokenBucket
+
+Using:
+    oHarvester = Harvester(iWorkers=8, fRate=10)
+    dTaxon = oHarvester.get_json('species/5260765')
+    for sKey, dTaxon in oHarvester.map(fFunction, lKeys):
+        ...
+"""
+
+import json
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from random import random
+from time import monotonic, sleep
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from mli.lib.http_cache import CACHE_SIZE, CACHE_TTL, HTTPCache, \
+    get_cache_key
+from mli.lib.str import str_get_file_patch
+
+# The root of the GBIF API, paths of requests are relative to it.
+GBIF_API = 'https://api.gbif.org/v1/'
+# The max number of records in a page of paged answers of GBIF.
+PAGE_LIMIT = 1000
+# The statuses of answers, after which a request is repeated.
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+# The default options of the harvester, they can be changed in the section
+# GBIF of config.ini.
+HARVESTER_PROFILE = {'workers': 8,
+                     'rate': 10.0,
+                     'burst': 10,
+                     'retries': 4,
+                     'backoff': 0.5,
+                     'timeout': 30.0,
+                     'cache_file': '',
+                     'cache_ttl': float(CACHE_TTL),
+                     'cache_size': CACHE_SIZE}
+
+# The shared harvester, it is created at the first call of get_harvester.
+oSharedHarvester = None
+oSharedLock = threading.Lock()
+
+
+def get_harvester_profile(oConfig, sSection='GBIF', sBasePath=None):
+    """ Reads options of the harvester from the configuration file. If an
+    option is absent in the file, its default value from HARVESTER_PROFILE
+    is used.
+
+    :param oConfig: The object of the configuration file.
+    :type oConfig: ConfigParser
+    :param sSection: The section with options of the harvester.
+    :type sSection: str
+    :param sBasePath: The directory, which the path to the cache is relative
+        to, by default, the directory of the program.
+    :type sBasePath: str or None
+    :return: A dictionary with options of the harvester.
+    :rtype: dict[str, int|float]
+    """
+    dProfile = {}
+    for sOption, Default in HARVESTER_PROFILE.items():
+        if isinstance(Default, str):
+            dProfile[sOption] = oConfig.get(sSection, sOption,
+                                            fallback=Default)
+        elif isinstance(Default, int):
+            dProfile[sOption] = oConfig.getint(sSection, sOption,
+                                               fallback=Default)
+        else:
+            dProfile[sOption] = oConfig.getfloat(sSection, sOption,
+                                                 fallback=Default)
+
+    # The path to the cache is relative to the directory of the program.
+    sDir = sBasePath or getattr(oConfig, 'sDir', '')
+    if dProfile['cache_file'] and sDir:
+        dProfile['cache_file'] = str_get_file_patch(sDir,
+                                                    dProfile['cache_file'])
+
+    return dProfile
+
+
+def get_harvester(dProfile=None):
+    """ Gives the harvester, which is shared by all functions fetching from
+    GBIF, so that they use the same connections and the same limit of rate.
+
+    :param dProfile: Options of the harvester, they are used only when the
+        harvester is created.
+    :type dProfile: dict[str, int|float] or None
+    :return: The shared harvester.
+    :rtype: Harvester
+    """
+    global oSharedHarvester
+    with oSharedLock:
+        if oSharedHarvester is None:
+            dProfile = {**HARVESTER_PROFILE, **(dProfile or {})}
+            oCache = None
+            if dProfile['cache_file']:
+                oCache = HTTPCache(dProfile['cache_file'],
+                                   dProfile['cache_ttl'],
+                                   dProfile['cache_size'])
+            oSharedHarvester = Harvester(iWorkers=dProfile['workers'],
+                                         fRate=dProfile['rate'],
+                                         iBurst=dProfile['burst'],
+                                         iRetries=dProfile['retries'],
+                                         fBackoff=dProfile['backoff'],
+                                         fTimeout=dProfile['timeout'],
+                                         oCache=oCache)
+
+        return oSharedHarvester
+
+
+def get_retry_after(oResponse):
+    """ Reads the delay from the header Retry-After of the answer.
+
+    :param oResponse: The answer of the server.
+    :type oResponse: requests.Response
+    :return: The delay in seconds, or None if the header is absent or it is
+        a date.
+    :rtype: float or None
+    """
+    try:
+        return max(0.0, float(oResponse.headers['Retry-After']))
+    except (KeyError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """ A limiter of rate of requests. The bucket holds up to iBurst tokens,
+    it is refilled with fRate tokens per second, and every request takes one
+    token. When the bucket is empty, a request waits for its token, and
+    requests get tokens in the order they came.
+
+    *Methods*
+      * __init__ -- Method initializes the full bucket.
+      * acquire -- Method waits for a token and takes it.
+      * pause -- Method stops giving tokens for some time.
+    """
+
+    def __init__(self, fRate, iBurst=1):
+        """ Initializes the full bucket.
+
+        :param fRate: The number of requests per second. If it isn't
+            positive, the rate isn't limited.
+        :type fRate: float
+        :param iBurst: The number of requests which can be sent at once.
+        :type iBurst: int
+        """
+        self.fRate = fRate
+        self.fCapacity = float(max(1, iBurst))
+        self.fTokens = self.fCapacity
+        self.fTime = monotonic()
+        self.oLock = threading.Lock()
+
+    def acquire(self):
+        """ Waits for a token and takes it.
+
+        :return: Time of waiting in seconds.
+        :rtype: float
+        """
+        if self.fRate <= 0:
+            return 0.0
+
+        with self.oLock:
+            fNow = monotonic()
+            self.fTokens = min(self.fCapacity,
+                               self.fTokens + (fNow - self.fTime) * self.fRate)
+            self.fTime = fNow
+            # The token is taken in advance, so the debt of tokens is the
+            # queue of waiting requests.
+            self.fTokens -= 1
+            fWait = -self.fTokens / self.fRate if self.fTokens < 0 else 0.0
+
+        if fWait:
+            sleep(fWait)
+        return fWait
+
+    def pause(self, fSeconds):
+        """ Stops giving tokens for some time, for example, when the server
+        asks to retry after a delay.
+
+        :param fSeconds: The delay in seconds.
+        :type fSeconds: float
+        :return: None
+        """
+        if self.fRate <= 0:
+            sleep(fSeconds)
+            return
+
+        with self.oLock:
+            self.fTokens = min(self.fTokens, 0.0) - fSeconds * self.fRate
+
+
+class Harvester:
+    """ Fetches JSON from the server by several threads through one session
+    with keep-alive connections.
+
+    *Methods*
+      * __init__ -- Method creates the session and the limiter of rate.
+      * __enter__ -- Method returns the harvester.
+      * __exit__ -- Method closes the session.
+      * close -- Method closes the session.
+      * get_url -- Method makes the full URL from the path.
+      * count -- Method increases the counter of statistics.
+      * fetch -- Method sends the request, and repeats failed requests.
+      * get_json -- Method fetches JSON through the cache.
+      * get_pages -- Method fetches pages of a paged answer one by one.
+      * get_many -- Method fetches all records of a paged answer.
+      * map -- Method calls the function for items in worker threads.
+      * get_stats -- Method returns statistics of requests.
+    """
+
+    def __init__(self, sBaseURL=GBIF_API, iWorkers=8, fRate=10.0, iBurst=10,
+                 iRetries=4, fBackoff=0.5, fTimeout=30.0, oCache=None):
+        """ Creates the session and the limiter of rate.
+
+        :param sBaseURL: The root of the API.
+        :type sBaseURL: str
+        :param iWorkers: The number of threads and connections.
+        :type iWorkers: int
+        :param fRate: The max number of requests per second, or 0 if the
+            rate isn't limited.
+        :type fRate: float
+        :param iBurst: The number of requests which can be sent at once.
+        :type iBurst: int
+        :param iRetries: How many times a failed request is repeated.
+        :type iRetries: int
+        :param fBackoff: The delay before the first repeat in seconds, every
+            next delay is twice longer.
+        :type fBackoff: float
+        :param fTimeout: The timeout of a request in seconds.
+        :type fTimeout: float
+        :param oCache: The cache of answers, by default, answers aren't
+            cached.
+        :type oCache: HTTPCache or None
+        """
+        self.sBaseURL = sBaseURL
+        self.oCache = oCache
+        self.iWorkers = max(1, iWorkers)
+        self.iRetries = iRetries
+        self.fBackoff = fBackoff
+        self.fTimeout = fTimeout
+        self.oBucket = TokenBucket(fRate, iBurst)
+
+        # Requests are repeated by the harvester, so the adapter doesn't do
+        # it, and threads wait for a free connection instead of opening new.
+        self.oSession = requests.Session()
+        oAdapter = HTTPAdapter(pool_connections=1,
+                               pool_maxsize=self.iWorkers,
+                               pool_block=True, max_retries=0)
+        self.oSession.mount('http://', oAdapter)
+        self.oSession.mount('https://', oAdapter)
+
+        self.oLock = threading.Lock()
+        self.iRequests = 0
+        self.iRetried = 0
+        self.iFailed = 0
+
+    def __enter__(self):
+        """ Returns the harvester for the with statement.
+
+        :return: The harvester.
+        :rtype: Harvester
+        """
+        return self
+
+    def __exit__(self, oType, oValue, oTraceback):
+        """ Closes the session at the end of the with statement. """
+        self.close()
+
+    def close(self):
+        """ Closes the session and its connections, and the cache. """
+        self.oSession.close()
+        if self.oCache is not None:
+            self.oCache.close()
+
+    def get_url(self, sPath):
+        """ Makes the full URL from the path relative to the root of the API.
+        A full URL is returned as it is.
+
+        :param sPath: The path or the URL.
+        :type sPath: str
+        :return: The URL.
+        :rtype: str
+        """
+        return urljoin(self.sBaseURL, sPath)
+
+    def count(self, sCounter):
+        """ Increases the counter of statistics.
+
+        :param sCounter: The name of the attribute with the counter.
+        :type sCounter: str
+        :return: None
+        """
+        with self.oLock:
+            setattr(self, sCounter, getattr(self, sCounter) + 1)
+
+    def fetch(self, sURL, dParams=None, dHeaders=None):
+        """ Sends the request. A request, which failed because of the network
+        or errors of the server, is repeated after a delay. If the server
+        asks to wait, all threads wait.
+
+        :param sURL: The URL.
+        :type sURL: str
+        :param dParams: Parameters of the query.
+        :type dParams: dict or None
+        :param dHeaders: Headers of the request.
+        :type dHeaders: dict or None
+        :return: The answer, or None if it wasn't got after all repeats.
+        :rtype: requests.Response or None
+        """
+        sError = ''
+        for iAttempt in range(self.iRetries + 1):
+            if iAttempt:
+                self.count('iRetried')
+            self.oBucket.acquire()
+            self.count('iRequests')
+            fDelay = None
+            try:
+                oResponse = self.oSession.get(sURL, params=dParams,
+                                              headers=dHeaders,
+                                              timeout=self.fTimeout)
+            except requests.RequestException as e:
+                sError = str(e)
+            else:
+                if oResponse.status_code not in RETRY_STATUSES:
+                    return oResponse
+
+                sError = f'HTTP {oResponse.status_code}'
+                fDelay = get_retry_after(oResponse)
+
+            if iAttempt == self.iRetries:
+                break
+            if fDelay is not None:
+                self.oBucket.pause(fDelay)
+            else:
+                # The jitter spreads repeats of threads which failed
+                # together.
+                sleep(self.fBackoff * 2 ** iAttempt * (0.5 + random()))
+
+        self.count('iFailed')
+        logging.error(f'{sURL} {dParams} failed after {self.iRetries + 1} '
+                      f'attempts: {sError}.')
+        return None
+
+    def get_json(self, sPath, dParams=None):
+        """ Fetches JSON. If the harvester has the cache, a fresh answer is
+        taken from it without a request, an old one is revalidated, and it is
+        used when the server fails.
+
+        :param sPath: The path relative to the root of the API, or the URL.
+        :type sPath: str
+        :param dParams: Parameters of the query.
+        :type dParams: dict or None
+        :return: The answer, or None if it wasn't got.
+        :rtype: dict or list or None
+        """
+        sURL = self.get_url(sPath)
+        oCache = self.oCache
+        sKey = None
+        dEntry = None
+        dHeaders = None
+        if oCache is not None:
+            sKey = get_cache_key(sURL, dParams)
+            dEntry = oCache.get(sKey)
+            if dEntry is not None and oCache.is_fresh(dEntry):
+                oCache.count('hits')
+                return json.loads(dEntry['body'])
+            if dEntry is not None:
+                dHeaders = {}
+                if dEntry['etag']:
+                    dHeaders['If-None-Match'] = dEntry['etag']
+                if dEntry['last_modified']:
+                    dHeaders['If-Modified-Since'] = dEntry['last_modified']
+
+        oResponse = self.fetch(sURL, dParams, dHeaders)
+        if oResponse is None:
+            if dEntry is None:
+                return None
+            oCache.count('stale')
+            logging.warning(f'The old answer of {sKey} is used.')
+            return json.loads(dEntry['body'])
+
+        if oResponse.status_code == 304 and dEntry is not None:
+            oCache.refresh(sKey)
+            oCache.count('revalidated')
+            return json.loads(dEntry['body'])
+
+        if not oResponse.ok:
+            logging.warning(f'{sURL} {dParams} answered '
+                            f'{oResponse.status_code}.')
+            return None
+
+        try:
+            Answer = oResponse.json()
+        except ValueError as e:
+            logging.error(f'{sURL} {dParams} answered not JSON: {e}.')
+            return None
+
+        if oCache is not None:
+            oCache.count('misses')
+            oCache.put(sKey, oResponse.content,
+                       oResponse.headers.get('ETag'),
+                       oResponse.headers.get('Last-Modified'))
+        return Answer
+
+    def get_pages(self, sPath, iOffset=0, iLimit=PAGE_LIMIT):
+        """ Fetches pages of the paged answer one by one, until the last
+        page.
+
+        :param sPath: The path relative to the root of the API, or the URL.
+        :type sPath: str
+        :param iOffset: The offset of the first record.
+        :type iOffset: int
+        :param iLimit: The number of records in a page.
+        :type iLimit: int
+        :return: Tuples with the offset of the page and the page. The page is
+            None if it wasn't got, and then pages are over.
+        :rtype: Iterator[tuple[int, dict|None]]
+        """
+        while True:
+            dPage = self.get_json(sPath, {'limit': iLimit, 'offset': iOffset})
+            if not isinstance(dPage, dict):
+                yield iOffset, None
+                return
+
+            yield iOffset, dPage
+            if dPage.get('endOfRecords', True) or not dPage.get('results'):
+                return
+            iOffset = iOffset + iLimit
+
+    def get_many(self, sPath, iLimit=PAGE_LIMIT):
+        """ Fetches all records of the paged answer.
+
+        :param sPath: The path relative to the root of the API, or the URL.
+        :type sPath: str
+        :param iLimit: The number of records in a page.
+        :type iLimit: int
+        :return: The records, or None if a page wasn't got.
+        :rtype: list[dict] or None
+        """
+        lRecords = []
+        for _, dPage in self.get_pages(sPath, 0, iLimit):
+            if dPage is None:
+                return None
+            lRecords.extend(dPage.get('results') or [])
+
+        return lRecords
+
+    def map(self, fFunction, oItems):
+        """ Calls the function for the items in worker threads. Items are
+        taken from the iterator as workers become free, so the iterator can
+        be lazy and long. Results are returned in the order of items, and the
+        caller can process them, for example, write to the database, while
+        the workers fetch the next items.
+
+        :param fFunction: The function which takes an item.
+        :type fFunction: function
+        :param oItems: Items for the function.
+        :type oItems: Iterable
+        :return: Tuples with the item and the result of the function, the
+            result is None if the function raised an exception.
+        :rtype: Iterator[tuple]
+        """
+        iWindow = self.iWorkers * 2
+        with ThreadPoolExecutor(self.iWorkers) as oExecutor:
+            dqFutures = deque()
+            oItems = iter(oItems)
+            while True:
+                for Item in oItems:
+                    dqFutures.append((Item, oExecutor.submit(fFunction,
+                                                             Item)))
+                    if len(dqFutures) >= iWindow:
+                        break
+                if not dqFutures:
+                    return
+
+                Item, oFuture = dqFutures.popleft()
+                try:
+                    Result = oFuture.result()
+                except Exception as e:
+                    logging.exception(f'The item {Item} failed: {e}.')
+                    Result = None
+                yield Item, Result
+
+    def get_stats(self):
+        """ Returns statistics of requests.
+
+        :return: A dictionary with the number of sent requests, repeated
+            requests and requests which failed after all repeats.
+        :rtype: dict[str, int]
+        """
+        with self.oLock:
+            return {'requests': self.iRequests,
+                    'retried': self.iRetried,
+                    'failed': self.iFailed}
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,320 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" The module keeps answers of the server in a side SQLite database, so
+that a harvest, which is run again, takes answers from the disk.
+
+An answer is fresh during its time to live, and it is returned without a
+request. When the time is over, the answer is revalidated by ETag and
+Last-Modified, and the server sends it again only if it has changed. The
+least recently used answers are removed, when the size of the cache is
+more than the limit.
+
+Function:
+    get_cache_key(sURL, dParams=None)
+
+Class:
+    HTTPCache
+
+Using:
+    oCache = HTTPCache('gbif_cache.db')
+    sKey = get_cache_key(sURL, dParams)
+    dEntry = oCache.get(sKey)
+    if dEntry is None:
+        oCache.put(sKey, bBody, sETag, sLastModified)
+"""
+
+import logging
+import sqlite3
+import threading
+import zlib
+from sqlite3 import DatabaseError
+from time import time
+from urllib.parse import urlencode
+
+from mli.lib.sql import set_pragmas
+
+# The time to live of answers, a week.
+CACHE_TTL = 7 * 24 * 3600
+# The max size of compressed answers in the cache, 256 MB.
+CACHE_SIZE = 256 * 1024 * 1024
+# After eviction, the cache takes this share of its max size.
+EVICTION_RATE = 0.9
+
+CACHE_STRUCTURE = """
+CREATE TABLE IF NOT EXISTS HTTPCache (
+    cacheKey     TEXT PRIMARY KEY,
+    body         BLOB NOT NULL,
+    etag         TEXT,
+    lastModified TEXT,
+    stored       REAL NOT NULL,
+    accessed     REAL NOT NULL,
+    size         INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS idxHTTPCacheAccessed ON HTTPCache (accessed);
+"""
+
+
+def get_cache_key(sURL, dParams=None):
+    """ Makes the key of the answer from the URL and parameters of the query.
+    Parameters are sorted, so their order doesn't matter.
+
+    :param sURL: The URL of the request.
+    :type sURL: str
+    :param dParams: Parameters of the query.
+    :type dParams: dict or None
+    :return: The key of the answer.
+    :rtype: str
+    """
+    if not dParams:
+        return sURL
+
+    sQuery = urlencode(sorted((str(sKey), str(Value))
+                              for sKey, Value in dParams.items()))
+    return f'{sURL}?{sQuery}'
+
+
+class HTTPCache:
+    """ The cache of answers of the server in the SQLite database. It can be
+    used by several threads.
+
+    *Methods*
+      * __init__ -- Method opens the database of the cache.
+      * __len__ -- Method returns the number of answers in the cache.
+      * close -- Method closes the database.
+      * get -- Method gives the answer by its key.
+      * is_fresh -- Method checks that the answer is in its time to live.
+      * put -- Method adds the answer.
+      * refresh -- Method starts again the time to live of the answer.
+      * count -- Method increases the counter of statistics.
+      * evict -- Method removes the least recently used answers.
+      * clear -- Method removes all answers.
+      * get_stats -- Method gives counters of the cache.
+    """
+
+    def __init__(self, sFile=':memory:', fTTL=CACHE_TTL, iMaxSize=CACHE_SIZE):
+        """ Opens the database of the cache, and creates it if it is absent.
+
+        :param sFile: The path to the database of the cache.
+        :type sFile: str
+        :param fTTL: The time to live of answers in seconds.
+        :type fTTL: float
+        :param iMaxSize: The max size of answers in the cache in bytes.
+        :type iMaxSize: int
+        """
+        self.fTTL = fTTL
+        self.iMaxSize = iMaxSize
+        self.oLock = threading.Lock()
+        self.dStats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stale': 0,
+                       'stores': 0, 'evictions': 0}
+        self.oConnection = sqlite3.connect(sFile, check_same_thread=False,
+                                           isolation_level=None)
+        set_pragmas(self.oConnection, {'journal_mode': 'WAL',
+                                       'synchronous': 'NORMAL'})
+        self.oConnection.executescript(CACHE_STRUCTURE)
+        self.iSize = self.oConnection.execute(
+            'SELECT IFNULL(SUM(size), 0) FROM HTTPCache;').fetchone()[0]
+
+    def __len__(self):
+        """ Returns the number of answers in the cache.
+
+        :return: The number of answers.
+        :rtype: int
+        """
+        with self.oLock:
+            return self.oConnection.execute(
+                'SELECT COUNT(*) FROM HTTPCache;').fetchone()[0]
+
+    def close(self):
+        """ Closes the database of the cache. """
+        with self.oLock:
+            self.oConnection.close()
+
+    def get(self, sKey):
+        """ Gives the answer by its key, fresh or not. The answer becomes the
+        most recently used.
+
+        :param sKey: The key from get_cache_key.
+        :type sKey: str
+        :return: A dictionary with the body, 'etag', 'last_modified' and the
+            time of storing, or None if the cache hasn't the answer.
+        :rtype: dict[str, bytes|str|float] or None
+        """
+        with self.oLock:
+            try:
+                tRow = self.oConnection.execute(
+                    'SELECT body, etag, lastModified, stored FROM HTTPCache '
+                    'WHERE cacheKey=?;', (sKey,)).fetchone()
+                if tRow is not None:
+                    self.oConnection.execute(
+                        'UPDATE HTTPCache SET accessed=? WHERE cacheKey=?;',
+                        (time(), sKey,))
+            except DatabaseError as e:
+                logging.exception(f'The cache can not read {sKey}: {e}.')
+                return None
+
+        if tRow is None:
+            return None
+
+        return {'body': zlib.decompress(tRow[0]),
+                'etag': tRow[1],
+                'last_modified': tRow[2],
+                'stored': tRow[3]}
+
+    def is_fresh(self, dEntry):
+        """ Checks that the answer is in its time to live.
+
+        :param dEntry: The answer from get.
+        :type dEntry: dict[str, bytes|str|float]
+        :return: True if the answer can be used without a request.
+        :rtype: bool
+        """
+        return time() - dEntry['stored'] < self.fTTL
+
+    def put(self, sKey, bBody, sETag=None, sLastModified=None):
+        """ Adds the answer to the cache, or replaces it.
+
+        :param sKey: The key from get_cache_key.
+        :type sKey: str
+        :param bBody: The body of the answer.
+        :type bBody: bytes
+        :param sETag: The header ETag of the answer.
+        :type sETag: str or None
+        :param sLastModified: The header Last-Modified of the answer.
+        :type sLastModified: str or None
+        :return: True if the answer is added, otherwise False.
+        :rtype: bool
+        """
+        bBody = zlib.compress(bBody)
+        fNow = time()
+        with self.oLock:
+            try:
+                tRow = self.oConnection.execute(
+                    'SELECT size FROM HTTPCache WHERE cacheKey=?;',
+                    (sKey,)).fetchone()
+                self.oConnection.execute(
+                    'INSERT OR REPLACE INTO HTTPCache (cacheKey, body, etag, '
+                    'lastModified, stored, accessed, size) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?);',
+                    (sKey, bBody, sETag, sLastModified, fNow, fNow,
+                     len(bBody),))
+            except DatabaseError as e:
+                logging.exception(f'The cache can not store {sKey}: {e}.')
+                return False
+
+            self.iSize = self.iSize + len(bBody) - (tRow[0] if tRow else 0)
+            self.dStats['stores'] += 1
+            bEvict = self.iSize > self.iMaxSize
+
+        if bEvict:
+            self.evict()
+        return True
+
+    def refresh(self, sKey):
+        """ Starts again the time to live of the answer, when the server has
+        confirmed that it hasn't changed.
+
+        :param sKey: The key from get_cache_key.
+        :type sKey: str
+        :return: None
+        """
+        with self.oLock:
+            try:
+                self.oConnection.execute(
+                    'UPDATE HTTPCache SET stored=? WHERE cacheKey=?;',
+                    (time(), sKey,))
+            except DatabaseError as e:
+                logging.exception(f'The cache can not refresh {sKey}: {e}.')
+
+    def count(self, sCounter):
+        """ Increases the counter of statistics: 'hits' for fresh answers,
+        'misses' for answers which were fetched, 'revalidated' for answers
+        which the server has confirmed, and 'stale' for old answers which
+        were used because the server failed.
+
+        :param sCounter: The name of the counter.
+        :type sCounter: str
+        :return: None
+        """
+        with self.oLock:
+            self.dStats[sCounter] += 1
+
+    def evict(self):
+        """ Removes the least recently used answers, until the size of the
+        cache is less than its limit.
+
+        :return: The number of removed answers.
+        :rtype: int
+        """
+        iTarget = int(self.iMaxSize * EVICTION_RATE)
+        iRemoved = 0
+        with self.oLock:
+            try:
+                self.oConnection.execute('BEGIN;')
+                oCursor = self.oConnection.execute(
+                    'SELECT cacheKey, size FROM HTTPCache '
+                    'ORDER BY accessed;')
+                lKeys = []
+                iSize = self.iSize
+                for sKey, iRowSize in oCursor:
+                    if iSize <= iTarget:
+                        break
+                    lKeys.append((sKey,))
+                    iSize = iSize - iRowSize
+                oCursor.close()
+                self.oConnection.executemany(
+                    'DELETE FROM HTTPCache WHERE cacheKey=?;', lKeys)
+                self.oConnection.execute('COMMIT;')
+            except DatabaseError as e:
+                self.oConnection.execute('ROLLBACK;')
+                logging.exception(f'The cache can not evict answers: {e}.')
+                return 0
+
+            iRemoved = len(lKeys)
+            self.iSize = iSize
+            self.dStats['evictions'] += iRemoved
+
+        return iRemoved
+
+    def clear(self):
+        """ Removes all answers from the cache. """
+        with self.oLock:
+            self.oConnection.execute('DELETE FROM HTTPCache;')
+            self.iSize = 0
+
+    def get_stats(self):
+        """ Gives counters of the cache.
+
+        :return: A dictionary with the numbers of hits, misses, revalidated
+            and stale answers, stored and evicted answers, the share of
+            answers which were taken from the cache, the size of the cache in
+            bytes and its max size.
+        :rtype: dict[str, int or float]
+        """
+        with self.oLock:
+            dStats = dict(self.dStats)
+            dStats['size'] = self.iSize
+
+        iCached = dStats['hits'] + dStats['revalidated'] + dStats['stale']
+        iRequests = iCached + dStats['misses']
+        dStats['hit_rate'] = iCached / iRequests if iRequests else 0.0
+        dStats['max_size'] = self.iMaxSize
+        return dStats
+
+
+if __name__ == '__main__':
+    pass
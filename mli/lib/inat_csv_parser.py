@@ -17,9 +17,15 @@
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import csv
+import logging
 
 from mli.lib.sql import SQL
 
+# The min similarity of a name with typos to the name in the database, so
+# that it is suggested in the log. Different species can be as similar, so
+# the index isn't saved without confirmation.
+NAME_SIMILARITY = 0.8
+
 
 def inat_get_file(oConnector):
     with open('../../db/inat.csv', newline='') as fCSVFile:
@@ -28,26 +34,38 @@ def inat_get_file(oConnector):
 
 
 def inat_parser(oConnector, oData):
-    for lRow in oData:
-        sName, sIDiNat = lRow['Name'], lRow['ID']
-
-        iTaxonID = 0
-        tAnswer = oConnector.sql_get_values('Taxon', 'id_taxon',
-                                            'taxon_name, id_status',
-                                            (sName, 1,))
-        if tAnswer:
-            iTaxonID = tAnswer[0][0]
-
-        iID = oConnector.sql_get_values('DBIndexes', 'id_db_index',
-                                        'id_taxon, id_source',
-                                        (iTaxonID, 1))
-        iIDiNat = sIDiNat.replace('https://www.inaturalist.org/taxa/', '')
-        print(sName)
-
-        if iTaxonID and not iID:
-            oConnector.insert_row('DBIndexes',
-                                  'id_taxon, id_source, taxon_index',
-                                  (iTaxonID, 1, iIDiNat,))
+    # The whole file is committed once, and every row is saved in its own
+    # savepoint, so a broken row doesn't discard the others.
+    with oConnector.transaction():
+        for lRow in oData:
+            with oConnector.transaction():
+                inat_parser_row(oConnector, lRow)
+
+
+def inat_parser_row(oConnector, lRow):
+    sName, sIDiNat = lRow['Name'], lRow['ID']
+
+    # Only the accepted taxon gets the index, a synonym can have the same
+    # canonical name.
+    iTaxonID = oConnector.get_id_by_name_status((sName, 1,))
+    if not iTaxonID:
+        # The name can be written with a typo or in other orthography, but
+        # a similar name can be another species, so it is only suggested.
+        for _, sMatchName, fSimilarity in oConnector.match_name(
+                sName, NAME_SIMILARITY, 3):
+            logging.warning(f'{sName} is not found, it may be {sMatchName} '
+                            f'(similarity {fSimilarity:.2f}). The index '
+                            f'{sIDiNat} is not saved.')
+
+    iID = oConnector.sql_get_id('DBIndexes', 'dbIndexID',
+                                'taxonID, sourceID', (iTaxonID, 1,))
+    iIDiNat = sIDiNat.replace('https://www.inaturalist.org/taxa/', '')
+    print(sName)
+
+    if iTaxonID and not iID:
+        oConnector.insert_row('DBIndexes',
+                              'taxonID, sourceID, taxonIndex',
+                              (iTaxonID, 1, iIDiNat,))
 
 
 if __name__ == '__main__':
@@ -17,6 +17,7 @@
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 from logging import basicConfig
+from time import perf_counter
 import logging
 import sys
 
@@ -30,3 +31,47 @@ def start_logging():
     oStream = logging.StreamHandler(sys.stdout)
 
     return logging.getLogger(__name__).addHandler(oStream)
+
+
+class StartupProfiler:
+    """ Measures time of phases of the program start. The time is printed
+    only if the program is started with the flag --profile-startup.
+
+    *Using*:
+        ::
+
+            oProfiler = StartupProfiler('--profile-startup' in sys.argv)
+            ...
+            oProfiler.mark('import modules')
+            oProfiler.report()
+    """
+
+    def __init__(self, bEnabled=False):
+        """ Starts measuring.
+
+        :param bEnabled: Whether the time should be printed.
+        :type bEnabled: bool
+        """
+        self.bEnabled = bEnabled
+        self.fStart = perf_counter()
+        self.fLast = self.fStart
+        self.lPhases = []
+
+    def mark(self, sPhase):
+        """ Finishes the phase, which started with the previous mark.
+
+        :param sPhase: The name of the phase.
+        :type sPhase: str
+        """
+        fNow = perf_counter()
+        self.lPhases.append((sPhase, fNow - self.fLast))
+        self.fLast = fNow
+
+    def report(self):
+        """ Prints time of every phase and the total time in milliseconds. """
+        if not self.bEnabled:
+            return
+
+        for sPhase, fTime in self.lPhases:
+            print(f'{sPhase:<24}{fTime * 1000:>10.1f} ms')
+        print(f'{"total":<24}{(self.fLast - self.fStart) * 1000:>10.1f} ms')
@@ -0,0 +1,377 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" The module contains versioned migrations of the database schema. The
+dump of the database is generated by SQLiteStudio, so everything that is not
+a part of the dump (indexes, service tables and so on) is added here.
+
+Every migration is a tuple of a version number, a short description and a SQL
+script which brings the schema to this version. The applied versions are
+written in the table SchemaVersions. Scripts have to be idempotent, because
+they are applied again after the database has been restored from the dump.
+
+Function:
+    get_page_cache_triggers()
+    get_schema_version(oConnector)
+    log_duplicate_indexes(oConnector)
+    migrate_db(oConnector)
+    reset_schema_version(oConnector)
+
+Using:
+    migrate_db(oConnector)
+"""
+
+import logging
+
+# The max depth of walks on TaxonTree. It protects recursive queries from
+# endless loops, if the tree has a cycle by mistake.
+MAX_TREE_DEPTH = 64
+
+# Fills the closure of TaxonTree. Every taxon is its own ancestor with depth
+# 0, and accepted taxa are linked with all taxa above them.
+TAXON_CLOSURE = 'DELETE FROM TaxonClosure; ' \
+                'INSERT OR IGNORE INTO TaxonClosure ' \
+                '(ancestorID, descendantID, depth) ' \
+                'WITH RECURSIVE Closure(ancestorID, descendantID, depth) ' \
+                'AS (SELECT taxonID, taxonID, 0 FROM Taxa ' \
+                'UNION ALL ' \
+                'SELECT Closure.ancestorID, TaxonTree.taxonID, ' \
+                'Closure.depth + 1 ' \
+                'FROM Closure ' \
+                'JOIN TaxonTree ' \
+                'ON TaxonTree.mainTaxonID=Closure.descendantID ' \
+                'WHERE TaxonTree.statusID=1 ' \
+                'AND TaxonTree.taxonID<>TaxonTree.mainTaxonID ' \
+                f'AND Closure.depth<{MAX_TREE_DEPTH}) ' \
+                'SELECT ancestorID, descendantID, MIN(depth) FROM Closure ' \
+                'GROUP BY ancestorID, descendantID;'
+
+# Removes links of the subtree of the deleted taxon with taxa above it from
+# the closure of TaxonTree, as SQL.unlink_closure does. Pages of these taxa
+# are deleted from the cache before, since they show the number of
+# descendants, and other triggers can't find them after the links are gone.
+CLOSURE_UNLINK = 'DELETE FROM PageCache WHERE (taxonID, lang) IN (' \
+                 'SELECT taxonID, lang FROM PageCacheDependencies ' \
+                 'WHERE dependencyID IN (SELECT ancestorID ' \
+                 'FROM TaxonClosure WHERE descendantID=old.taxonID)); ' \
+                 'DELETE FROM TaxonClosure ' \
+                 'WHERE descendantID IN (SELECT descendantID ' \
+                 'FROM TaxonClosure WHERE ancestorID=old.taxonID) ' \
+                 'AND ancestorID NOT IN (SELECT descendantID ' \
+                 'FROM TaxonClosure WHERE ancestorID=old.taxonID);'
+
+# Triggers keep the closure of TaxonTree after deletes, which don't go
+# through set_main_taxon and set_taxon_status, as the triggers of TaxaSearch
+# keep the full-text index. The deleted taxon also loses its own rows. The
+# closure is filled again to drop rows left by deletes before.
+TAXON_CLOSURE_TRIGGERS = 'CREATE TRIGGER IF NOT EXISTS ' \
+                         'trgTaxonClosureTaxonTreeDelete ' \
+                         'AFTER DELETE ON TaxonTree ' \
+                         'WHEN old.statusID=1 ' \
+                         'AND old.taxonID<>old.mainTaxonID BEGIN ' \
+                         f'{CLOSURE_UNLINK} END;' \
+                         'CREATE TRIGGER IF NOT EXISTS ' \
+                         'trgTaxonClosureTaxaDelete ' \
+                         'AFTER DELETE ON Taxa BEGIN ' \
+                         f'{CLOSURE_UNLINK} ' \
+                         'DELETE FROM TaxonClosure ' \
+                         'WHERE ancestorID=old.taxonID ' \
+                         'OR descendantID=old.taxonID; END;' \
+                         f'{TAXON_CLOSURE}'
+
+# Local names of the taxon as one string for the full-text index.
+LOCAL_NAMES = '(SELECT group_concat(localName, \' \') FROM LocalNames ' \
+              'WHERE LocalNames.taxonID={}.taxonID)'
+
+# The full-text index of names of taxa, where rowid is taxonID of Taxa. It is
+# kept up to date by triggers on Taxa and LocalNames.
+TAXA_SEARCH = 'CREATE VIRTUAL TABLE IF NOT EXISTS TaxaSearch USING fts5(' \
+              'scientificName, canonicalName, authorship, localNames, ' \
+              'tokenize="unicode61 remove_diacritics 2", prefix=\'2 3\');' \
+              'CREATE TRIGGER IF NOT EXISTS trgTaxaSearchInsert ' \
+              'AFTER INSERT ON Taxa BEGIN ' \
+              'INSERT INTO TaxaSearch (rowid, scientificName, ' \
+              'canonicalName, authorship, localNames) ' \
+              'VALUES (new.taxonID, new.scientificName, new.canonicalName, ' \
+              f'new.authorship, {LOCAL_NAMES.format("new")}); END;' \
+              'CREATE TRIGGER IF NOT EXISTS trgTaxaSearchUpdate ' \
+              'AFTER UPDATE OF taxonID, scientificName, canonicalName, ' \
+              'authorship ON Taxa BEGIN ' \
+              'DELETE FROM TaxaSearch WHERE rowid=old.taxonID; ' \
+              'INSERT INTO TaxaSearch (rowid, scientificName, ' \
+              'canonicalName, authorship, localNames) ' \
+              'VALUES (new.taxonID, new.scientificName, new.canonicalName, ' \
+              f'new.authorship, {LOCAL_NAMES.format("new")}); END;' \
+              'CREATE TRIGGER IF NOT EXISTS trgTaxaSearchDelete ' \
+              'AFTER DELETE ON Taxa BEGIN ' \
+              'DELETE FROM TaxaSearch WHERE rowid=old.taxonID; END;' \
+              'CREATE TRIGGER IF NOT EXISTS trgLocalNamesSearchInsert ' \
+              'AFTER INSERT ON LocalNames BEGIN ' \
+              'UPDATE TaxaSearch ' \
+              f'SET localNames={LOCAL_NAMES.format("new")} ' \
+              'WHERE rowid=new.taxonID; END;' \
+              'CREATE TRIGGER IF NOT EXISTS trgLocalNamesSearchUpdate ' \
+              'AFTER UPDATE ON LocalNames BEGIN ' \
+              'UPDATE TaxaSearch ' \
+              f'SET localNames={LOCAL_NAMES.format("old")} ' \
+              'WHERE rowid=old.taxonID; ' \
+              'UPDATE TaxaSearch ' \
+              f'SET localNames={LOCAL_NAMES.format("new")} ' \
+              'WHERE rowid=new.taxonID; END;' \
+              'CREATE TRIGGER IF NOT EXISTS trgLocalNamesSearchDelete ' \
+              'AFTER DELETE ON LocalNames BEGIN ' \
+              'UPDATE TaxaSearch ' \
+              f'SET localNames={LOCAL_NAMES.format("old")} ' \
+              'WHERE rowid=old.taxonID; END;' \
+              'DELETE FROM TaxaSearch;' \
+              'INSERT INTO TaxaSearch (rowid, scientificName, ' \
+              'canonicalName, authorship, localNames) ' \
+              'SELECT taxonID, scientificName, canonicalName, authorship, ' \
+              f'{LOCAL_NAMES.format("Taxa")} FROM Taxa;'
+
+# Rendered pages of taxa, which are kept between runs of the program. A page
+# depends on the taxa which it shows (the taxon, its main taxon, synonyms,
+# children and the classification), and it is deleted by triggers, when any
+# of them is changed. Triggers are made by get_page_cache_triggers.
+PAGE_CACHE = 'CREATE TABLE IF NOT EXISTS PageCache (' \
+             'taxonID INTEGER NOT NULL, ' \
+             'lang    TEXT NOT NULL, ' \
+             'page    TEXT, ' \
+             'PRIMARY KEY (taxonID, lang)) WITHOUT ROWID;' \
+             'CREATE TABLE IF NOT EXISTS PageCacheDependencies (' \
+             'dependencyID INTEGER NOT NULL, ' \
+             'taxonID      INTEGER NOT NULL, ' \
+             'lang         TEXT NOT NULL, ' \
+             'PRIMARY KEY (dependencyID, taxonID, lang)) WITHOUT ROWID;' \
+             'CREATE TRIGGER IF NOT EXISTS trgPageCacheDelete ' \
+             'AFTER DELETE ON PageCache BEGIN ' \
+             'DELETE FROM PageCacheDependencies ' \
+             'WHERE taxonID=old.taxonID AND lang=old.lang; END;' \
+             'DELETE FROM PageCache;'
+# Tables and events, which change pages, with IDs of the changed taxa.
+PAGE_CACHE_EVENTS = (('Taxa', 'UPDATE', 'old.taxonID'),
+                     ('Taxa', 'DELETE', 'old.taxonID'),
+                     ('TaxonTree', 'INSERT', 'new.taxonID, new.mainTaxonID'),
+                     ('TaxonTree', 'UPDATE', 'old.taxonID, new.mainTaxonID'),
+                     ('TaxonTree', 'DELETE', 'old.taxonID'),
+                     ('DBIndexes', 'INSERT', 'new.taxonID'),
+                     ('DBIndexes', 'UPDATE', 'old.taxonID, new.taxonID'),
+                     ('DBIndexes', 'DELETE', 'old.taxonID'))
+
+
+def get_page_cache_triggers():
+    """ Makes triggers, which delete pages of the cache, when taxa shown on
+    them are changed. The number of descendants is shown on the page too, so
+    changes of TaxonTree also delete pages of all ancestors of changed taxa.
+
+    :return: The SQL script of triggers.
+    :rtype: str
+    """
+    lTriggers = []
+    for sTable, sEvent, sTaxonIDs in PAGE_CACHE_EVENTS:
+        if sTable == 'TaxonTree':
+            sTaxonIDs = f'SELECT ancestorID FROM TaxonClosure ' \
+                        f'WHERE descendantID IN ({sTaxonIDs}) ' \
+                        f'UNION VALUES ({sTaxonIDs.replace(", ", "), (")})'
+        lTriggers.append('CREATE TRIGGER IF NOT EXISTS '
+                         f'trgPageCache{sTable}{sEvent.capitalize()} '
+                         f'AFTER {sEvent} ON {sTable} BEGIN '
+                         'DELETE FROM PageCache WHERE (taxonID, lang) IN ('
+                         'SELECT taxonID, lang FROM PageCacheDependencies '
+                         f'WHERE dependencyID IN ({sTaxonIDs})); END;')
+
+    return ''.join(lTriggers)
+
+
+# The condition of rows of DBIndexes, which repeat the taxon and the source of
+# the row with the less ID. Before the index on the taxon and the source
+# becomes unique, they are moved into DBIndexesDuplicates, so they aren't
+# lost, and they can be checked and returned by hand.
+DBINDEXES_DUPLICATE = 'taxonID IS NOT NULL AND sourceID IS NOT NULL AND ' \
+                      'dbIndexID NOT IN (SELECT MIN(dbIndexID) ' \
+                      'FROM DBIndexes GROUP BY taxonID, sourceID)'
+
+# Jobs of synchronization of taxa with other sources. A job has tasks for
+# every taxon of the rank and every phase, a paged phase keeps the offset of
+# the next page, so the job continues from the page where it stopped.
+SYNC_JOBS = 'CREATE TABLE IF NOT EXISTS SyncJobs (' \
+            'jobID    INTEGER PRIMARY KEY, ' \
+            'source   TEXT NOT NULL, ' \
+            'rankID   INTEGER REFERENCES TaxonRanks (rankID), ' \
+            "status   TEXT NOT NULL DEFAULT 'running', " \
+            "started  TEXT DEFAULT (datetime('now')), " \
+            'finished TEXT);' \
+            'CREATE TABLE IF NOT EXISTS SyncTasks (' \
+            'jobID      INTEGER NOT NULL REFERENCES SyncJobs (jobID), ' \
+            'taxonID    INTEGER NOT NULL REFERENCES Taxa (taxonID), ' \
+            'phase      TEXT NOT NULL, ' \
+            'sourceKey  TEXT, ' \
+            'pageOffset INTEGER NOT NULL DEFAULT 0, ' \
+            "status     TEXT NOT NULL DEFAULT 'pending', " \
+            'PRIMARY KEY (jobID, taxonID, phase)) WITHOUT ROWID;' \
+            'CREATE INDEX IF NOT EXISTS idxSyncTasksStatus ' \
+            'ON SyncTasks (jobID, status, taxonID);'
+
+MIGRATIONS = (
+    (1, 'Indexes on the lookup columns of Taxa, TaxonTree and DBIndexes',
+     'CREATE INDEX IF NOT EXISTS idxTaxaScientificName '
+     'ON Taxa (scientificName);'
+     'CREATE INDEX IF NOT EXISTS idxTaxaCanonicalName '
+     'ON Taxa (canonicalName);'
+     'CREATE INDEX IF NOT EXISTS idxTaxonTreeTaxonID '
+     'ON TaxonTree (taxonID);'
+     'CREATE INDEX IF NOT EXISTS idxTaxonTreeMainTaxonID '
+     'ON TaxonTree (mainTaxonID, statusID);'
+     'CREATE INDEX IF NOT EXISTS idxDBIndexesTaxonSource '
+     'ON DBIndexes (taxonID, sourceID);'),
+    (2, 'One index of a taxon in every source of DBIndexes',
+     'CREATE TABLE IF NOT EXISTS DBIndexesDuplicates ('
+     'dbIndexID  INTEGER PRIMARY KEY, '
+     'taxonID    INTEGER, '
+     'sourceID   INTEGER, '
+     'taxonIndex TEXT, '
+     'movedDate  TEXT);'
+     'INSERT OR IGNORE INTO DBIndexesDuplicates '
+     '(dbIndexID, taxonID, sourceID, taxonIndex, movedDate) '
+     "SELECT dbIndexID, taxonID, sourceID, taxonIndex, datetime('now') "
+     f'FROM DBIndexes WHERE {DBINDEXES_DUPLICATE};'
+     f'DELETE FROM DBIndexes WHERE {DBINDEXES_DUPLICATE};'
+     'DROP INDEX IF EXISTS idxDBIndexesTaxonSource;'
+     'CREATE UNIQUE INDEX IF NOT EXISTS idxDBIndexesTaxonSource '
+     'ON DBIndexes (taxonID, sourceID);'),
+    (3, 'Closure table of TaxonTree',
+     'CREATE TABLE IF NOT EXISTS TaxonClosure ('
+     'ancestorID   INTEGER NOT NULL, '
+     'descendantID INTEGER NOT NULL, '
+     'depth        INTEGER NOT NULL, '
+     'PRIMARY KEY (ancestorID, descendantID)) WITHOUT ROWID;'
+     'CREATE INDEX IF NOT EXISTS idxTaxonClosureDescendant '
+     'ON TaxonClosure (descendantID, depth);'
+     f'{TAXON_CLOSURE}'),
+    (4, 'Full-text index of names of taxa', TAXA_SEARCH),
+    (5, 'Cache of rendered pages of taxa',
+     f'{PAGE_CACHE}{get_page_cache_triggers()}'),
+    (6, 'Jobs of synchronization with sources', SYNC_JOBS),
+    (7, 'Index of keys of taxa in sources of DBIndexes',
+     'CREATE INDEX IF NOT EXISTS idxDBIndexesSourceIndex '
+     'ON DBIndexes (sourceID, taxonIndex);'),
+    (8, 'Closure of TaxonTree after deletes', TAXON_CLOSURE_TRIGGERS),
+)
+
+SCHEMA_VERSIONS = 'CREATE TABLE IF NOT EXISTS SchemaVersions (' \
+                  'version     INTEGER PRIMARY KEY, ' \
+                  'description TEXT, ' \
+                  'appliedDate TEXT);'
+
+
+def get_schema_version(oConnector):
+    """ Gets the last applied version of the database schema.
+
+    :param oConnector: Instance attribute of SQL.
+    :type oConnector: SQL
+    :return: The number of the version, or 0 if no migration was applied.
+    :rtype: int
+    """
+    oConnector.execute_script(SCHEMA_VERSIONS)
+    oCursor = oConnector.execute_query('SELECT MAX(version) '
+                                       'FROM SchemaVersions;')
+    if oCursor:
+        iVersion = oCursor.fetchone()[0]
+        if iVersion:
+            return iVersion
+
+    return 0
+
+
+def log_duplicate_indexes(oConnector):
+    """ Reports rows of DBIndexes, which are moved into DBIndexesDuplicates
+    by the migration 2, together with the index, which is kept.
+
+    :param oConnector: Instance attribute of SQL.
+    :type oConnector: SQL
+    :return: The number of duplicate rows.
+    :rtype: int
+    """
+    oCursor = oConnector.execute_query(
+        'SELECT Duplicates.dbIndexID, Duplicates.taxonID, '
+        'Duplicates.sourceID, Duplicates.taxonIndex, Kept.taxonIndex '
+        'FROM DBIndexes Duplicates '
+        'JOIN DBIndexes Kept ON Kept.dbIndexID=('
+        'SELECT MIN(dbIndexID) FROM DBIndexes '
+        'WHERE taxonID=Duplicates.taxonID '
+        'AND sourceID=Duplicates.sourceID) '
+        'WHERE Duplicates.dbIndexID IN (SELECT dbIndexID FROM DBIndexes '
+        f'WHERE {DBINDEXES_DUPLICATE});')
+    iCount = 0
+    for iIndexID, iTaxonID, iSourceID, sIndex, sKept in oCursor or []:
+        logging.warning(f'The index {sIndex} (dbIndexID {iIndexID}) of the '
+                        f'taxon {iTaxonID} in the source {iSourceID} is '
+                        f'moved into DBIndexesDuplicates, the index {sKept} '
+                        f'is kept.')
+        iCount = iCount + 1
+
+    return iCount
+
+
+def migrate_db(oConnector):
+    """ Applies all migrations which have a version greater than the version
+    of the database schema. Every migration is applied in its own
+    transaction together with the record about it in SchemaVersions.
+
+    :param oConnector: Instance attribute of SQL.
+    :type oConnector: SQL
+    :return: True if the schema is up-to-date, otherwise False.
+    :rtype: bool
+    """
+    iVersion = get_schema_version(oConnector)
+    for iMigration, sDescription, sSQL in MIGRATIONS:
+        if iMigration <= iVersion:
+            continue
+        # The migration moves duplicate rows out of DBIndexes.
+        if iMigration == 2:
+            log_duplicate_indexes(oConnector)
+
+        sScript = f'BEGIN TRANSACTION; {sSQL} ' \
+                  'INSERT INTO SchemaVersions ' \
+                  '(version, description, appliedDate) ' \
+                  f"VALUES ({iMigration}, '{sDescription}', " \
+                  "datetime('now')); COMMIT;"
+        if not oConnector.execute_script(sScript):
+            oConnector.oConnector.rollback()
+            logging.error(f'The migration {iMigration} was not applied.')
+            return False
+
+    # Keeps the statistics of indexes fresh for the query planner.
+    oConnector.execute_script('PRAGMA optimize;')
+    return True
+
+
+def reset_schema_version(oConnector):
+    """ Forgets all applied migrations. It is needed after the database has
+    been restored from the dump, since the dump drops the tables together
+    with their indexes.
+
+    :param oConnector: Instance attribute of SQL.
+    :type oConnector: SQL
+    :return: None
+    """
+    oConnector.execute_script(f'{SCHEMA_VERSIONS} DELETE FROM SchemaVersions;')
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,248 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" The module parses scientific names of taxa without the network. A name
+is split into the canonical name, the bracket authorship, the authorship and
+the year, as the name parser of GBIF does, for example:
+
+.. code-block::
+
+    Lobaria (Schreb.) Hoffm., 1796
+    canonicalName: Lobaria, bracketAuthorship: Schreb.,
+    authorship: Hoffm., year: 1796
+
+Names of uninomials, species and infraspecific taxa with the usual authorship
+are parsed. Other names, for example, names with infrageneric ranks, hybrid
+formulas and informal names, aren't parsed, and they can be sent to the
+remote parser.
+
+Function:
+    get_authorship(dName)
+    get_year(Year)
+    parse_authorship(sAuthorship)
+    parse_name(sName)
+    parse_names(lNames, fRemote=None, iChunk=REMOTE_CHUNK)
+"""
+
+import logging
+import re
+
+# The number of names in one request to the remote parser.
+REMOTE_CHUNK = 100
+
+# Letters of latin names, they may have diaeresis and ligatures.
+LATIN = "a-zäëïöüæœ"
+# Lowercase words, which start authorship, rather than an epithet.
+PARTICLES = ('auct', 'd', 'da', 'das', 'de', 'del', 'della', 'den', 'der',
+             'di', 'do', 'dos', 'du', 'emend', 'ex', 'in', 'la', 'le', 'nom',
+             'sensu', 'ter', 'van', 'von', 'zu')
+# Markers of infraspecific ranks as they are written in names.
+RANK_MARKERS = {'subsp.': 'subsp.', 'ssp.': 'subsp.', 'var.': 'var.',
+                'subvar.': 'subvar.', 'f.': 'f.', 'fo.': 'f.', 'forma': 'f.',
+                'subf.': 'subf.', 'morph': 'morph'}
+
+NAME = re.compile(
+    rf"""\s*(?:×\s?)?(?P<uninomial>[A-Z][{LATIN}]+(?:-[A-Z]?[{LATIN}]+)?)
+    (?:\s+\((?P<subgenus>[A-Z][{LATIN}]+)\)(?=\s+(?:×\s?)?[{LATIN}]))?
+    (?:\s+(?:×\s?)?(?!(?:{'|'.join(PARTICLES)})\b)
+        (?P<species>[{LATIN}][{LATIN}-]+)\b(?![.'’]))?
+    (?:\s+(?P<marker>{'|'.join(re.escape(s) for s in RANK_MARKERS)})
+        \s+(?P<infraspecific>[{LATIN}][{LATIN}-]+)\b(?![.'’]))?
+    (?P<authorship>.*?)\s*$""", re.VERBOSE)
+BRACKET = re.compile(r'\(([^()]*)\)')
+YEAR = re.compile(r',?\s*\(?\[?(\d{4})[a-z]?\]?\)?$')
+PARTICLE = re.compile(rf"(?:{'|'.join(PARTICLES)})\b")
+NOT_AUTHOR = re.compile(r'[\d()\[\];:=]')
+# The rank marker with an epithet or the nomenclatural note in the authorship
+# means the name is more complex than the parser can split, for example,
+# 'Lecanora dispersa (Pers.) Sommerf. var. albescens Nyl.' or 'Lecidea
+# Ach., nom. illeg.'. Markers after a dot are parts of names of authors, as
+# in 'Hook.f.'.
+NOT_AUTHORSHIP = re.compile(
+    rf"""(?<![\w.])(?:(?:{'|'.join(re.escape(s) for s in RANK_MARKERS)})
+        \s+(?!(?:{'|'.join(PARTICLES)})\b)[{LATIN}]|(?:auct|nom)\.)""",
+    re.VERBOSE)
+
+
+def get_authorship(dName):
+    """ Joins the bracket authorship and the authorship of the parsed name,
+    as authorship is written in the database, without the year.
+
+    :param dName: The name parsed by parse_name or the remote parser.
+    :type dName: dict[str, str|int]
+    :return: The authorship, or an empty string if the name hasn't it.
+    :rtype: str
+    """
+    sAuthor = dName.get('authorship') or ''
+    if dName.get('bracketAuthorship'):
+        sAuthor = f'({dName["bracketAuthorship"]}) {sAuthor}'.strip()
+
+    return sAuthor
+
+
+def get_year(Year):
+    """ Converts the year of the answer of a parser to a number.
+
+    :param Year: The year as a number or a string.
+    :type Year: int or str or None
+    :return: The year, or None if it isn't a number.
+    :rtype: int or None
+    """
+    if isinstance(Year, int):
+        return Year
+    if isinstance(Year, str) and Year.isdigit():
+        return int(Year)
+
+    return None
+
+
+def parse_authorship(sAuthorship):
+    """ Separates the year from the authorship, and checks that the rest
+    looks like names of authors.
+
+    :param sAuthorship: The authorship, it may be with the year.
+    :type sAuthorship: str
+    :return: The authorship without the year and the year, or None if the
+        string isn't an authorship.
+    :rtype: tuple[str, int|None] or None
+    """
+    iYear = None
+    oYear = YEAR.search(sAuthorship)
+    if oYear:
+        iYear = int(oYear.group(1))
+        sAuthorship = sAuthorship[:oYear.start()]
+
+    sAuthorship = sAuthorship.strip(' ,')
+    if not sAuthorship:
+        return sAuthorship, iYear
+    # Names of authors begin with a capital letter or a particle, and they
+    # have no digits, brackets, rank markers and nomenclatural notes.
+    if NOT_AUTHOR.search(sAuthorship) or \
+            NOT_AUTHORSHIP.search(sAuthorship) or \
+            not (sAuthorship[0].isupper() or PARTICLE.match(sAuthorship)):
+        return None
+
+    return sAuthorship, iYear
+
+
+def parse_name(sName):
+    """ Parses the scientific name of the taxon.
+
+    :param sName: The scientific name, for example, 'Orcularia (Malme) Kalb &
+        Giralt'.
+    :type sName: str
+    :return: A dictionary with keys as in the answer of the name parser of
+        GBIF: scientificName, canonicalName, bracketAuthorship, bracketYear,
+        authorship, year and rankMarker, if they are in the name. None is
+        returned, if the name can't be parsed.
+    :rtype: dict[str, str|int] or None
+    """
+    oName = NAME.fullmatch(sName or '')
+    if not oName:
+        return None
+
+    lCanonical = [oName['uninomial']]
+    if oName['species']:
+        lCanonical.append(oName['species'])
+    if oName['marker']:
+        if not oName['species']:
+            return None
+        lCanonical.append(oName['infraspecific'])
+
+    dName = {'scientificName': sName.strip(),
+             'canonicalName': ' '.join(lCanonical)}
+    if oName['marker']:
+        dName['rankMarker'] = RANK_MARKERS[oName['marker']]
+
+    sAuthorship = oName['authorship'].strip()
+    oBracket = BRACKET.match(sAuthorship)
+    if oBracket:
+        tBracket = parse_authorship(oBracket.group(1))
+        if not tBracket or not tBracket[0]:
+            return None
+        dName['bracketAuthorship'] = tBracket[0]
+        if tBracket[1]:
+            dName['bracketYear'] = tBracket[1]
+        sAuthorship = sAuthorship[oBracket.end():]
+
+    tAuthorship = parse_authorship(sAuthorship)
+    if not tAuthorship:
+        return None
+    if tAuthorship[0]:
+        dName['authorship'] = tAuthorship[0]
+    if tAuthorship[1]:
+        dName['year'] = tAuthorship[1]
+
+    return dName
+
+
+def parse_names(lNames, fRemote=None, iChunk=REMOTE_CHUNK):
+    """ Parses many names. Names, which can't be parsed locally, are sent to
+    the remote parser by chunks, if it is given.
+
+    :param lNames: Scientific names of taxa.
+    :type lNames: list[str]
+    :param fRemote: The remote parser, which takes a list of names and
+        returns a list of dictionaries, for example, name_parser of pygbif.
+    :type fRemote: function or None
+    :param iChunk: The number of names in one call of the remote parser.
+    :type iChunk: int
+    :return: Dictionaries as from parse_name in the order of names. A name,
+        which wasn't parsed, has the dictionary with the key 'parsed' set to
+        False.
+    :rtype: list[dict[str, str|int|bool]]
+    """
+    lParsed = []
+    lFailed = []
+    for i, sName in enumerate(lNames):
+        dName = parse_name(sName)
+        if dName is None:
+            lFailed.append(i)
+            dName = {'scientificName': sName, 'parsed': False}
+        else:
+            dName['parsed'] = True
+        lParsed.append(dName)
+
+    if not fRemote or not lFailed:
+        return lParsed
+
+    for iStart in range(0, len(lFailed), iChunk):
+        lChunk = lFailed[iStart:iStart + iChunk]
+        try:
+            lAnswer = fRemote([lNames[i] for i in lChunk])
+        except Exception as e:
+            logging.error(f'The remote parser failed: {e}.')
+            continue
+
+        for i, dAnswer in zip(lChunk, lAnswer or []):
+            dName = {sKey: Value for sKey, Value in dAnswer.items()
+                     if sKey in ('scientificName', 'canonicalName',
+                                 'bracketAuthorship', 'bracketYear',
+                                 'authorship', 'year', 'rankMarker')}
+            for sKey in ('year', 'bracketYear'):
+                if sKey in dName:
+                    dName[sKey] = get_year(dName[sKey])
+            dName['parsed'] = bool(dAnswer.get('parsed', True) and
+                                   dName.get('canonicalName'))
+            lParsed[i] = dName
+
+    return lParsed
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,294 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" The module keeps rendered pages of taxa, so that the page of a taxon
+which is opened again isn't built from the database.
+
+Pages are kept in memory in the LRU order, a key is ID of the taxon and
+the language of the interface. Every page remembers the taxa which it
+depends on, and it is dropped when one of them is changed through SQL.
+Pages can also be kept in the table PageCache of the database between runs
+of the program, triggers of the database drop them there.
+
+Class:
+    PageCache
+
+Using:
+    oPageCache = PageCache(oConnector, 128)
+    sPage = oPageCache.get(iTaxonID, 'ru')
+    if sPage is None:
+        oPageCache.put(iTaxonID, 'ru', sPage, lDependencies)
+"""
+
+from collections import OrderedDict
+
+# The tables which are shown on pages of taxa.
+PAGE_TABLES = ('Taxa', 'TaxonTree', 'TaxonRanks', 'TaxonStatuses',
+               'DBIndexes', 'DBSources')
+# The tables which are shown on every page, so after their change all pages
+# are dropped.
+SHARED_TABLES = ('TaxonRanks', 'TaxonStatuses', 'DBSources')
+
+
+class PageCache:
+    """ The LRU cache of rendered pages of taxa.
+
+    *Methods*
+      * __init__ -- Method initializes the cache and subscribes it to writes.
+      * __len__ -- Method returns the number of pages in memory.
+      * onWrite -- Method drops pages which depend on changed taxa.
+      * get -- Method gives the page of the taxon.
+      * put -- Method adds the page of the taxon.
+      * invalidate -- Method drops pages which depend on the taxa.
+      * clear -- Method drops all pages.
+      * get_stats -- Method gives counters of the cache.
+    """
+
+    def __init__(self, oConnector, iSize=128, bPersist=False):
+        """ Initializes an empty cache.
+
+        :param oConnector: Instance attribute of SQL.
+        :type oConnector: SQL
+        :param iSize: The max number of pages in memory.
+        :type iSize: int
+        :param bPersist: Whether pages are kept in the database too.
+        :type bPersist: bool
+        """
+        self.oConnector = oConnector
+        self.iSize = iSize
+        self.bPersist = bPersist
+        self.dPages = OrderedDict()
+        self.dDependencies = {}
+        self.dKeys = {}
+        self.iHits = 0
+        self.iMisses = 0
+        # It is increased after every write which drops pages, so a page
+        # built during the write isn't put into the cache.
+        self.iVersion = 0
+        oConnector.add_write_listener(self.onWrite)
+
+    def __len__(self):
+        """ Returns the number of pages in memory.
+
+        :return: The number of pages.
+        :rtype: int
+        """
+        return len(self.dPages)
+
+    def onWrite(self, sTable, tTaxonIDs=()):
+        """ Drops pages which depend on changed taxa. The number of
+        descendants is shown on pages, so changes of TaxonTree also drop
+        pages of ancestors of changed taxa. If changed taxa are unknown, all
+        pages are dropped.
+
+        :param sTable: The changed table, or None if it is unknown.
+        :type sTable: str or None
+        :param tTaxonIDs: IDs of changed taxa, if they are known.
+        :type tTaxonIDs: tuple
+        """
+        if sTable is not None and sTable not in PAGE_TABLES:
+            return
+
+        self.iVersion += 1
+        if sTable in SHARED_TABLES:
+            self.clear(self.bPersist)
+        elif sTable is None or not tTaxonIDs:
+            self.clear()
+        elif sTable == 'TaxonTree':
+            self.invalidate(self.get_ancestors(tTaxonIDs))
+        else:
+            self.invalidate(tTaxonIDs)
+
+    def get_ancestors(self, tTaxonIDs):
+        """ Gives IDs of the taxa and all their ancestors.
+
+        :param tTaxonIDs: IDs of taxa.
+        :type tTaxonIDs: tuple
+        :return: IDs of the taxa and their ancestors.
+        :rtype: set[int]
+        """
+        setTaxonIDs = set(tTaxonIDs)
+        sMarks = ', '.join('?' * len(setTaxonIDs))
+        oCursor = self.oConnector.execute_query(
+            'SELECT ancestorID FROM TaxonClosure '
+            f'WHERE descendantID IN ({sMarks});', tuple(setTaxonIDs))
+        if oCursor:
+            setTaxonIDs.update(tRow[0] for tRow in oCursor)
+
+        return setTaxonIDs
+
+    def get(self, iTaxonID, sLang):
+        """ Gives the page of the taxon. If the page isn't in memory, it is
+        looked for in the database.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :param sLang: The language of the interface.
+        :type sLang: str
+        :return: The page, or None if it isn't in the cache.
+        :rtype: str or None
+        """
+        tKey = (iTaxonID, sLang)
+        if tKey in self.dPages:
+            self.dPages.move_to_end(tKey)
+            self.iHits += 1
+            return self.dPages[tKey]
+
+        sPage = self.load(iTaxonID, sLang) if self.bPersist else None
+        if sPage is None:
+            self.iMisses += 1
+        else:
+            self.iHits += 1
+
+        return sPage
+
+    def load(self, iTaxonID, sLang):
+        """ Loads the page of the taxon from the database into memory.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :param sLang: The language of the interface.
+        :type sLang: str
+        :return: The page, or None if it isn't in the database.
+        :rtype: str or None
+        """
+        oCursor = self.oConnector.execute_query(
+            'SELECT page FROM PageCache WHERE taxonID=? AND lang=?;',
+            (iTaxonID, sLang,))
+        tRow = oCursor.fetchone() if oCursor else None
+        if not tRow:
+            return None
+
+        oCursor = self.oConnector.execute_query(
+            'SELECT dependencyID FROM PageCacheDependencies '
+            'WHERE taxonID=? AND lang=?;', (iTaxonID, sLang,))
+        lDependencies = [tDependency[0] for tDependency in oCursor or ()]
+        self.remember((iTaxonID, sLang), tRow[0], lDependencies)
+
+        return tRow[0]
+
+    def put(self, iTaxonID, sLang, sPage, lDependencies=()):
+        """ Adds the page of the taxon to the cache.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :param sLang: The language of the interface.
+        :type sLang: str
+        :param sPage: The rendered page.
+        :type sPage: str
+        :param lDependencies: IDs of taxa which are shown on the page.
+        :type lDependencies: list[int] or tuple
+        """
+        setDependencies = set(lDependencies)
+        setDependencies.add(iTaxonID)
+        self.remember((iTaxonID, sLang), sPage, setDependencies)
+        if not self.bPersist:
+            return
+
+        # The old row is deleted first, so that its dependencies are deleted
+        # by the trigger.
+        tKey = (iTaxonID, sLang,)
+        with self.oConnector.transaction():
+            self.oConnector.execute_query(
+                'DELETE FROM PageCache WHERE taxonID=? AND lang=?;', tKey)
+            self.oConnector.execute_query(
+                'INSERT INTO PageCache (taxonID, lang, page) '
+                'VALUES (?, ?, ?);', (iTaxonID, sLang, sPage,))
+            self.oConnector.execute_many(
+                'INSERT OR IGNORE INTO PageCacheDependencies '
+                '(dependencyID, taxonID, lang) VALUES (?, ?, ?);',
+                [(iDependencyID, iTaxonID, sLang)
+                 for iDependencyID in setDependencies])
+
+    def remember(self, tKey, sPage, lDependencies):
+        """ Adds the page to memory and drops the least recently used page,
+        if the cache is full.
+
+        :param tKey: ID of the taxon and the language of the interface.
+        :type tKey: tuple[int, str]
+        :param sPage: The rendered page.
+        :type sPage: str
+        :param lDependencies: IDs of taxa which are shown on the page.
+        :type lDependencies: list[int] or set[int]
+        """
+        self.forget(tKey)
+        self.dPages[tKey] = sPage
+        self.dDependencies[tKey] = frozenset(lDependencies)
+        for iDependencyID in self.dDependencies[tKey]:
+            self.dKeys.setdefault(iDependencyID, set()).add(tKey)
+
+        while len(self.dPages) > self.iSize:
+            self.forget(next(iter(self.dPages)))
+
+    def forget(self, tKey):
+        """ Drops the page from memory.
+
+        :param tKey: ID of the taxon and the language of the interface.
+        :type tKey: tuple[int, str]
+        """
+        if tKey not in self.dPages:
+            return
+
+        del self.dPages[tKey]
+        for iDependencyID in self.dDependencies.pop(tKey):
+            setKeys = self.dKeys[iDependencyID]
+            setKeys.discard(tKey)
+            if not setKeys:
+                del self.dKeys[iDependencyID]
+
+    def invalidate(self, lTaxonIDs):
+        """ Drops pages from memory which depend on the taxa. Pages in the
+        database are dropped by triggers.
+
+        :param lTaxonIDs: IDs of changed taxa.
+        :type lTaxonIDs: list[int] or tuple or set
+        """
+        for iTaxonID in lTaxonIDs:
+            for tKey in list(self.dKeys.get(iTaxonID, ())):
+                self.forget(tKey)
+
+    def clear(self, bPersisted=False):
+        """ Drops all pages from memory.
+
+        :param bPersisted: Whether pages in the database are dropped too.
+        :type bPersisted: bool
+        """
+        self.dPages.clear()
+        self.dDependencies.clear()
+        self.dKeys.clear()
+        if bPersisted:
+            self.oConnector.execute_query('DELETE FROM PageCache;')
+            self.oConnector.commit()
+
+    def get_stats(self):
+        """ Gives counters of the cache.
+
+        :return: A dictionary with the numbers of hits and misses, the share
+            of hits, the number of pages in memory and the max number.
+        :rtype: dict[str, int or float]
+        """
+        iRequests = self.iHits + self.iMisses
+        return {'hits': self.iHits,
+                'misses': self.iMisses,
+                'hit_rate': self.iHits / iRequests if iRequests else 0.0,
+                'size': len(self.dPages),
+                'max_size': self.iSize}
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,219 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" The module builds the snapshot of the database: the binary file, which
+is made from the dump of the database structure with default values, with
+all migrations applied and compacted. A new database is copied from the
+snapshot by the backup API of SQLite, instead of executing thousands of
+statements of the dump.
+
+The snapshot is built again when the dump or migrations are changed, the
+digest of them is kept in PRAGMA user_version of the snapshot. It also can
+be built by hand:
+
+.. code-block::
+
+    python -m mli.lib.snapshot db/db_structure.sql db/db_structure.db
+
+Function:
+    build_snapshot(sDumpFile, sSnapshotFile)
+    get_snapshot(sDBDir)
+    get_snapshot_digest(sDumpFile)
+    is_snapshot_fresh(sDumpFile, sSnapshotFile)
+    load_snapshot(oConnector, sSnapshotFile)
+
+Using:
+    oConnector = SQL(':memory:')
+    load_snapshot(oConnector, get_snapshot('db'))
+"""
+
+import hashlib
+import logging
+import sqlite3
+import sys
+from os import replace
+from pathlib import Path
+from sqlite3 import DatabaseError
+from time import perf_counter
+
+from mli.lib.migration import MIGRATIONS, migrate_db, reset_schema_version
+from mli.lib.sql import SQL, STRUCTURE_FILE, bootstrap_db, get_uri
+from mli.lib.str import str_get_file_patch
+
+# The snapshot of the dump of the database structure.
+SNAPSHOT_FILE = 'db_structure.db'
+
+
+def build_snapshot(sDumpFile, sSnapshotFile):
+    """ Builds the snapshot from the dump. The database is created in
+    memory, then it is written to the file by VACUUM INTO, so the file is
+    compacted. The file is replaced only when it is built completely.
+
+    :param sDumpFile: The path to the dump.
+    :type sDumpFile: str
+    :param sSnapshotFile: The path to the snapshot.
+    :type sSnapshotFile: str
+    :return: True if the snapshot is built, otherwise False.
+    :rtype: bool
+    """
+    fStart = perf_counter()
+    oConnector = SQL(':memory:')
+    if bootstrap_db(oConnector, sDumpFile) is False:
+        return False
+
+    reset_schema_version(oConnector)
+    if not migrate_db(oConnector):
+        return False
+
+    iDigest = get_snapshot_digest(sDumpFile)
+    oConnector.oConnector.execute(f'PRAGMA user_version={iDigest};')
+
+    sTempFile = f'{sSnapshotFile}.tmp'
+    Path(sTempFile).unlink(missing_ok=True)
+    try:
+        oConnector.oConnector.execute('VACUUM INTO ?;', (sTempFile,))
+        replace(sTempFile, sSnapshotFile)
+    except (DatabaseError, OSError) as e:
+        logging.exception(f'The snapshot {sSnapshotFile} was not built: {e}.')
+        Path(sTempFile).unlink(missing_ok=True)
+        return False
+
+    logging.info(f'The snapshot {sSnapshotFile} was built in '
+                 f'{perf_counter() - fStart:.2f} s.')
+    return True
+
+
+def get_snapshot_digest(sDumpFile):
+    """ Calculates the digest of the dump and scripts of all migrations. It
+    changes, when the dump or any migration, even an applied one, is
+    changed.
+
+    :param sDumpFile: The path to the dump.
+    :type sDumpFile: str
+    :return: The digest, which fits into PRAGMA user_version, or None if
+        the dump can't be read.
+    :rtype: int or None
+    """
+    oHash = hashlib.sha256()
+    try:
+        with open(sDumpFile, 'rb') as oFile:
+            for bChunk in iter(lambda: oFile.read(1 << 16), b''):
+                oHash.update(bChunk)
+    except OSError:
+        return None
+
+    for iMigration, _, sSQL in MIGRATIONS:
+        oHash.update(f'\0{iMigration}\0{sSQL}'.encode('utf-8'))
+
+    # PRAGMA user_version is a signed 32-bit number.
+    return int.from_bytes(oHash.digest()[:4], 'big') & 0x7FFFFFFF
+
+
+def is_snapshot_fresh(sDumpFile, sSnapshotFile):
+    """ Checks that the snapshot is newer than the dump, and that it was
+    built from the same dump and migrations.
+
+    :param sDumpFile: The path to the dump.
+    :type sDumpFile: str
+    :param sSnapshotFile: The path to the snapshot.
+    :type sSnapshotFile: str
+    :return: True if the snapshot can be used, otherwise False.
+    :rtype: bool
+    """
+    oSnapshot, oDump = Path(sSnapshotFile), Path(sDumpFile)
+    if not oSnapshot.exists():
+        return False
+    if oDump.exists() and oDump.stat().st_mtime > oSnapshot.stat().st_mtime:
+        return False
+
+    try:
+        oConnection = sqlite3.connect(get_uri(sSnapshotFile, True), uri=True)
+        try:
+            iVersion = oConnection.execute(
+                'SELECT MAX(version) FROM SchemaVersions;').fetchone()[0]
+            iDigest = oConnection.execute(
+                'PRAGMA user_version;').fetchone()[0]
+        finally:
+            oConnection.close()
+    except DatabaseError:
+        return False
+
+    return iVersion == MIGRATIONS[-1][0] and \
+        iDigest == get_snapshot_digest(sDumpFile)
+
+
+def get_snapshot(sDBDir):
+    """ Gives the snapshot of the dump of the database structure, which is
+    in the directory. The snapshot is built, if it is absent or outdated.
+
+    :param sDBDir: The directory with the dump.
+    :type sDBDir: str
+    :return: The path to the snapshot, or None if it can't be built.
+    :rtype: str or None
+    """
+    sDumpFile = str_get_file_patch(sDBDir, STRUCTURE_FILE)
+    sSnapshotFile = str_get_file_patch(sDBDir, SNAPSHOT_FILE)
+    if is_snapshot_fresh(sDumpFile, sSnapshotFile):
+        return sSnapshotFile
+    if not Path(sDumpFile).exists():
+        return None
+    if build_snapshot(sDumpFile, sSnapshotFile):
+        return sSnapshotFile
+
+    return None
+
+
+def load_snapshot(oConnector, sSnapshotFile):
+    """ Copies the snapshot to the database by the backup API. The snapshot
+    is opened read-only, and all data of the database are replaced.
+
+    :param oConnector: Instance attribute of SQL.
+    :type oConnector: SQL
+    :param sSnapshotFile: The path to the snapshot.
+    :type sSnapshotFile: str
+    :return: True if the snapshot is copied, otherwise False.
+    :rtype: bool
+    """
+    if not sSnapshotFile:
+        return False
+
+    try:
+        oSnapshot = sqlite3.connect(get_uri(sSnapshotFile, True), uri=True)
+        try:
+            oConnector.oConnector.commit()
+            oSnapshot.backup(oConnector.oConnector)
+        finally:
+            oSnapshot.close()
+    except DatabaseError as e:
+        logging.exception(f'The snapshot {sSnapshotFile} was not loaded: '
+                          f'{e}.')
+        return False
+
+    # The journal mode and the digest of the snapshot are copied with its
+    # pages, the digest only belongs to the snapshot.
+    oConnector.set_profile(oConnector.dProfile)
+    oConnector.oConnector.execute('PRAGMA user_version=0;')
+    oConnector.notify_write()
+    return True
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Using: python -m mli.lib.snapshot DUMP_FILE SNAPSHOT_FILE')
+        sys.exit(2)
+    sys.exit(0 if build_snapshot(sys.argv[1], sys.argv[2]) else 1)
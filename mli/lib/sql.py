@@ -21,26 +21,81 @@ multi-level API that can be used in other modules to create requests using
 a minimum of transmitted data.
 
 Function:
+    bootstrap_db(oConnector, sFile)
+    check_connect_db(oConnector, sBasePath, sDBDir)
+    get_chunks(oRows, iChunk)
     get_columns(sColumns, sConj='AND')
+    get_columns_count(sColumns)
+    get_db_profile(oConfig, sSection='DB')
+    get_fts_query(sQuery)
+    get_missing_tables(oConnector)
+    get_sql_statements(oFile)
+    get_taxon_ids(sColumns, tValues)
+    get_uri(sFileDB, bImmutable=False)
+    set_pragmas(oConnection, dProfile, bReadOnly=False)
+    get_sql_text(sOperation, sTable, sColumns='', sWhere='', sConj='AND')
 
 Class:
+    ConnectionPool
     SQL
 
 Using:
     Foo = SQL(_DataBaseFile_)
 """
 
+import json
 import logging
+import re
 import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
 from sqlite3 import DatabaseError
+from time import perf_counter
 
 from mli.lib.log import start_logging
+from mli.lib.migration import MAX_TREE_DEPTH, TAXON_CLOSURE, migrate_db, \
+    reset_schema_version
 from mli.lib.str import str_get_file_patch
+from mli.lib.taxonomy import TaxonomyIndex
+from mli.lib.trigram import TrigramIndex
+
+# The number of rows which are sent to the database by one executemany.
+CHUNK_SIZE = 1000
+# The number of texts of queries which are kept by get_sql_text, and the same
+# number of prepared statements which are kept by sqlite3 for every connection.
+SQL_CACHE_SIZE = 256
+# Tables which should be in the database, if some of them is absent, the
+# database is created from the dump.
+DB_TABLES = ('Colors', 'CommonMorphClasses', 'DBIndexes', 'DBSources',
+             'Images', 'Langs', 'LangVariants', 'LocalNames', 'Meterings',
+             'MorphClassTaxon', 'PartConditions', 'PartProperties', 'Parts',
+             'PartColors', 'PartSizes', 'Places', 'PlacesOfLive', 'Sources',
+             'Substrates', 'SubstratesOfTaxon', 'Taxa', 'TaxonRanks',
+             'TaxonStatuses', 'TaxonTree', 'TypeSources')
+# The dump which the database is created from, and the dump of its structure
+# with default values, which is used if there is no the first one.
+BACKUP_FILE = 'mli_backup.sql'
+STRUCTURE_FILE = 'db_structure.sql'
+# Statements of dumps which begin and end transactions.
+TRANSACTION_STATEMENT = re.compile(r'\s*(BEGIN|COMMIT|END|ROLLBACK)\b',
+                                   re.IGNORECASE)
+# Pragmas which are set on opening of connection, with their default values.
+# They can be changed in the section [DB] of the configuration file.
+DB_PROFILE = {'journal_mode': 'WAL',
+              'synchronous': 'NORMAL',
+              'cache_size': '-65536',
+              'mmap_size': '268435456',
+              'temp_store': 'MEMORY',
+              'busy_timeout': '5000'}
 
 
 def check_connect_db(oConnector, sBasePath, sDBDir):
     """ Checks for the existence of a database and if it does not find it, then
-        creates it with default values.
+        creates it with default values. After that, brings the schema of
+        the database up-to-date.
 
     :param oConnector: Instance attribute of SQL.
     :type oConnector: SQL
@@ -48,26 +103,147 @@ def check_connect_db(oConnector, sBasePath, sDBDir):
     :type sBasePath: str
     :param sDBDir: A dir when database is by default.
     :type sDBDir: str
-    :return: None
+    :return: Time of creation of the database in seconds, None if the
+        database already exists, or False if it hasn't been created.
+    :rtype: float or bool or None
+    """
+    # The read-only database is used as it is.
+    if oConnector.bReadOnly:
+        return None
+
+    # The snapshot is built by SQL, so it is imported here.
+    from mli.lib.snapshot import get_snapshot, load_snapshot
+
+    fTime = None
+    if get_missing_tables(oConnector):
+        fStart = perf_counter()
+        sDBPath = str_get_file_patch(sBasePath, sDBDir)
+        sFile = str_get_file_patch(sDBPath, BACKUP_FILE)
+        # Without the backup, the database is copied from the snapshot of
+        # the structure dump, and the dump is executed only if the snapshot
+        # can't be used.
+        if not Path(sFile).exists() and \
+                load_snapshot(oConnector, get_snapshot(sDBPath)):
+            fTime = perf_counter() - fStart
+            logging.info(f'The database was copied from the snapshot in '
+                         f'{fTime:.2f} s.')
+        else:
+            if not Path(sFile).exists():
+                sFile = str_get_file_patch(sDBPath, STRUCTURE_FILE)
+            fTime = bootstrap_db(oConnector, sFile)
+            if fTime is False:
+                return False
+            reset_schema_version(oConnector)
+
+    migrate_db(oConnector)
+    return fTime
+
+
+def get_missing_tables(oConnector):
+    """ Finds tables from DB_TABLES which are absent in the database. All
+    tables are got by one query.
+
+    :param oConnector: Instance attribute of SQL.
+    :type oConnector: SQL
+    :return: Names of absent tables.
+    :rtype: list[str]
+    """
+    oCursor = oConnector.execute_query(
+        "SELECT name FROM sqlite_master WHERE type='table';")
+    setTables = {tRow[0] for tRow in oCursor} if oCursor else set()
+    return [sTable for sTable in DB_TABLES if sTable not in setTables]
+
+
+def get_sql_statements(oFile):
+    """ Splits the SQL script into statements without reading it into memory
+    completely. Statements which begin and end transactions are skipped.
+
+    :param oFile: The opened file of the script, or another iterable object
+        with its lines.
+    :type oFile: Iterable[str]
+    :return: The generator of statements.
+    :rtype: Iterator[str]
+    """
+    lLines = []
+    for sLine in oFile:
+        if not lLines and (not sLine.strip() or sLine.startswith('--')):
+            continue
+
+        lLines.append(sLine)
+        sStatement = ''.join(lLines)
+        if not sqlite3.complete_statement(sStatement):
+            continue
+
+        lLines = []
+        if not TRANSACTION_STATEMENT.match(sStatement):
+            yield sStatement.strip()
+
+
+def bootstrap_db(oConnector, sFile):
+    """ Creates the database from the dump. The dump is executed statement
+    by statement in one transaction, and the data isn't synced to the disk
+    until the end.
+
+    :param oConnector: Instance attribute of SQL.
+    :type oConnector: SQL
+    :param sFile: The path to the dump.
+    :type sFile: str
+    :return: Time of creation in seconds, or False if it has failed.
+    :rtype: float or bool
+    """
+    fStart = perf_counter()
+    oConnection = oConnector.oConnector
+    sSynchronous = oConnection.execute('PRAGMA synchronous;').fetchone()[0]
+    iForeignKeys = oConnection.execute('PRAGMA foreign_keys;').fetchone()[0]
+    oConnection.commit()
+    # The dump creates tables in any order, so foreign keys are off.
+    oConnection.execute('PRAGMA synchronous=OFF;')
+    oConnection.execute('PRAGMA foreign_keys=OFF;')
+
+    iStatements = 0
+    bCreated = False
+    try:
+        with open(sFile, encoding='utf-8') as oFile, \
+                oConnector.transaction():
+            for sStatement in get_sql_statements(oFile):
+                if oConnector.execute_query(sStatement) is False:
+                    break
+                iStatements = iStatements + 1
+            else:
+                bCreated = True
+    except (OSError, ValueError) as e:
+        logging.exception(f'The dump {sFile} can\'t be read: {e}.')
+    finally:
+        oConnection.execute(f'PRAGMA synchronous={sSynchronous};')
+        oConnection.execute(f'PRAGMA foreign_keys={iForeignKeys};')
+
+    oConnector.notify_write()
+    if not bCreated:
+        logging.error(f'The database was not created from {sFile}.')
+        return False
+
+    fTime = perf_counter() - fStart
+    logging.info(f'The database was created from {sFile} by {iStatements} '
+                 f'statements in {fTime:.2f} s.')
+    return fTime
+
+
+def get_chunks(oRows, iChunk=CHUNK_SIZE):
+    """ Splits any iterable object into lists of the given length without
+    reading it into memory completely.
+
+    :param oRows: An iterable object or generator with rows.
+    :type oRows: iterable
+    :param iChunk: The max number of rows in the chunk.
+    :type iChunk: int
+    :return: A generator of lists with rows.
+    :rtype: generator
     """
-    # The list of tables in DB
-    lTables = ['Colors', 'CommonMorphClasses', 'DBIndexes', 'DBSources',
-               'Images', 'Langs', 'LangVariants', 'LocalNames', 'Meterings',
-               'MorphClassTaxon', 'PartConditions', 'PartProperties', 'Parts',
-               'PartColors', 'PartSizes', 'Places', 'PlacesOfLive', 'Sources',
-               'Substrates', 'SubstratesOfTaxon', 'Taxa', 'TaxonRanks',
-               'TaxonStatuses', 'TaxonTree', 'TypeSources']
-
-    for sTable in lTables:
-        bExist = oConnector.select('sqlite_master', '*', 'name, type',
-                                   (sTable, 'table',)).fetchone()
-        if not bExist:
-            sDBPath = str_get_file_patch(sBasePath, sDBDir)
-            sFile = str_get_file_patch(sDBPath, 'mli_backup.sql')
-            with open(sFile) as sql_file:
-                sql_script = sql_file.read()
-                oConnector.execute_script(sql_script)
-                break
+    oIterator = iter(oRows)
+    lChunk = list(islice(oIterator, iChunk))
+    while lChunk:
+        yield lChunk
+        lChunk = list(islice(oIterator, iChunk))
 
 
 def get_columns(sColumns, sConj='AND'):
@@ -87,6 +263,165 @@ def get_columns(sColumns, sConj='AND'):
     return sColumns.replace(', ', '=? ' + sConj + ' ') + "=?"
 
 
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def get_columns_count(sColumns):
+    """ Counts the columns in a string where they are separated by commas.
+
+    :param sColumns: A string with a list of table columns separated by commas.
+    :type sColumns: str
+    :return: The number of columns.
+    :rtype: int
+    """
+    return len(sColumns.split(','))
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def get_sql_text(sOperation, sTable, sColumns='', sWhere='', sConj='AND'):
+    """ Builds the text of a query for the generic methods of SQL. The last
+    built texts are kept in LRU cache, so the text of the same query isn't
+    built every time. Use get_sql_text.cache_info() to see hits and misses.
+
+    :param sOperation: The one from 'SELECT', 'INSERT', 'UPSERT', 'UPDATE'
+        and 'DELETE'.
+    :type sOperation: str
+    :param sTable: Table name as string.
+    :type sTable: str
+    :param sColumns: Columns which are selected, inserted or updated.
+    :type sColumns: str
+    :param sWhere: Columns of the condition, or columns of the unique index
+        for 'UPSERT' (by default, empty).
+    :type sWhere: str
+    :param sConj: The one from 'AND' or 'OR' operator condition.
+        By default, is used 'AND'.
+    :type sConj: str
+    :return: The text of the query.
+    :rtype: str
+    """
+    if sOperation in ('INSERT', 'UPSERT'):
+        sValues = ("?, " * len(sColumns.split(", ")))[:-2]
+        sSQL = f'INSERT INTO {sTable} ({sColumns}) VALUES ({sValues})'
+        if sOperation == 'INSERT':
+            return sSQL
+
+        lConflict = sWhere.split(', ')
+        lUpdate = [f'{sColumn}=excluded.{sColumn}'
+                   for sColumn in sColumns.split(', ')
+                   if sColumn not in lConflict]
+        if lUpdate:
+            return f'{sSQL} ON CONFLICT ({sWhere}) ' \
+                   f'DO UPDATE SET {", ".join(lUpdate)}'
+        return f'{sSQL} ON CONFLICT ({sWhere}) DO NOTHING'
+
+    if sWhere:
+        sWhere = f' WHERE {get_columns(sWhere, sConj)}'
+
+    if sOperation == 'SELECT':
+        return f'SELECT {sColumns} FROM {sTable}{sWhere}'
+    if sOperation == 'UPDATE':
+        sSet = ', '.join([f'{sColumn}=?' for sColumn in sColumns.split(', ')])
+        return f'UPDATE {sTable} SET {sSet}{sWhere}'
+    if sOperation == 'DELETE':
+        return f'DELETE FROM {sTable}{sWhere}'
+
+    raise ValueError(f'Unknown operation: {sOperation}')
+
+
+def get_db_profile(oConfig, sSection='DB'):
+    """ Reads the profile of connection from the configuration file. If an
+    option is absent in the file, its default value from DB_PROFILE is used.
+
+    :param oConfig: The object of the configuration file.
+    :type oConfig: ConfigParser
+    :param sSection: The section with options of the database.
+    :type sSection: str
+    :return: A dictionary with values of pragmas and the flag 'read_only'.
+    :rtype: dict[str, str|bool]
+    """
+    dProfile = {}
+    for sPragma, sDefault in DB_PROFILE.items():
+        dProfile[sPragma] = oConfig.get(sSection, sPragma, fallback=sDefault)
+    dProfile['read_only'] = oConfig.getboolean(sSection, 'read_only',
+                                               fallback=False)
+    dProfile['readers'] = oConfig.getint(sSection, 'readers', fallback=0)
+
+    return dProfile
+
+
+def get_fts_query(sQuery):
+    """ Makes a query of the full-text search from text typed by the user.
+    Every word of the text is searched as a prefix.
+
+    :param sQuery: Text for searching.
+    :type sQuery: str
+    :return: The query for MATCH, or empty string if there are no words.
+    :rtype: str
+    """
+    return ' '.join(f'"{sWord}"*' for sWord in re.findall(r'\w+', sQuery))
+
+
+def get_taxon_ids(sColumns, tValues):
+    """ Finds values of columns which refer to taxa (taxonID and
+    mainTaxonID) among values of a query.
+
+    :param sColumns: A string with a list of table columns separated by commas.
+    :type sColumns: str
+    :param tValues: Values of the columns.
+    :type tValues: tuple or list
+    :return: IDs of taxa.
+    :rtype: tuple[int]
+    """
+    lColumns = [sColumn.strip().lower() for sColumn in sColumns.split(',')]
+    return tuple(Value for sColumn, Value in zip(lColumns, tValues)
+                 if sColumn in ('taxonid', 'maintaxonid'))
+
+
+def get_uri(sFileDB, bImmutable=False):
+    """ Makes URI for opening the database file in read-only mode.
+
+    :param sFileDB: Path to database as string.
+    :type sFileDB: str
+    :param bImmutable: The database can't be changed by anyone.
+    :type bImmutable: bool
+    :return: URI of the database.
+    :rtype: str
+    """
+    sURI = f'{Path(sFileDB).resolve().as_uri()}?mode=ro'
+    if bImmutable:
+        return f'{sURI}&immutable=1'
+
+    return sURI
+
+
+def set_pragmas(oConnection, dProfile, bReadOnly=False):
+    """ Sets pragmas of the connection from the profile. Only pragmas
+    from DB_PROFILE are accepted.
+
+    :param oConnection: The connection to the database.
+    :type oConnection: sqlite3.Connection
+    :param dProfile: A dictionary with values of pragmas.
+    :type dProfile: dict[str, str|bool]
+    :param bReadOnly: The connection is read-only.
+    :type bReadOnly: bool
+    :return: None
+    """
+    for sPragma in DB_PROFILE:
+        sValue = str(dProfile.get(sPragma, '')).strip()
+        if not sValue:
+            continue
+        # The read-only connection can't change the journal of database.
+        if sPragma == 'journal_mode' and bReadOnly:
+            continue
+        if not re.fullmatch(r'-?\w+', sValue):
+            logging.error(f'Wrong value of pragma {sPragma}: {sValue}')
+            continue
+
+        try:
+            oConnection.execute(f'PRAGMA {sPragma}={sValue};')
+        except DatabaseError as e:
+            logging.exception(f'An error has occurred: {e}.\n'
+                              f'Pragma: {sPragma}={sValue}\n')
+
+
 def get_increase_value(sColumns, tValues):
     """ Checks counting elements of values, and if them fewer,
      then makes them equal.
@@ -103,14 +438,143 @@ def get_increase_value(sColumns, tValues):
     :return: A tuple with values, which equal to sColumns.
     :rtype: list
     """
-    if len(sColumns.split(',')) > len(tValues) == 1:
-        return tValues * len(sColumns.split(', '))
+    iColumns = get_columns_count(sColumns)
+    if iColumns > len(tValues) == 1:
+        return tValues * iColumns
 
     logging.error('The tuple must be filled or consist of one element.'
                   f'The columns: {sColumns} \n The tuple: {tValues}')
     return
 
 
+class ConnectionPool:
+    """ Keeps read-only connections to the database for threads. Every
+    thread gets its own connection, and not more than iReaders connections
+    are used at the same time. If all of them are busy, the thread waits
+    until another thread releases its connection.
+
+    *Using*:
+        ::
+
+            oPool = ConnectionPool(sFileDB, dProfile, 4)
+            oConnection = oPool.get_connection()
+            ...
+            oPool.release_connection()
+    """
+
+    def __init__(self, sFileDB, dProfile=None, iReaders=4):
+        """ Initializes the pool. Connections are opened on first request.
+
+        :param sFileDB: Path to database as string.
+        :type sFileDB: str
+        :param dProfile: Pragmas which are set after opening.
+        :type dProfile: dict[str, str|bool] or None
+        :param iReaders: The max number of connections.
+        :type iReaders: int
+        """
+        self.sFileDB = sFileDB
+        self.dProfile = dProfile or {}
+        self.iReaders = iReaders
+        self.lIdle = []
+        self.oLock = threading.Lock()
+        self.oLocal = threading.local()
+        self.oSemaphore = threading.BoundedSemaphore(iReaders)
+        self.dStats = {'checkouts': 0, 'connections': 0, 'waits': 0,
+                       'wait_time': 0.0, 'max_wait_time': 0.0}
+
+    def connect(self):
+        """ Opens a new read-only connection to the database.
+
+        :return: The connection to the database.
+        :rtype: sqlite3.Connection
+        """
+        bImmutable = bool(self.dProfile.get('read_only'))
+        oConnection = sqlite3.connect(get_uri(self.sFileDB, bImmutable),
+                                      cached_statements=SQL_CACHE_SIZE,
+                                      check_same_thread=False, uri=True)
+        set_pragmas(oConnection, self.dProfile, True)
+        return oConnection
+
+    def get_connection(self):
+        """ Gives the connection of the current thread. If the thread has no
+        connection, takes a free one from the pool.
+
+        :return: The read-only connection to the database.
+        :rtype: sqlite3.Connection
+        """
+        oConnection = getattr(self.oLocal, 'oConnection', None)
+        if oConnection is not None:
+            return oConnection
+
+        fStart = perf_counter()
+        bWait = not self.oSemaphore.acquire(blocking=False)
+        if bWait:
+            self.oSemaphore.acquire()
+        fWait = perf_counter() - fStart
+
+        with self.oLock:
+            self.dStats['checkouts'] = self.dStats['checkouts'] + 1
+            if bWait:
+                self.dStats['waits'] = self.dStats['waits'] + 1
+                self.dStats['wait_time'] = self.dStats['wait_time'] + fWait
+                self.dStats['max_wait_time'] = max(
+                    self.dStats['max_wait_time'], fWait)
+            if self.lIdle:
+                oConnection = self.lIdle.pop()
+
+        if oConnection is None:
+            try:
+                oConnection = self.connect()
+            except DatabaseError:
+                self.oSemaphore.release()
+                raise
+            with self.oLock:
+                self.dStats['connections'] = self.dStats['connections'] + 1
+
+        self.oLocal.oConnection = oConnection
+        return oConnection
+
+    def has_connection(self):
+        """ Checks if the current thread holds a connection of the pool.
+
+        :return: True if it holds, otherwise False.
+        :rtype: bool
+        """
+        return getattr(self.oLocal, 'oConnection', None) is not None
+
+    def release_connection(self):
+        """ Returns the connection of the current thread to the pool. """
+        oConnection = getattr(self.oLocal, 'oConnection', None)
+        if oConnection is None:
+            return
+
+        self.oLocal.oConnection = None
+        with self.oLock:
+            self.lIdle.append(oConnection)
+        self.oSemaphore.release()
+
+    def get_stats(self):
+        """ Gets statistics of the pool.
+
+        :return: A dictionary with numbers of checkouts, opened connections,
+            idle connections and waits, the total and the max wait time in
+            seconds.
+        :rtype: dict[str, int|float]
+        """
+        with self.oLock:
+            dStats = dict(self.dStats)
+            dStats['idle'] = len(self.lIdle)
+
+        return dStats
+
+    def close(self):
+        """ Closes idle connections of the pool. """
+        with self.oLock:
+            for oConnection in self.lIdle:
+                oConnection.close()
+            self.lIdle = []
+
+
 class SQL:
     # TODO: PyCharm does not want to define standard reStructureText
     #  designation. I don't how it can fix now. So, I use available methods
@@ -123,39 +587,274 @@ class SQL:
         * __init__ -- Method initializes a cursor of sqlite database.
         * __del__ -- Method closes the cursor of sqlite database.
       # Low level methods.
+        * set_profile -- Method sets pragmas of the connection.
+        * get_connection -- Method gives the connection of current thread.
+        * release_connection -- Method returns the connection to the pool.
+        * read_rows -- Method reads rows of the query by the pool.
+        * get_pool_stats -- Method gets statistics of the pool.
+        * transaction -- Method groups queries into one unit of work.
+        * commit -- Method commits changes outside of transaction.
+        * add_write_listener -- Method subscribes a function to writes.
+        * remove_write_listener -- Method unsubscribes a function.
+        * notify_write -- Method calls functions subscribed to writes.
         * export_db -- Method exports from db to sql script.
         * execute_script -- Method imports from slq script to db.
         * execute_query -- Method execute sql_search query.
+        * execute_many -- Method executes query for every row of values.
         * insert_row -- Method inserts a record in the database table.
+        * insert_rows -- Method inserts many records in the database table.
+        * upsert_rows -- Method inserts or updates many records.
         * delete_row -- Method deletes a row from the table.
         * update -- Method updates value(s) in record of the database table.
+        * update_rows -- Method updates many records of the database table.
         * select -- Method does selection from the table.
       # Average level API.
         * sql_get_id: Finds id of the row by value(s) of table column(s).
         * sql_get_all: Method gets all records in database table.
         * sql_count: Method counts number of records in database table.
         * sql_table_clean: Method cleans up the table.
+        * get_cache_stats: Method returns statistics of the cache of queries.
     """
 
     # Standard methods
-    def __init__(self, sFileDB):
+    def __init__(self, sFileDB, dProfile=None):
         """ Initializes connect with database.
 
         :param sFileDB: Path to database as string.
         :type sFileDB: str
+        :param dProfile: Pragmas which are set after opening, the flag
+            'read_only' and the number of 'readers'. The read-only database
+            is opened as immutable, so it shouldn't be changed by other
+            programs. If 'readers' is more than 0, other threads get
+            read-only connections from the pool (by default, None).
+        :type dProfile: dict[str, str|bool|int] or None
         """
         self.logging = start_logging()
+        # The stack of opened transactions. Every element is a flag that
+        # some query inside the transaction has failed.
+        self.lTransactions = []
+        # Functions which are called after writes to the database.
+        self.lWriteListeners = []
+        self.oTaxonomy = None
+        # The index of names for fuzzy matching is built on the first use.
+        # Taxa, which were written through SQL, are updated in it by their
+        # IDs, and it is rebuilt after writes without IDs and writes of
+        # other connections.
+        self.oNameIndex = TrigramIndex()
+        self.tNameIndexVersion = None
+        self.setNameIndexIDs = set()
+        self.oNameIndexLock = threading.Lock()
+        if dProfile is None:
+            dProfile = {}
+        self.dProfile = dProfile
+        self.bReadOnly = bool(dProfile.get('read_only'))
+        # The connection of the thread which opened the database is the only
+        # one which writes, other threads read by connections from the pool.
+        self.iThreadID = threading.get_ident()
+        self.oPool = None
+        iReaders = int(dProfile.get('readers') or 0)
+        if iReaders > 0 and sFileDB != ':memory:':
+            self.oPool = ConnectionPool(sFileDB, dProfile, iReaders)
+
+        bURI = False
+        if self.bReadOnly and sFileDB != ':memory:':
+            sFileDB = get_uri(sFileDB, True)
+            bURI = True
+
         try:
-            self.oConnector = sqlite3.connect(sFileDB)
+            self.oConnector = sqlite3.connect(
+                sFileDB, cached_statements=SQL_CACHE_SIZE, uri=bURI)
         except DatabaseError as e:
             self.logging.exception(f"An error has occurred: {e}.\n"
                                    f"String of query: {sFileDB}\n")
+        else:
+            self.set_profile(dProfile)
 
     def __del__(self):
         """ Closes connection with the database. """
+        if self.oPool is not None:
+            self.oPool.close()
         self.oConnector.close()
 
     # Low methods level
+    def set_profile(self, dProfile):
+        """ Sets pragmas of the connection from the profile. Only pragmas
+        from DB_PROFILE are accepted.
+
+        :param dProfile: A dictionary with values of pragmas.
+        :type dProfile: dict[str, str|bool]
+        :return: None
+        """
+        set_pragmas(self.oConnector, dProfile, self.bReadOnly)
+
+    def is_main_thread(self):
+        """ Checks if the current thread is the one which opened the database.
+
+        :return: True if it is, otherwise False.
+        :rtype: bool
+        """
+        return threading.get_ident() == self.iThreadID
+
+    def get_connection(self):
+        """ Gives the connection for the current thread. The thread which
+        opened the database gets the main connection, other threads get
+        read-only connections from the pool, if it is used.
+
+        :return: The connection to the database.
+        :rtype: sqlite3.Connection
+        """
+        if self.oPool is None or self.is_main_thread():
+            return self.oConnector
+
+        return self.oPool.get_connection()
+
+    def release_connection(self):
+        """ Returns the connection of the current thread to the pool. It
+        should be called by a thread, when it finishes work with database.
+        """
+        if self.oPool is not None and not self.is_main_thread():
+            self.oPool.release_connection()
+
+    def read_rows(self, sSQL, tValues=None):
+        """ Reads all rows of the query by the read-only connection from the
+        pool, even in the thread which opened the database, so the main
+        connection, which writes, has no open cursor. If the pool isn't
+        used, the main connection is used.
+
+        :param sSQL: SQL query.
+        :type sSQL: str
+        :param tValues: Values of parameters of the query.
+        :type tValues: tuple or None
+        :return: Rows of the query, or False if the query has failed.
+        :rtype: list[tuple] or bool
+        """
+        if self.oPool is None:
+            oCursor = self.execute_query(sSQL, tValues)
+            return oCursor.fetchall() if oCursor else False
+
+        # The connection, which the thread already holds, isn't released.
+        bRelease = not self.oPool.has_connection()
+        oConnection = self.oPool.get_connection()
+        try:
+            return oConnection.execute(sSQL, tValues or ()).fetchall()
+        except DatabaseError as e:
+            logging.exception(f'An error has occurred: {e}.\n'
+                              f'String of query: {sSQL}\n'
+                              f'Parameters: {tValues}')
+            return False
+        finally:
+            if bRelease:
+                self.oPool.release_connection()
+
+    def get_pool_stats(self):
+        """ Gets statistics of the pool of connections.
+
+        :return: Statistics of the pool, or empty dictionary if the pool
+            isn't used.
+        :rtype: dict[str, int|float]
+        """
+        if self.oPool is None:
+            return {}
+
+        return self.oPool.get_stats()
+
+    def fail_transaction(self):
+        """ Marks the current transaction as failed, so it will be rolled
+        back at the end.
+        """
+        if self.lTransactions and self.is_main_thread():
+            self.lTransactions[-1] = True
+
+    @contextmanager
+    def transaction(self):
+        """ Groups queries into one unit of work. Inside the block, insert_row,
+        update and delete_row don't commit changes after every query, they
+        are committed once at the end of the block. If an exception is
+        raised or a query fails inside the block, all changes of the block
+        are rolled back. Nested blocks are supported by savepoints, so
+        the failure of the nested block rolls back only its own changes.
+
+        Note: execute_script always commits, so it shouldn't be used
+        inside the block.
+
+        Using:
+            with oConnector.transaction():
+                oConnector.insert_row(...)
+                oConnector.update(...)
+
+        :return: The instance of SQL.
+        :rtype: SQL
+        """
+        iLevel = len(self.lTransactions)
+        sSavepoint = f'mli_savepoint_{iLevel}'
+        if iLevel:
+            self.oConnector.execute(f'SAVEPOINT {sSavepoint}')
+        else:
+            # Commits changes which were made outside of transaction.
+            self.oConnector.commit()
+            self.oConnector.execute('BEGIN')
+
+        self.lTransactions.append(False)
+        try:
+            yield self
+        except BaseException:
+            self.lTransactions[-1] = True
+            raise
+        finally:
+            bFailed = self.lTransactions.pop()
+            if bFailed:
+                logging.error('The transaction was rolled back.')
+
+            if iLevel:
+                if bFailed:
+                    self.oConnector.execute(
+                        f'ROLLBACK TO SAVEPOINT {sSavepoint}')
+                self.oConnector.execute(f'RELEASE SAVEPOINT {sSavepoint}')
+            elif bFailed:
+                self.oConnector.rollback()
+            else:
+                self.oConnector.commit()
+
+    def commit(self):
+        """ Commits changes if they aren't made inside of transaction. """
+        if not self.lTransactions:
+            self.oConnector.commit()
+
+    def add_write_listener(self, fListener):
+        """ Subscribes the function to writes to the database through SQL.
+        The function is called with the name of the changed table (None if it
+        is unknown) and the tuple of IDs of changed taxa (empty if they are
+        unknown). It is also called for writes which are rolled back later,
+        so it should only drop data which it keeps, not save anything.
+
+        :param fListener: The function which is called after writes.
+        :type fListener: Callable[[str|None, tuple], None]
+        """
+        if fListener not in self.lWriteListeners:
+            self.lWriteListeners.append(fListener)
+
+    def remove_write_listener(self, fListener):
+        """ Unsubscribes the function from writes to the database.
+
+        :param fListener: The function which was subscribed.
+        :type fListener: Callable[[str|None, tuple], None]
+        """
+        if fListener in self.lWriteListeners:
+            self.lWriteListeners.remove(fListener)
+
+    def notify_write(self, sTable=None, tTaxonIDs=()):
+        """ Calls the functions subscribed to writes and updates the index
+        of names.
+
+        :param sTable: The changed table, or None if it is unknown.
+        :type sTable: str or None
+        :param tTaxonIDs: IDs of changed taxa, if they are known.
+        :type tTaxonIDs: tuple
+        """
+        self.onWriteNameIndex(sTable, tTaxonIDs)
+        for fListener in list(self.lWriteListeners):
+            fListener(sTable, tTaxonIDs)
+
     def export_db(self):
         """ Method exports from db to sql script. """
         return self.oConnector.iterdump()
@@ -172,7 +871,7 @@ class SQL:
         :return: True if script execution is successful, otherwise False.
         :rtype: bool
         """
-        oCursor = self.oConnector.cursor()
+        oCursor = self.get_connection().cursor()
         try:
             oCursor.executescript(sSQL)
         except DatabaseError as e:
@@ -180,6 +879,7 @@ class SQL:
                               f'String of query: {sSQL}\n')
             return False
 
+        self.notify_write()
         return True
 
     def execute_query(self, sSQL, tValues=None):
@@ -193,7 +893,7 @@ class SQL:
         :return: Cursor or bool -- True if script execution is successful,
             otherwise False.
         """
-        oCursor = self.oConnector.cursor()
+        oCursor = self.get_connection().cursor()
         try:
             if tValues is None:
                 oCursor.execute(sSQL)
@@ -203,6 +903,28 @@ class SQL:
             logging.exception(f'An error has occurred: {e}.\n'
                               f'String of query: {sSQL}\n'
                               f'Parameters: {tValues}')
+            self.fail_transaction()
+            return False
+
+        return oCursor
+
+    def execute_many(self, sSQL, lValues):
+        """ Method executes sql query for every row of values.
+
+        :param sSQL: SQL query.
+        :type sSQL: str
+        :param lValues: Rows of values that need to safe inserting into query.
+        :type lValues: list or tuple or iterable
+        :return: Cursor or bool -- Cursor if execution is successful,
+            otherwise False.
+        """
+        oCursor = self.get_connection().cursor()
+        try:
+            oCursor.executemany(sSQL, lValues)
+        except DatabaseError as e:
+            logging.exception(f'An error has occurred: {e}.\n'
+                              f'String of query: {sSQL}\n')
+            self.fail_transaction()
             return False
 
         return oCursor
@@ -220,15 +942,91 @@ class SQL:
             Otherwise, False.
         :rtype: str or bool
         """
-        sSQL = ("?, " * len(sColumns.split(", ")))[:-2]
-        sqlString = f'INSERT INTO {sTable} ({sColumns}) VALUES ({sSQL})'
-        oCursor = self.execute_query(sqlString, tValues)
+        sSQL = get_sql_text('INSERT', sTable, sColumns)
+        oCursor = self.execute_query(sSQL, tValues)
         if oCursor:
-            self.oConnector.commit()
+            self.commit()
+            tTaxonIDs = get_taxon_ids(sColumns, tValues)
+            if sTable == 'Taxa':
+                tTaxonIDs = tTaxonIDs + (oCursor.lastrowid,)
+            self.notify_write(sTable, tTaxonIDs)
             return oCursor.lastrowid
 
         return False
 
+    def insert_rows(self, sTable, sColumns, oRows, iChunk=CHUNK_SIZE):
+        """ Inserts many records in the database table. Rows are read from
+        oRows by chunks, so it can be a generator of any length. All rows
+        are inserted in one transaction.
+
+        :param sTable: Table name as string.
+        :type sTable: str
+        :param sColumns: Columns names of the table by where needs inserting.
+        :type sColumns: str
+        :param oRows: Rows of values as tuples for inserting.
+        :type oRows: iterable
+        :param iChunk: The number of rows which are inserted by one query.
+        :type iChunk: int
+        :return: The number of inserted rows and the list of ranges of their
+            IDs as tuples (first ID, last ID), if the insert was successful.
+            Otherwise, False. Note: The ranges are right only if IDs are
+            assigned by the database.
+        :rtype: tuple[int, list[tuple[int, int]]] or bool
+        """
+        sSQL = get_sql_text('INSERT', sTable, sColumns)
+        iCount = 0
+        lRanges = []
+        with self.transaction():
+            for lChunk in get_chunks(oRows, iChunk):
+                oCursor = self.execute_many(sSQL, lChunk)
+                if not oCursor:
+                    return False
+
+                iLast = self.execute_query(
+                    'SELECT last_insert_rowid();').fetchone()[0]
+                iFirst = iLast - oCursor.rowcount + 1
+                if lRanges and lRanges[-1][1] + 1 == iFirst:
+                    lRanges[-1] = (lRanges[-1][0], iLast)
+                else:
+                    lRanges.append((iFirst, iLast))
+                iCount = iCount + oCursor.rowcount
+
+        self.notify_write(sTable)
+        return iCount, lRanges
+
+    def upsert_rows(self, sTable, sColumns, oRows, sConflict,
+                    iChunk=CHUNK_SIZE):
+        """ Inserts many records in the database table, and if a record
+        with the same values of sConflict columns already exists, updates
+        the rest of its columns. The sConflict columns must have the unique
+        index.
+
+        :param sTable: Table name as string.
+        :type sTable: str
+        :param sColumns: Columns names of the table by where needs inserting.
+        :type sColumns: str
+        :param oRows: Rows of values as tuples for inserting.
+        :type oRows: iterable
+        :param sConflict: Columns names of the unique index.
+        :type sConflict: str
+        :param iChunk: The number of rows which are sent by one query.
+        :type iChunk: int
+        :return: The number of inserted or updated rows, if the query was
+            successful. Otherwise, False.
+        :rtype: int or bool
+        """
+        sSQL = get_sql_text('UPSERT', sTable, sColumns, sConflict)
+        iCount = 0
+        with self.transaction():
+            for lChunk in get_chunks(oRows, iChunk):
+                oCursor = self.execute_many(sSQL, lChunk)
+                if not oCursor:
+                    return False
+                iCount = iCount + oCursor.rowcount
+
+        self.notify_write(sTable)
+        return iCount
+
     def delete_row(self, sTable, sColumns=None, tValues=None):
         """ Deletes row in the database table by value(s).
 
@@ -244,14 +1042,18 @@ class SQL:
         :rtype: bool
         """
         if sColumns is not None:
-            sSQL = f'DELETE FROM {sTable} WHERE {get_columns(sColumns)}'
+            sSQL = get_sql_text('DELETE', sTable, sWhere=sColumns)
             oCursor = self.execute_query(sSQL, tValues)
         else:
-            sSQL = f'DELETE FROM {sTable}'
+            sSQL = get_sql_text('DELETE', sTable)
             oCursor = self.execute_query(sSQL)
 
         if oCursor:
-            self.oConnector.commit()
+            self.commit()
+            tTaxonIDs = ()
+            if sColumns is not None:
+                tTaxonIDs = get_taxon_ids(sColumns, tValues)
+            self.notify_write(sTable, tTaxonIDs)
             return True
 
         return False
@@ -270,16 +1072,48 @@ class SQL:
         :return: True if the insert was successful, otherwise False.
         :rtype: bool
         """
-        sSetUpdate = sSetUpdate + "=?"
-        sWhereUpdate = get_columns(sWhereUpdate)
-        sSQL = f'UPDATE {sTable} SET {sSetUpdate} WHERE {sWhereUpdate}'
+        sSQL = get_sql_text('UPDATE', sTable, sSetUpdate, sWhereUpdate)
         oCursor = self.execute_query(sSQL, tValues)
         if oCursor:
-            self.oConnector.commit()
+            self.commit()
+            self.notify_write(sTable, get_taxon_ids(
+                f'{sSetUpdate}, {sWhereUpdate}', tValues))
             return True
 
         return False
 
+    def update_rows(self, sTable, sSetUpdate, sWhereUpdate, oRows,
+                    iChunk=CHUNK_SIZE):
+        """ Updates many records of the database table. Every row of values
+        contains values for sSetUpdate columns and then for sWhereUpdate
+        columns.
+
+        :param sTable: A Table as string where update is need to do.
+        :type sTable: str
+        :param sSetUpdate: Column(s) where the value are writen.
+        :type sSetUpdate: str
+        :param sWhereUpdate: Column(s) where values correspond to the required.
+        :type sWhereUpdate: str
+        :param oRows: Rows of values as tuples.
+        :type oRows: iterable
+        :param iChunk: The number of rows which are sent by one query.
+        :type iChunk: int
+        :return: The number of updated rows if the update was successful,
+            otherwise False.
+        :rtype: int or bool
+        """
+        sSQL = get_sql_text('UPDATE', sTable, sSetUpdate, sWhereUpdate)
+        iCount = 0
+        with self.transaction():
+            for lChunk in get_chunks(oRows, iChunk):
+                oCursor = self.execute_many(sSQL, lChunk)
+                if not oCursor:
+                    return False
+                iCount = iCount + oCursor.rowcount
+
+        self.notify_write(sTable)
+        return iCount
+
     def select(self, sTable, sGet, sWhere='', tValues='', sConj='', sFunc=''):
         """ Looks for row by value(s) in table column(s).
 
@@ -308,16 +1142,11 @@ class SQL:
         elif sFunc == 'DISTINCT':
             sGet = f'{sFunc} {sGet}'
 
+        sSQL = get_sql_text('SELECT', sTable, sGet, sWhere, sConj or 'AND')
         if sWhere:
-            if sConj:
-                sCol = get_columns(sWhere, sConj)
-            else:
-                sCol = get_columns(sWhere)
-
-            sSQL = f'SELECT {sGet} FROM {sTable} WHERE {sCol}'
             oCursor = self.execute_query(sSQL, tValues)
         else:
-            oCursor = self.execute_query(f'SELECT {sGet} FROM {sTable}')
+            oCursor = self.execute_query(sSQL)
 
         if oCursor:
             return oCursor
@@ -342,13 +1171,9 @@ class SQL:
         :return: ID as Number in the row cell, or 0, if the row not found.
         :rtype: list or bool
         """
-        if sWhere:
-            if sConj:
-                tValues = get_increase_value(sWhere, tValues)
-                sWhere = get_columns(sWhere, sConj)
-            else:
-                sWhere = get_columns(sWhere)
-        sSQL = f'SELECT {sID} FROM {sTable} WHERE {sWhere}'
+        if sWhere and sConj:
+            tValues = get_increase_value(sWhere, tValues)
+        sSQL = get_sql_text('SELECT', sTable, sID, sWhere, sConj or 'AND')
         oCursor = self.execute_query(sSQL, tValues)
         if oCursor:
             lRows = oCursor.fetchall()
@@ -372,7 +1197,7 @@ class SQL:
         :return: Tuple of all rows of table.
         :rtype: tuple or bool
         """
-        oCursor = self.execute_query(f'SELECT * FROM {sTable}')
+        oCursor = self.execute_query(get_sql_text('SELECT', sTable, '*'))
         if oCursor:
             return oCursor.fetchall()
 
@@ -415,6 +1240,19 @@ class SQL:
 
         return True
 
+    @staticmethod
+    def get_cache_stats():
+        """ Gets statistics of the cache of texts of queries. The cache is
+        common for all connections.
+
+        :return: A dictionary with numbers of hits and misses of the cache,
+            the current and the max size of the cache.
+        :rtype: dict[str, int]
+        """
+        oInfo = get_sql_text.cache_info()
+        return {'hits': oInfo.hits, 'misses': oInfo.misses,
+                'size': oInfo.currsize, 'maxsize': oInfo.maxsize}
+
     # Top API level
     def get_all_by_rank(self, iRank):
         return self.execute_query(
@@ -433,7 +1271,10 @@ class SQL:
 
     def del_garbage(self, sSource='GBIF'):
         lGarbage = self.get_garbage()
-        if lGarbage:
+        if not lGarbage:
+            return
+
+        with self.transaction():
             for lRow in lGarbage:
                 sAuthor = lRow[1]
                 lDelete = self.sql_get_values('Taxa', 'taxonID',
@@ -463,12 +1304,13 @@ class SQL:
                                    'scientificName', (tValue[0],))
 
     def get_id_by_name_status(self, tValue):
-        return self.execute_query(
-            'SELECT Taxa.TaxonID FROM Taxa'
-            'JOIN TaxonTree ON TaxonTree.TaxonID=Taxa.TaxonID'
-            'JOIN TaxonStatuses ON TaxonStatuses.statusID=TaxonTree.statusID'
-            'WHERE Taxa.scientificName=? '
-            'AND TaxonStatuses.statusID=?;', tValue)
+        oCursor = self.execute_query(
+            'SELECT Taxa.taxonID FROM Taxa '
+            'JOIN TaxonTree ON TaxonTree.taxonID=Taxa.taxonID '
+            'WHERE Taxa.canonicalName=? AND TaxonTree.statusID=? '
+            'ORDER BY Taxa.taxonID LIMIT 1;', tValue)
+        tRow = oCursor.fetchone() if oCursor else None
+        return tRow[0] if tRow else False
 
     def get_color_id(self, sColumn, sValue):
         return self.sql_get_id('Colors', 'colorID', sColumn, (sValue,))
@@ -482,7 +1324,7 @@ class SQL:
         return self.sql_get_id('TaxonRanks', 'rankID', sColumns, (sValues,))
 
     def get_rank_name(self, sColumns, iValues):
-        return self.sql_get_values('TaxonRank', sColumns,
+        return self.sql_get_values('TaxonRanks', sColumns,
                                    'rankID', (iValues,))
 
     def get_taxon_rank(self, sSciName):
@@ -554,6 +1396,365 @@ class SQL:
         return self.sql_get_id('Taxa', 'TaxonID',
                                'scientificName', (sSciName,))
 
+    def get_lineage(self, iTaxonID):
+        """ Gets all ancestors of the taxon by one recursive query.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :return: Rows with taxonID, rankName, canonicalName, authorship and
+            a distance from the taxon, from the root of the tree to the
+            taxon itself.
+        :rtype: Iterator[tuple[int, str, str, str, int]]
+        """
+        sSQL = 'WITH RECURSIVE Lineage(taxonID, depth) AS (' \
+               'SELECT ?, 0 ' \
+               'UNION ALL ' \
+               'SELECT TaxonTree.mainTaxonID, Lineage.depth + 1 ' \
+               'FROM Lineage ' \
+               'JOIN TaxonTree ON TaxonTree.taxonID=Lineage.taxonID ' \
+               'WHERE TaxonTree.mainTaxonID<>Lineage.taxonID ' \
+               'AND Lineage.depth<?) ' \
+               'SELECT Taxa.taxonID, TaxonRanks.rankName, ' \
+               'Taxa.canonicalName, Taxa.authorship, Lineage.depth ' \
+               'FROM Lineage ' \
+               'JOIN Taxa ON Taxa.taxonID=Lineage.taxonID ' \
+               'JOIN TaxonRanks ON Taxa.rankID=TaxonRanks.rankID ' \
+               'ORDER BY Lineage.depth DESC;'
+        oCursor = self.execute_query(sSQL, (iTaxonID, MAX_TREE_DEPTH,))
+        if oCursor:
+            yield from oCursor
+
+    def get_subtree(self, iTaxonID, iMaxDepth=None):
+        """ Gets the taxon and all accepted taxa under it from the closure
+        of TaxonTree.
+
+        :param iTaxonID: ID of the root of the subtree.
+        :type iTaxonID: int
+        :param iMaxDepth: The max distance from the root, or None for
+            the whole subtree.
+        :type iMaxDepth: int or None
+        :return: Rows with taxonID, rankName, canonicalName, authorship and
+            a distance from the root, level by level.
+        :rtype: Iterator[tuple[int, str, str, str, int]]
+        """
+        if iMaxDepth is None or iMaxDepth > MAX_TREE_DEPTH:
+            iMaxDepth = MAX_TREE_DEPTH
+
+        sSQL = 'SELECT Taxa.taxonID, TaxonRanks.rankName, ' \
+               'Taxa.canonicalName, Taxa.authorship, TaxonClosure.depth ' \
+               'FROM TaxonClosure ' \
+               'JOIN Taxa ON Taxa.taxonID=TaxonClosure.descendantID ' \
+               'JOIN TaxonRanks ON Taxa.rankID=TaxonRanks.rankID ' \
+               'WHERE TaxonClosure.ancestorID=? AND TaxonClosure.depth<=? ' \
+               'ORDER BY TaxonClosure.depth ASC, Taxa.rankID ASC, ' \
+               'Taxa.scientificName ASC;'
+        oCursor = self.execute_query(sSQL, (iTaxonID, iMaxDepth,))
+        if oCursor:
+            yield from oCursor
+
+    def count_descendants(self, iTaxonID):
+        """ Counts all accepted taxa under the taxon by the closure of
+        TaxonTree.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :return: The number of descendants.
+        :rtype: int
+        """
+        sSQL = 'SELECT COUNT(*) FROM TaxonClosure ' \
+               'WHERE ancestorID=? AND depth>0;'
+        oCursor = self.execute_query(sSQL, (iTaxonID,))
+        if oCursor:
+            return oCursor.fetchone()[0]
+
+        return 0
+
+    def is_descendant(self, iTaxonID, iAncestorID):
+        """ Checks if the taxon is under another taxon in TaxonTree.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :param iAncestorID: ID of the supposed ancestor.
+        :type iAncestorID: int
+        :return: True if the taxon is under the ancestor, otherwise False.
+        :rtype: bool
+        """
+        sSQL = 'SELECT depth FROM TaxonClosure ' \
+               'WHERE ancestorID=? AND descendantID=? AND depth>0;'
+        oCursor = self.execute_query(sSQL, (iAncestorID, iTaxonID,))
+        if oCursor and oCursor.fetchone():
+            return True
+
+        return False
+
+    def link_closure(self, iTaxonID, iMainTaxonID=None):
+        """ Adds the taxon with its subtree to the closure of TaxonTree
+        under the main taxon.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :param iMainTaxonID: ID of the main taxon, or None if the taxon
+            isn't linked with the tree.
+        :type iMainTaxonID: int or None
+        :return: True if the closure is changed, otherwise False.
+        :rtype: bool
+        """
+        sSQL = 'INSERT OR IGNORE INTO TaxonClosure ' \
+               '(ancestorID, descendantID, depth) VALUES (?, ?, 0);'
+        if not self.execute_query(sSQL, (iTaxonID, iTaxonID,)):
+            return False
+        if iMainTaxonID is None:
+            return True
+
+        self.execute_query(sSQL, (iMainTaxonID, iMainTaxonID,))
+        sSQL = 'INSERT OR IGNORE INTO TaxonClosure ' \
+               '(ancestorID, descendantID, depth) ' \
+               'SELECT Super.ancestorID, Sub.descendantID, ' \
+               'Super.depth + Sub.depth + 1 ' \
+               'FROM TaxonClosure AS Super, TaxonClosure AS Sub ' \
+               'WHERE Super.descendantID=? AND Sub.ancestorID=?;'
+        return bool(self.execute_query(sSQL, (iMainTaxonID, iTaxonID,)))
+
+    def unlink_closure(self, iTaxonID):
+        """ Removes the links between the subtree of the taxon and the taxa
+        above it from the closure of TaxonTree.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :return: True if the closure is changed, otherwise False.
+        :rtype: bool
+        """
+        sSQL = 'DELETE FROM TaxonClosure ' \
+               'WHERE descendantID IN (SELECT descendantID ' \
+               'FROM TaxonClosure WHERE ancestorID=?) ' \
+               'AND ancestorID NOT IN (SELECT descendantID ' \
+               'FROM TaxonClosure WHERE ancestorID=?);'
+        return bool(self.execute_query(sSQL, (iTaxonID, iTaxonID,)))
+
+    def rebuild_closure(self):
+        """ Fills the closure of TaxonTree again. It is needed if TaxonTree
+        was changed bypassing set_main_taxon and set_taxon_status.
+
+        :return: True if the closure is rebuilt, otherwise False.
+        :rtype: bool
+        """
+        if not self.execute_script(f'BEGIN TRANSACTION; {TAXON_CLOSURE} '
+                                   'COMMIT;'):
+            self.oConnector.rollback()
+            logging.error('The closure of TaxonTree was not rebuilt.')
+            return False
+
+        return True
+
+    def get_taxonomy(self):
+        """ Gives the taxonomy kept in memory. It is created on the first
+        call and follows writes to the database.
+
+        :return: The index of the taxonomy.
+        :rtype: TaxonomyIndex
+        """
+        if self.oTaxonomy is None:
+            self.oTaxonomy = TaxonomyIndex(self)
+
+        return self.oTaxonomy
+
+    def onWriteNameIndex(self, sTable, tTaxonIDs=()):
+        """ Marks taxa, which should be updated in the index of names, or the
+        whole index as outdated, if IDs of changed taxa are unknown.
+
+        :param sTable: The changed table, or None if it is unknown.
+        :type sTable: str or None
+        :param tTaxonIDs: IDs of changed taxa, if they are known.
+        :type tTaxonIDs: tuple
+        """
+        if sTable is not None and sTable != 'Taxa':
+            return
+
+        with self.oNameIndexLock:
+            try:
+                setTaxonIDs = {int(TaxonID) for TaxonID in tTaxonIDs}
+            except (TypeError, ValueError):
+                setTaxonIDs = set()
+            if setTaxonIDs:
+                self.setNameIndexIDs.update(setTaxonIDs)
+            else:
+                self.tNameIndexVersion = None
+
+    def get_name_index(self):
+        """ Gives the trigram index of canonical names of all taxa. Names of
+        taxa, which were written since the last call, are updated in the
+        index. It is rebuilt, if changed taxa are unknown or the database
+        was changed by another connection.
+
+        :return: The index of names.
+        :rtype: TrigramIndex
+        """
+        oConnection = self.get_connection()
+        with self.oNameIndexLock:
+            oCursor = oConnection.execute('PRAGMA data_version;')
+            tVersion = (id(oConnection), oCursor.fetchone()[0],)
+            if tVersion != self.tNameIndexVersion:
+                self.oNameIndex.clear()
+                self.setNameIndexIDs.clear()
+                oCursor = self.execute_query('SELECT taxonID, canonicalName '
+                                             'FROM Taxa;')
+                if oCursor:
+                    for iTaxonID, sName in oCursor:
+                        self.oNameIndex.add(iTaxonID, sName)
+                    self.tNameIndexVersion = tVersion
+            elif self.setNameIndexIDs:
+                lTaxonIDs = list(self.setNameIndexIDs)
+                self.setNameIndexIDs.clear()
+                dNames = {}
+                for lChunk in get_chunks(lTaxonIDs, CHUNK_SIZE):
+                    sMarks = ', '.join('?' * len(lChunk))
+                    oCursor = self.execute_query(
+                        'SELECT taxonID, canonicalName FROM Taxa '
+                        f'WHERE taxonID IN ({sMarks});', lChunk)
+                    if not oCursor:
+                        self.tNameIndexVersion = None
+                        return self.oNameIndex
+                    dNames.update(oCursor)
+
+                # Deleted taxa aren't found, they are removed from the index.
+                for iTaxonID in lTaxonIDs:
+                    if iTaxonID in dNames:
+                        self.oNameIndex.add(iTaxonID, dNames[iTaxonID])
+                    else:
+                        self.oNameIndex.remove(iTaxonID)
+
+        return self.oNameIndex
+
+    def match_name(self, sName, fThreshold=0.5, iLimit=10):
+        """ Finds taxa with names similar to the given one. It finds names
+        with typos and orthographic variants.
+
+        :param sName: A canonical name of taxon, may be with typos.
+        :type sName: str
+        :param fThreshold: The min similarity of found names, from 0 to 1.
+        :type fThreshold: float
+        :param iLimit: The max number of found taxa.
+        :type iLimit: int
+        :return: A list of tuples with taxonID, canonicalName and similarity,
+            the most similar names go first.
+        :rtype: list[tuple[int, str, float]]
+        """
+        return self.get_name_index().match(sName, fThreshold, iLimit)
+
+    def search_taxa(self, sQuery, iLimit=20):
+        """ Searches taxa by the beginnings of words in scientific, canonical
+        and local names and authorship. The best matches go first.
+
+        :param sQuery: Text for searching.
+        :type sQuery: str
+        :param iLimit: The max number of found taxa.
+        :type iLimit: int
+        :return: Rows with taxonID and scientificName.
+        :rtype: list[tuple[int, str]]
+        """
+        sMatch = get_fts_query(sQuery)
+        if not sMatch:
+            return []
+
+        # The exact name goes first, then matches in canonicalName weigh more
+        # than in other columns.
+        sSQL = 'SELECT Taxa.taxonID, Taxa.scientificName ' \
+               'FROM TaxaSearch ' \
+               'JOIN Taxa ON Taxa.taxonID=TaxaSearch.rowid ' \
+               'WHERE TaxaSearch MATCH ? ' \
+               'ORDER BY Taxa.canonicalName=? COLLATE NOCASE DESC, ' \
+               'bm25(TaxaSearch, 2.0, 4.0, 1.0, 2.0), ' \
+               'length(Taxa.scientificName) ASC ' \
+               'LIMIT ?;'
+        oCursor = self.execute_query(sSQL, (sMatch, sQuery.strip(), iLimit,))
+        if oCursor:
+            return oCursor.fetchall()
+
+        return []
+
+    def get_taxon_page(self, iTaxonID):
+        """ Gets everything what is shown on the page of the taxon by one
+        query. Lists are aggregated into JSON by the database.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :return: A dictionary with keys: taxonID, scientificName,
+            canonicalName, authorship, rankID, rankName, statusID,
+            statusName, mainTaxonID, mainName, mainAuthorship, descendants,
+            and lists of lineage, synonyms, children (as lists of taxonID,
+            rankName, canonicalName, authorship) and links (as lists of
+            sourceAbbr, indexLink, taxonIndex). If there is no such taxon,
+            returns None.
+        :rtype: dict or None
+        """
+        sNames = 'SELECT json_group_array(json_array(taxonID, rankName, ' \
+                 'canonicalName, authorship)) FROM ('
+        sSQL = 'SELECT json_object(' \
+               "'taxonID', Taxa.taxonID, " \
+               "'scientificName', Taxa.scientificName, " \
+               "'canonicalName', Taxa.canonicalName, " \
+               "'authorship', Taxa.authorship, " \
+               "'rankID', Taxa.rankID, " \
+               "'rankName', TaxonRanks.rankName, " \
+               "'statusID', TaxonTree.statusID, " \
+               "'statusName', TaxonStatuses.statusLocalName, " \
+               "'mainTaxonID', TaxonTree.mainTaxonID, " \
+               "'mainName', MainTaxa.canonicalName, " \
+               "'mainAuthorship', MainTaxa.authorship, " \
+               "'descendants', (SELECT COUNT(*) FROM TaxonClosure " \
+               'WHERE ancestorID=:iTaxonID AND depth>0), ' \
+               f"'lineage', json(({sNames}" \
+               'SELECT Taxa.taxonID, TaxonRanks.rankName, ' \
+               'Taxa.canonicalName, Taxa.authorship ' \
+               'FROM TaxonClosure ' \
+               'JOIN Taxa ON Taxa.taxonID=TaxonClosure.ancestorID ' \
+               'JOIN TaxonRanks ON Taxa.rankID=TaxonRanks.rankID ' \
+               'WHERE TaxonClosure.descendantID=:iTaxonID ' \
+               'AND TaxonClosure.depth>0 ' \
+               'ORDER BY TaxonClosure.depth DESC))), ' \
+               f"'synonyms', json(({sNames}" \
+               'SELECT Taxa.taxonID, TaxonRanks.rankName, ' \
+               'Taxa.canonicalName, Taxa.authorship ' \
+               'FROM TaxonTree ' \
+               'JOIN Taxa ON Taxa.taxonID=TaxonTree.taxonID ' \
+               'JOIN TaxonRanks ON Taxa.rankID=TaxonRanks.rankID ' \
+               'WHERE TaxonTree.mainTaxonID=:iTaxonID ' \
+               'AND TaxonTree.statusID<>1 ' \
+               'ORDER BY Taxa.rankID ASC, Taxa.scientificName ASC))), ' \
+               f"'children', json(({sNames}" \
+               'SELECT Taxa.taxonID, TaxonRanks.rankName, ' \
+               'Taxa.canonicalName, Taxa.authorship ' \
+               'FROM TaxonTree ' \
+               'JOIN Taxa ON Taxa.taxonID=TaxonTree.taxonID ' \
+               'JOIN TaxonRanks ON Taxa.rankID=TaxonRanks.rankID ' \
+               'WHERE TaxonTree.mainTaxonID=:iTaxonID ' \
+               'AND TaxonTree.statusID=1 ' \
+               'AND TaxonTree.taxonID<>:iTaxonID ' \
+               'ORDER BY Taxa.rankID ASC, Taxa.scientificName ASC))), ' \
+               "'links', json((SELECT json_group_array(json_array(" \
+               'DBSources.sourceAbbr, DBSources.indexLink, ' \
+               'DBIndexes.taxonIndex)) ' \
+               'FROM DBIndexes ' \
+               'JOIN DBSources ON DBIndexes.sourceID=DBSources.sourceID ' \
+               'WHERE DBIndexes.taxonID=:iTaxonID))) ' \
+               'FROM Taxa ' \
+               'LEFT JOIN TaxonRanks ON Taxa.rankID=TaxonRanks.rankID ' \
+               'LEFT JOIN TaxonTree ON TaxonTree.taxonID=Taxa.taxonID ' \
+               'LEFT JOIN TaxonStatuses ' \
+               'ON TaxonTree.statusID=TaxonStatuses.statusID ' \
+               'LEFT JOIN Taxa AS MainTaxa ' \
+               'ON MainTaxa.taxonID=TaxonTree.mainTaxonID ' \
+               'WHERE Taxa.taxonID=:iTaxonID;'
+        oCursor = self.execute_query(sSQL, {'iTaxonID': iTaxonID})
+        if not oCursor:
+            return None
+
+        tRow = oCursor.fetchone()
+        if not tRow:
+            return None
+
+        return json.loads(tRow[0])
+
     def get_taxon_children(self, iID, sStatus):
         sSQL = 'SELECT TaxonRanks.rankName, Taxa.canonicalName, ' \
                'Taxa.authorship ' \
@@ -613,13 +1814,86 @@ class SQL:
 
     def insert_taxon(self, sName, sAuthor, iYear,
                      PublishedIn, iRank, iMainTax, iStatus):
-        sSciName = f'{sName} {sAuthor}'
-
-        iTaxonID = self.insert_row('Taxa',
-                                   'scientificName, canonicalName, '
-                                   'authorship, yearPublishing, '
-                                   'namePublishedIn, rankID ',
-                                   (sSciName, sName, sAuthor,
-                                    iYear, PublishedIn, iRank,))
-        self.insert_row('TaxonTree', 'taxonID, mainTaxonID, statusID',
-                        (iTaxonID, iMainTax, iStatus,))
+        """ Inserts a taxon into Taxa, TaxonTree and the closure of
+        TaxonTree. All rows are written in one transaction, so the taxon is
+        never saved half.
+
+        :return: ID of the inserted taxon, or False if it wasn't inserted.
+        :rtype: int or bool
+        """
+        # A name without the author is the scientific name as it is.
+        sSciName = f'{sName} {sAuthor}' if sAuthor else sName
+
+        with self.transaction():
+            iTaxonID = self.insert_row('Taxa',
+                                       'scientificName, canonicalName, '
+                                       'authorship, yearPublishing, '
+                                       'namePublishedIn, rankID ',
+                                       (sSciName, sName, sAuthor,
+                                        iYear, PublishedIn, iRank,))
+            if not iTaxonID or not self.insert_row(
+                    'TaxonTree', 'taxonID, mainTaxonID, statusID',
+                    (iTaxonID, iMainTax, iStatus,)):
+                return False
+
+            if iStatus != 1:
+                iMainTax = None
+            if self.link_closure(iTaxonID, iMainTax):
+                return iTaxonID
+
+        return False
+
+    def set_main_taxon(self, iTaxonID, iMainTaxonID):
+        """ Moves the taxon with its subtree under another main taxon.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :param iMainTaxonID: ID of the new main taxon.
+        :type iMainTaxonID: int
+        :return: True if the taxon is moved, otherwise False.
+        :rtype: bool
+        """
+        if iTaxonID == iMainTaxonID or \
+                self.is_descendant(iMainTaxonID, iTaxonID):
+            logging.error(f'The taxon {iMainTaxonID} is under the taxon '
+                          f'{iTaxonID}, so it can\'t be its main taxon.')
+            return False
+
+        with self.transaction():
+            if not self.update('TaxonTree', 'mainTaxonID', 'taxonID',
+                               (iMainTaxonID, iTaxonID,)):
+                return False
+
+            if self.get_tree_status(iTaxonID) != 1:
+                return True
+
+            return self.unlink_closure(iTaxonID) and \
+                self.link_closure(iTaxonID, iMainTaxonID)
+
+    def set_taxon_status(self, iTaxonID, iStatusID):
+        """ Changes the status of the taxon in TaxonTree. Only accepted taxa
+        have a subtree, so the closure is changed too.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :param iStatusID: ID of the new status.
+        :type iStatusID: int
+        :return: True if the status is changed, otherwise False.
+        :rtype: bool
+        """
+        with self.transaction():
+            if not self.update('TaxonTree', 'statusID', 'taxonID',
+                               (iStatusID, iTaxonID,)):
+                return False
+
+            if not self.unlink_closure(iTaxonID):
+                return False
+            if iStatusID != 1:
+                return True
+
+            iMainTaxonID = self.sql_get_id('TaxonTree', 'mainTaxonID',
+                                           'taxonID', (iTaxonID,))
+            return self.link_closure(iTaxonID, iMainTaxonID)
+
+    def get_tree_status(self, iTaxonID):
+        return self.sql_get_id('TaxonTree', 'statusID', 'taxonID', (iTaxonID,))
@@ -0,0 +1,287 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" The module keeps the state of synchronization of taxa with a source in
+the database, so that an interrupted synchronization continues from the
+place where it stopped.
+
+A job is created for all accepted taxa of one rank. Every taxon has a task
+for every phase: the taxon itself, its children and its synonyms. A task of
+a paged phase keeps the offset of the next page. The state of the task has
+to be saved in the same transaction as the data of the page, then after a
+crash the page is either saved with its offset, or fetched again.
+
+Function:
+    create_job(oConnector, sSource, iRankID)
+    get_last_job(oConnector, sSource, iRankID=None)
+
+Class:
+    SyncJob
+
+Using:
+    oJob = get_last_job(oConnector, 'GBIF') or \\
+        create_job(oConnector, 'GBIF', iRankID)
+    for iTaxonID, sName, dTasks in oJob.get_tasks():
+        with oConnector.transaction():
+            ...
+            oJob.save_task(iTaxonID, 'children', iOffset, bDone)
+    oJob.finish()
+"""
+
+import logging
+
+from mli.lib.sql import SQL
+
+# Phases of synchronization of a taxon in the order of processing.
+PHASES = ('taxon', 'children', 'synonyms')
+# Statuses of tasks.
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+# The number of taxa, which are read from the database at once.
+TASK_CHUNK = 500
+
+
+def create_job(oConnector, sSource, iRankID):
+    """ Creates the job with tasks for all accepted taxa of the rank. Tasks
+    are created by one query in the transaction with the job.
+
+    :param oConnector: An instance of the sqlite database api class.
+    :type oConnector: SQL
+    :param sSource: The abbreviation of the source, for example, 'GBIF'.
+    :type sSource: str
+    :param iRankID: ID of the rank in the database.
+    :type iRankID: int
+    :return: The job, or None if it wasn't created.
+    :rtype: SyncJob or None
+    """
+    sValues = ', '.join(f"('{sPhase}')" for sPhase in PHASES)
+    with oConnector.transaction():
+        iJobID = oConnector.insert_row('SyncJobs', 'source, rankID',
+                                       (sSource, iRankID,))
+        if not iJobID:
+            return None
+
+        oCursor = oConnector.execute_query(
+            'INSERT INTO SyncTasks (jobID, taxonID, phase) '
+            'SELECT ?, Taxa.taxonID, Phases.column1 FROM Taxa '
+            'JOIN TaxonTree ON TaxonTree.taxonID=Taxa.taxonID '
+            f'CROSS JOIN (VALUES {sValues}) AS Phases '
+            'WHERE Taxa.rankID=? AND TaxonTree.statusID=1;',
+            (iJobID, iRankID,))
+        if not oCursor:
+            oConnector.fail_transaction()
+            return None
+
+    logging.info(f'The job {iJobID} of synchronization with {sSource} was '
+                 f'created for {oCursor.rowcount // len(PHASES)} taxa.')
+    return SyncJob(oConnector, iJobID)
+
+
+def get_last_job(oConnector, sSource, iRankID=None):
+    """ Gives the last job of synchronization with the source, which isn't
+    finished.
+
+    :param oConnector: An instance of the sqlite database api class.
+    :type oConnector: SQL
+    :param sSource: The abbreviation of the source, for example, 'GBIF'.
+    :type sSource: str
+    :param iRankID: ID of the rank, by default, the job of any rank.
+    :type iRankID: int or None
+    :return: The job, or None if all jobs are finished.
+    :rtype: SyncJob or None
+    """
+    sSQL = "SELECT jobID FROM SyncJobs WHERE source=? AND status='running'"
+    tValues = (sSource,)
+    if iRankID is not None:
+        sSQL = f'{sSQL} AND rankID=?'
+        tValues = (sSource, iRankID,)
+
+    oCursor = oConnector.execute_query(f'{sSQL} ORDER BY jobID DESC LIMIT 1;',
+                                       tValues)
+    tRow = oCursor.fetchone() if oCursor else None
+    if not tRow:
+        return None
+
+    return SyncJob(oConnector, tRow[0])
+
+
+class SyncJob:
+    """ The job of synchronization of taxa of one rank with a source.
+
+    *Methods*
+      * __init__ -- Method reads the job from the database.
+      * get_tasks -- Method gives taxa with unfinished tasks.
+      * set_key -- Method saves the key of the taxon in the source.
+      * save_task -- Method saves the offset and the status of the task.
+      * fail_taxon -- Method marks unfinished tasks of the taxon as failed.
+      * get_progress -- Method counts finished tasks by phases.
+      * finish -- Method closes the job, if all tasks are finished.
+    """
+
+    def __init__(self, oConnector, iJobID):
+        """ Reads the job from the database.
+
+        :param oConnector: An instance of the sqlite database api class.
+        :type oConnector: SQL
+        :param iJobID: ID of the job.
+        :type iJobID: int
+        """
+        self.oConnector = oConnector
+        self.iJobID = iJobID
+        tRow = oConnector.execute_query(
+            'SELECT source, rankID, status FROM SyncJobs WHERE jobID=?;',
+            (iJobID,)).fetchone()
+        self.sSource, self.iRankID, self.sStatus = tRow
+
+    def get_tasks(self, bRetry=True):
+        """ Gives taxa with unfinished tasks in the order of their IDs. Taxa
+        are read by chunks, so a cursor isn't kept open, while tasks are
+        saved.
+
+        :param bRetry: If it is True, failed tasks are given again.
+        :type bRetry: bool
+        :return: ID of the taxon, its scientific name and a dictionary, where
+            a key is the phase, and a value is the key of the taxon in the
+            source and the offset of the next page.
+        :rtype: Iterator[tuple[int, str, dict[str, tuple[str|None, int]]]]
+        """
+        sStatuses = f"'{PENDING}', '{FAILED}'" if bRetry else f"'{PENDING}'"
+        sSQL = 'SELECT SyncTasks.taxonID, Taxa.scientificName, ' \
+               'SyncTasks.phase, SyncTasks.sourceKey, SyncTasks.pageOffset ' \
+               'FROM SyncTasks ' \
+               'JOIN Taxa ON Taxa.taxonID=SyncTasks.taxonID ' \
+               'WHERE SyncTasks.jobID=? AND SyncTasks.taxonID IN (' \
+               'SELECT DISTINCT taxonID FROM SyncTasks ' \
+               f'WHERE jobID=? AND status IN ({sStatuses}) AND taxonID>? ' \
+               'ORDER BY taxonID LIMIT ?) ' \
+               f'AND SyncTasks.status IN ({sStatuses}) ' \
+               'ORDER BY SyncTasks.taxonID;'
+        iLastID = -1
+        while True:
+            oCursor = self.oConnector.execute_query(
+                sSQL, (self.iJobID, self.iJobID, iLastID, TASK_CHUNK,))
+            lRows = oCursor.fetchall() if oCursor else []
+            if not lRows:
+                return
+
+            dTaxa = {}
+            for iTaxonID, sName, sPhase, sKey, iOffset in lRows:
+                dTaxa.setdefault(iTaxonID, (sName, {}))[1][sPhase] = \
+                    (sKey, iOffset)
+            for iTaxonID, (sName, dTasks) in dTaxa.items():
+                yield iTaxonID, sName, dTasks
+            iLastID = lRows[-1][0]
+
+    def set_key(self, iTaxonID, sKey):
+        """ Saves the key of the taxon in the source for all its tasks, so
+        the key isn't looked up again.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :param sKey: The key of the taxon in the source.
+        :type sKey: str
+        :return: True if the key is saved, otherwise False.
+        :rtype: bool
+        """
+        return self.oConnector.update('SyncTasks', 'sourceKey',
+                                      'jobID, taxonID',
+                                      (str(sKey), self.iJobID, iTaxonID,))
+
+    def save_task(self, iTaxonID, sPhase, iOffset=0, bDone=True):
+        """ Saves the offset of the next page and the status of the task. It
+        has to be called in the transaction, which saves the data of the
+        page.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :param sPhase: The phase from PHASES.
+        :type sPhase: str
+        :param iOffset: The offset of the next page.
+        :type iOffset: int
+        :param bDone: If it is True, the task is finished.
+        :type bDone: bool
+        :return: True if the task is saved, otherwise False.
+        :rtype: bool
+        """
+        return self.oConnector.update('SyncTasks', 'pageOffset, status',
+                                      'jobID, taxonID, phase',
+                                      (iOffset, DONE if bDone else PENDING,
+                                       self.iJobID, iTaxonID, sPhase,))
+
+    def fail_taxon(self, iTaxonID):
+        """ Marks unfinished tasks of the taxon as failed, for example, when
+        the source hasn't the taxon.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :return: True if tasks are marked, otherwise False.
+        :rtype: bool
+        """
+        if self.oConnector.execute_query(
+                'UPDATE SyncTasks SET status=? '
+                'WHERE jobID=? AND taxonID=? AND status<>?;',
+                (FAILED, self.iJobID, iTaxonID, DONE,)):
+            self.oConnector.commit()
+            return True
+
+        return False
+
+    def get_progress(self):
+        """ Counts tasks by phases and statuses.
+
+        :return: A dictionary, where a key is the phase, and a value is a
+            dictionary with numbers of tasks by statuses and the key 'total'.
+        :rtype: dict[str, dict[str, int]]
+        """
+        dProgress = {sPhase: {PENDING: 0, DONE: 0, FAILED: 0, 'total': 0}
+                     for sPhase in PHASES}
+        oCursor = self.oConnector.execute_query(
+            'SELECT phase, status, COUNT(*) FROM SyncTasks '
+            'WHERE jobID=? GROUP BY phase, status;', (self.iJobID,))
+        for sPhase, sStatus, iCount in oCursor or []:
+            dProgress[sPhase][sStatus] = iCount
+            dProgress[sPhase]['total'] += iCount
+
+        return dProgress
+
+    def finish(self):
+        """ Closes the job, if it has no pending tasks. Failed tasks don't
+        keep the job open, they can be repeated by a new job.
+
+        :return: True if the job is finished, otherwise False.
+        :rtype: bool
+        """
+        oCursor = self.oConnector.execute_query(
+            'SELECT 1 FROM SyncTasks WHERE jobID=? AND status=? LIMIT 1;',
+            (self.iJobID, PENDING,))
+        if not oCursor or oCursor.fetchone():
+            return False
+
+        if self.oConnector.execute_query(
+                "UPDATE SyncJobs SET status='done', "
+                "finished=datetime('now') WHERE jobID=?;", (self.iJobID,)):
+            self.oConnector.commit()
+            self.sStatus = 'done'
+            return True
+
+        return False
+
+
+if __name__ == '__main__':
+    pass
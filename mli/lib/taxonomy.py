@@ -0,0 +1,354 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" The module keeps the taxonomy in memory, so that names, ranks, statuses,
+parents and children of taxa are got without queries to the database.
+
+Taxa are stored in parallel arrays, where the same position (row) in every
+array belongs to one taxon. Names of all taxa are kept in one string, and
+the array of offsets points to names of the taxon in it. Children of taxa
+are kept in the compressed sparse row form: children of the taxon in the
+row i are rows aChildren[aChildOffsets[i]:aChildOffsets[i + 1]].
+
+The index is loaded on the first request and is marked as outdated when
+the tables of the taxonomy are changed through SQL, then it is loaded again
+on the next request.
+
+Class:
+    TaxonomyIndex
+
+Using:
+    oTaxonomy = TaxonomyIndex(oConnector)
+    iTaxonID = oTaxonomy.get_id('Acarospora A.Massal., 1852')
+    oTaxonomy.get_children(iTaxonID)
+"""
+
+import sys
+from array import array
+
+# The tables which the index is loaded from.
+TAXONOMY_TABLES = ('Taxa', 'TaxonTree', 'TaxonRanks', 'TaxonStatuses')
+# The number of names of every taxon: scientificName, canonicalName and
+# authorship.
+NAMES_PER_TAXON = 3
+
+
+class TaxonomyIndex:
+    """ The taxonomy loaded from Taxa, TaxonTree, TaxonRanks and
+    TaxonStatuses into arrays.
+
+    *Methods*
+      * __init__ -- Method initializes the index and subscribes it to writes.
+      * __len__ -- Method returns the number of taxa.
+      * onWrite -- Method marks the index as outdated after a write.
+      * load -- Method loads the index from the database.
+      * get_row -- Method gives the row of the taxon in arrays.
+      * get_id -- Method finds ID of the taxon by its scientific name.
+      * get_names -- Method gives names of the taxon.
+      * get_rank -- Method gives the rank of the taxon.
+      * get_status -- Method gives the status of the taxon.
+      * get_parent -- Method gives ID of the main taxon.
+      * get_children -- Method gives IDs of taxa under the taxon.
+      * get_synonyms -- Method gives IDs of synonyms of the taxon.
+      * get_roots -- Method gives IDs of taxa on the top of the tree.
+      * get_memory -- Method measures memory used by the index.
+    """
+
+    def __init__(self, oConnector):
+        """ Initializes the index. It is loaded on the first request.
+
+        :param oConnector: Instance attribute of SQL.
+        :type oConnector: SQL
+        """
+        self.oConnector = oConnector
+        self.bValid = False
+        self.aIDs = array('l')
+        self.aParents = array('l')
+        self.aRanks = array('l')
+        self.aStatuses = array('l')
+        self.aNameOffsets = array('l', [0])
+        self.sNames = ''
+        self.aChildOffsets = array('l', [0])
+        self.aChildren = array('l')
+        self.dRows = {}
+        self.dNames = {}
+        self.dRanks = {}
+        self.dStatuses = {}
+        oConnector.add_write_listener(self.onWrite)
+
+    def __len__(self):
+        """ Returns the number of taxa in the index.
+
+        :return: The number of taxa.
+        :rtype: int
+        """
+        self.check()
+        return len(self.aIDs)
+
+    def onWrite(self, sTable, tTaxonIDs=()):
+        """ Marks the index as outdated if the taxonomy has been changed.
+
+        :param sTable: The changed table, or None if it is unknown.
+        :type sTable: str or None
+        :param tTaxonIDs: IDs of changed taxa, if they are known.
+        :type tTaxonIDs: tuple
+        """
+        if sTable is None or sTable in TAXONOMY_TABLES:
+            self.bValid = False
+
+    def check(self):
+        """ Loads the index again if it is outdated. """
+        if not self.bValid:
+            self.load()
+
+    def load(self):
+        """ Loads the index from the database. Children of every taxon are
+        kept in the order of rank and scientific name.
+
+        :return: True if the index is loaded, otherwise False.
+        :rtype: bool
+        """
+        oCursor = self.oConnector.execute_query(
+            'SELECT rankID, rankName, rankLocalName FROM TaxonRanks;')
+        if not oCursor:
+            return False
+        self.dRanks = {tRow[0]: tRow for tRow in oCursor}
+
+        oCursor = self.oConnector.execute_query(
+            'SELECT statusID, statusName, statusLocalName '
+            'FROM TaxonStatuses;')
+        if not oCursor:
+            return False
+        self.dStatuses = {tRow[0]: tRow for tRow in oCursor}
+
+        oCursor = self.oConnector.execute_query(
+            'SELECT Taxa.taxonID, TaxonTree.mainTaxonID, Taxa.rankID, '
+            'TaxonTree.statusID, Taxa.scientificName, Taxa.canonicalName, '
+            'Taxa.authorship '
+            'FROM Taxa '
+            'LEFT JOIN TaxonTree ON TaxonTree.taxonID=Taxa.taxonID '
+            'ORDER BY Taxa.rankID ASC, Taxa.scientificName ASC;')
+        if not oCursor:
+            return False
+
+        aIDs, aParents = array('l'), array('l')
+        aRanks, aStatuses = array('l'), array('l')
+        aNameOffsets = array('l', [0])
+        lNames = []
+        dRows, dNames = {}, {}
+        iOffset = 0
+        for iTaxonID, iParentID, iRankID, iStatusID, *lTaxonNames in oCursor:
+            # A taxon can have only one place in the tree.
+            if iTaxonID in dRows:
+                continue
+
+            dRows[iTaxonID] = len(aIDs)
+            aIDs.append(iTaxonID)
+            aParents.append(iParentID or 0)
+            aRanks.append(iRankID or 0)
+            aStatuses.append(iStatusID or 0)
+            for sName in lTaxonNames:
+                sName = sName or ''
+                lNames.append(sName)
+                iOffset = iOffset + len(sName)
+                aNameOffsets.append(iOffset)
+            if lTaxonNames[0]:
+                dNames.setdefault(lTaxonNames[0], dRows[iTaxonID])
+
+        # Children are counted for every parent, then placed in the row of
+        # the parent by the cursor, which goes back from the end of the row.
+        aChildOffsets = array('l', bytes(aIDs.itemsize * (len(aIDs) + 1)))
+        for iParentID in aParents:
+            iParentRow = dRows.get(iParentID)
+            if iParentRow is not None:
+                aChildOffsets[iParentRow + 1] += 1
+        for i in range(len(aIDs)):
+            aChildOffsets[i + 1] += aChildOffsets[i]
+
+        aChildren = array('l', bytes(aIDs.itemsize * aChildOffsets[-1]))
+        aCursors = array('l', aChildOffsets[1:])
+        for iRow in range(len(aIDs) - 1, -1, -1):
+            iParentRow = dRows.get(aParents[iRow])
+            if iParentRow is not None:
+                aCursors[iParentRow] -= 1
+                aChildren[aCursors[iParentRow]] = iRow
+
+        self.aIDs, self.aParents = aIDs, aParents
+        self.aRanks, self.aStatuses = aRanks, aStatuses
+        self.aNameOffsets, self.sNames = aNameOffsets, ''.join(lNames)
+        self.aChildOffsets, self.aChildren = aChildOffsets, aChildren
+        self.dRows, self.dNames = dRows, dNames
+        self.bValid = True
+        return True
+
+    def get_row(self, iTaxonID):
+        """ Gives the row of the taxon in arrays.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :return: The row, or None if there is no such taxon.
+        :rtype: int or None
+        """
+        self.check()
+        return self.dRows.get(iTaxonID)
+
+    def get_id(self, sSciName):
+        """ Finds ID of the taxon by its scientific name.
+
+        :param sSciName: The scientific name of the taxon.
+        :type sSciName: str
+        :return: ID of the taxon, or None if there is no such taxon.
+        :rtype: int or None
+        """
+        self.check()
+        iRow = self.dNames.get(sSciName)
+        if iRow is None:
+            return None
+
+        return self.aIDs[iRow]
+
+    def get_names(self, iTaxonID):
+        """ Gives names of the taxon.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :return: Scientific name, canonical name and authorship, or None if
+            there is no such taxon.
+        :rtype: tuple[str, str, str] or None
+        """
+        iRow = self.get_row(iTaxonID)
+        if iRow is None:
+            return None
+
+        iStart = iRow * NAMES_PER_TAXON
+        aOffsets = self.aNameOffsets[iStart:iStart + NAMES_PER_TAXON + 1]
+        return tuple(self.sNames[aOffsets[i]:aOffsets[i + 1]]
+                     for i in range(NAMES_PER_TAXON))
+
+    def get_rank(self, iTaxonID):
+        """ Gives the rank of the taxon.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :return: rankID, rankName and rankLocalName, or None if there is no
+            such taxon.
+        :rtype: tuple[int, str, str] or None
+        """
+        iRow = self.get_row(iTaxonID)
+        if iRow is None:
+            return None
+
+        return self.dRanks.get(self.aRanks[iRow])
+
+    def get_status(self, iTaxonID):
+        """ Gives the status of the taxon.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :return: statusID, statusName and statusLocalName, or None if the
+            taxon isn't in the tree.
+        :rtype: tuple[int, str, str] or None
+        """
+        iRow = self.get_row(iTaxonID)
+        if iRow is None:
+            return None
+
+        return self.dStatuses.get(self.aStatuses[iRow])
+
+    def get_parent(self, iTaxonID):
+        """ Gives ID of the main taxon. For accepted taxa it is the parent in
+        the tree, for synonyms it is the accepted name.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :return: ID of the main taxon, or None if the taxon isn't in the tree.
+        :rtype: int or None
+        """
+        iRow = self.get_row(iTaxonID)
+        if iRow is None or not self.aParents[iRow]:
+            return None
+
+        return self.aParents[iRow]
+
+    def get_children(self, iTaxonID, iStatusID=1):
+        """ Gives IDs of taxa which have the taxon as the main one.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :param iStatusID: The status of children, or None for all of them
+            (by default, accepted).
+        :type iStatusID: int or None
+        :return: IDs of children in the order of rank and name.
+        :rtype: list[int]
+        """
+        iRow = self.get_row(iTaxonID)
+        if iRow is None:
+            return []
+
+        iStart, iEnd = self.aChildOffsets[iRow], self.aChildOffsets[iRow + 1]
+        return [self.aIDs[iChild] for iChild in self.aChildren[iStart:iEnd]
+                if iStatusID is None or self.aStatuses[iChild] == iStatusID]
+
+    def get_synonyms(self, iTaxonID):
+        """ Gives IDs of taxa which are not accepted and have the taxon as the
+        main one.
+
+        :param iTaxonID: ID of the taxon.
+        :type iTaxonID: int
+        :return: IDs of synonyms in the order of rank and name.
+        :rtype: list[int]
+        """
+        return [iChildID for iChildID in self.get_children(iTaxonID, None)
+                if self.aStatuses[self.dRows[iChildID]] != 1]
+
+    def get_roots(self):
+        """ Gives IDs of accepted taxa which have no main taxon, so they are
+        on the top of the tree.
+
+        :return: IDs of taxa in the order of rank and name.
+        :rtype: list[int]
+        """
+        self.check()
+        return [self.aIDs[iRow] for iRow in range(len(self.aIDs))
+                if self.aStatuses[iRow] == 1 and
+                self.aParents[iRow] not in self.dRows]
+
+    def get_memory(self):
+        """ Measures memory used by the index.
+
+        :return: A dictionary with the number of taxa, the size of arrays,
+            names and maps in bytes, the total size and the size per taxon.
+        :rtype: dict[str, int|float]
+        """
+        self.check()
+        iArrays = sum(sys.getsizeof(aArray) for aArray in (
+            self.aIDs, self.aParents, self.aRanks, self.aStatuses,
+            self.aNameOffsets, self.aChildOffsets, self.aChildren))
+        iNames = sys.getsizeof(self.sNames)
+        iMaps = sys.getsizeof(self.dRows) + sys.getsizeof(self.dNames) + \
+            sum(sys.getsizeof(sName) for sName in self.dNames)
+        iTotal = iArrays + iNames + iMaps
+        iTaxa = len(self.aIDs)
+
+        return {'taxa': iTaxa, 'arrays': iArrays, 'names': iNames,
+                'maps': iMaps, 'total': iTotal,
+                'per_taxon': iTotal / iTaxa if iTaxa else 0.0}
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,190 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" The module provides fuzzy matching of names of taxa. A name is split into
+trigrams (all substrings of three characters), and names are similar if they
+have many common trigrams. It finds names with typos and orthographic
+variants, for example, Acarospora irregularis and Acarospora iregularis.
+
+Function:
+    get_similarity(sName, sOtherName)
+    get_trigrams(sName)
+
+Class:
+    TrigramIndex
+
+Using:
+    oIndex = TrigramIndex()
+    oIndex.add(1, 'Acarospora irregularis')
+    oIndex.match('Acarospora iregularis', 0.5)
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from itertools import chain
+
+
+def get_trigrams(sName):
+    """ Splits the name into trigrams. The name is lowered and cleaned of
+    diacritics and punctuation, and every word is padded with spaces, so that
+    beginnings of words weigh more.
+
+    :param sName: A name of taxon.
+    :type sName: str
+    :return: A set of trigrams of the name.
+    :rtype: set[str]
+    """
+    sName = unicodedata.normalize('NFKD', sName.casefold())
+    sName = ''.join(sChar for sChar in sName
+                    if not unicodedata.combining(sChar))
+    setTrigrams = set()
+    for sWord in re.findall(r'\w+', sName):
+        sWord = f'  {sWord} '
+        for i in range(len(sWord) - 2):
+            setTrigrams.add(sWord[i:i + 3])
+
+    return setTrigrams
+
+
+def get_similarity(sName, sOtherName):
+    """ Calculates similarity of two names as a share of common trigrams.
+
+    :param sName: A name of taxon.
+    :type sName: str
+    :param sOtherName: Another name of taxon.
+    :type sOtherName: str
+    :return: Similarity from 0 (nothing common) to 1 (the same names).
+    :rtype: float
+    """
+    setTrigrams = get_trigrams(sName)
+    setOtherTrigrams = get_trigrams(sOtherName)
+    iCommon = len(setTrigrams & setOtherTrigrams)
+    if not iCommon:
+        return 0.0
+
+    return iCommon / (len(setTrigrams) + len(setOtherTrigrams) - iCommon)
+
+
+class TrigramIndex:
+    """ An inverted index from trigrams to names which contain them.
+
+    *Methods*
+      * __init__ -- Method initializes an empty index.
+      * __len__ -- Method returns the number of names in the index.
+      * add -- Method adds a name to the index.
+      * remove -- Method removes a name from the index.
+      * clear -- Method removes all names from the index.
+      * match -- Method finds names which are similar to the given one.
+    """
+
+    def __init__(self):
+        """ Initializes an empty index. """
+        self.dPostings = {}
+        self.dNames = {}
+        self.dTrigrams = {}
+
+    def __len__(self):
+        """ Returns the number of names in the index.
+
+        :return: The number of names.
+        :rtype: int
+        """
+        return len(self.dNames)
+
+    def add(self, iID, sName):
+        """ Adds the name to the index. If the ID is in the index, its name is
+        replaced.
+
+        :param iID: ID of the name, for example, taxonID.
+        :type iID: int
+        :param sName: A name of taxon.
+        :type sName: str
+        :return: None
+        """
+        if iID in self.dNames:
+            self.remove(iID)
+
+        setTrigrams = get_trigrams(sName or '')
+        self.dNames[iID] = sName
+        self.dTrigrams[iID] = setTrigrams
+        for sTrigram in setTrigrams:
+            self.dPostings.setdefault(sTrigram, set()).add(iID)
+
+    def remove(self, iID):
+        """ Removes the name from the index.
+
+        :param iID: ID of the name.
+        :type iID: int
+        :return: None
+        """
+        if iID not in self.dNames:
+            return
+
+        for sTrigram in self.dTrigrams.pop(iID):
+            setIDs = self.dPostings[sTrigram]
+            setIDs.discard(iID)
+            if not setIDs:
+                del self.dPostings[sTrigram]
+        del self.dNames[iID]
+
+    def clear(self):
+        """ Removes all names from the index. """
+        self.dPostings = {}
+        self.dNames = {}
+        self.dTrigrams = {}
+
+    def match(self, sName, fThreshold=0.5, iLimit=10):
+        """ Finds names which are similar to the given one.
+
+        :param sName: A name of taxon, may be with typos.
+        :type sName: str
+        :param fThreshold: The min similarity of found names, from 0 to 1.
+        :type fThreshold: float
+        :param iLimit: The max number of found names.
+        :type iLimit: int
+        :return: A list of tuples with ID, name and similarity, the most
+            similar names go first.
+        :rtype: list[tuple[int, str, float]]
+        """
+        setTrigrams = get_trigrams(sName)
+        iSize = len(setTrigrams)
+        if not iSize:
+            return []
+
+        oCommon = Counter(chain.from_iterable(
+            self.dPostings.get(sTrigram, ()) for sTrigram in setTrigrams))
+
+        # The union of trigrams isn't less than the trigrams of the name, so
+        # names with fewer common trigrams can't be similar enough.
+        fMinCommon = fThreshold * iSize
+        lMatches = []
+        for iID, iCommon in oCommon.items():
+            if iCommon < fMinCommon:
+                continue
+            fSimilarity = iCommon / (iSize + len(self.dTrigrams[iID]) -
+                                     iCommon)
+            if fSimilarity >= fThreshold:
+                lMatches.append((iID, self.dNames[iID], fSimilarity))
+
+        lMatches.sort(key=lambda tMatch: (-tMatch[2], tMatch[1]))
+        return lMatches[:iLimit]
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,199 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" The command line program, which synchronizes the database with other
+sources without the window of the program. A job, which was interrupted,
+is continued with the flag --resume. Lichens can be imported from the
+archive of the GBIF Backbone Taxonomy without requests to the server.
+
+Using:
+    mli-sync gbif --rank genus
+    mli-sync gbif --resume
+    mli-sync dwca --archive backbone.zip
+
+Function:
+    get_arguments(lArgs=None)
+    get_db_path(oConfig, sBasePath)
+    import_archive(oConnector, sArchive)
+    main(lArgs=None)
+"""
+
+import sys
+from argparse import ArgumentParser
+from configparser import ConfigParser
+from os import path
+
+from mli.lib.dwca_import import DwCAImporter
+from mli.lib.gbif_parser import GBIF_SOURCE, gbif_sync
+from mli.lib.harvester import get_harvester, get_harvester_profile
+from mli.lib.sql import SQL, check_connect_db, get_db_profile
+from mli.lib.str import str_get_file_patch
+from mli.lib.sync_job import PHASES, create_job, get_last_job
+
+
+def get_arguments(lArgs=None):
+    """ Parses arguments of the command line.
+
+    :param lArgs: Arguments, by default, arguments of the program.
+    :type lArgs: list[str] or None
+    :return: Parsed arguments.
+    :rtype: argparse.Namespace
+    """
+    oParser = ArgumentParser(prog='mli-sync',
+                             description='Synchronizes taxa of the database '
+                                         'with other sources.')
+    oParser.add_argument('source', choices=('gbif', 'dwca'),
+                         help='the source of taxa: the GBIF API or the '
+                              'archive of the GBIF Backbone Taxonomy')
+    oParser.add_argument('--archive', default=None,
+                         help='the zip archive of the backbone for dwca')
+    oParser.add_argument('--rank', default=None,
+                         help='the rank of taxa, for example, genus')
+    oParser.add_argument('--resume', action='store_true',
+                         help='continue the last unfinished job')
+    oParser.add_argument('--config', default=None,
+                         help='the configuration file of the program')
+    oParser.add_argument('--db', default=None,
+                         help='the database instead of one from the '
+                              'configuration file')
+
+    return oParser.parse_args(lArgs)
+
+
+def get_db_path(oConfig, sBasePath):
+    """ Gives the path to the database in the same way as the window of the
+    program does.
+
+    :param oConfig: The object of the configuration file.
+    :type oConfig: ConfigParser
+    :param sBasePath: The directory of the program.
+    :type sBasePath: str
+    :return: The path to the database.
+    :rtype: str
+    """
+    sDBPath = oConfig.get('DB', 'db_path', fallback='')
+    if not sDBPath:
+        sDBPath = str_get_file_patch(sBasePath,
+                                     oConfig.get('DB', 'db_dir',
+                                                 fallback='db'))
+        sDBPath = str_get_file_patch(sDBPath,
+                                     oConfig.get('DB', 'db_file',
+                                                 fallback='mli.db'))
+
+    return sDBPath
+
+
+def import_archive(oConnector, sArchive):
+    """ Imports lichens from the archive of the GBIF Backbone Taxonomy and
+    prints the progress.
+
+    :param oConnector: An instance of the sqlite database api class.
+    :type oConnector: SQL
+    :param sArchive: The path to the zip archive.
+    :type sArchive: str
+    :return: The code of exit, 0 if the archive is imported, otherwise 1.
+    :rtype: int
+    """
+    def print_progress(sStage, dStats):
+        print(f'{sStage}: {dStats["read"]} rows read, {dStats["staged"]} '
+              f'staged, {dStats["inserted"]} inserted, '
+              f'{dStats["rows_per_second"]:.0f} rows/s.')
+
+    dStats = DwCAImporter(oConnector,
+                          fProgress=print_progress).run(sArchive)
+    if dStats is None:
+        print(f'The archive {sArchive} is not imported.')
+        return 1
+
+    print(f'{dStats["inserted"]} taxa inserted, {dStats["existing"]} '
+          f'existing, {dStats["skipped"]} skipped in '
+          f'{dStats["seconds"]:.1f} s.')
+    return 0
+
+
+def main(lArgs=None):
+    """ Runs the job of synchronization or imports the archive.
+
+    :param lArgs: Arguments, by default, arguments of the program.
+    :type lArgs: list[str] or None
+    :return: The code of exit, 0 if the job is finished or the archive is
+        imported, 1 if it isn't, and 2 if it can't be started.
+    :rtype: int
+    """
+    oArgs = get_arguments(lArgs)
+    sBasePath = path.dirname(path.dirname(path.realpath(__file__)))
+    sConfig = oArgs.config or str_get_file_patch(sBasePath, 'config.ini')
+    oConfig = ConfigParser()
+    oConfig.read(sConfig)
+
+    sDBPath = oArgs.db or get_db_path(oConfig, sBasePath)
+    oConnector = SQL(sDBPath, get_db_profile(oConfig))
+    if check_connect_db(oConnector, sBasePath,
+                        oConfig.get('DB', 'db_dir', fallback='db')) is False:
+        print(f'The database {sDBPath} can not be created.')
+        return 2
+
+    if oArgs.source == 'dwca':
+        if not oArgs.archive:
+            print('The archive is required for dwca.')
+            return 2
+        return import_archive(oConnector, oArgs.archive)
+
+    iRankID = None
+    if oArgs.rank:
+        iRankID = oConnector.get_rank_id('rankName', oArgs.rank.lower())
+        if not iRankID:
+            print(f'The rank {oArgs.rank} is unknown.')
+            return 2
+
+    if oArgs.resume:
+        oJob = get_last_job(oConnector, GBIF_SOURCE, iRankID)
+        if not oJob:
+            print('There is no unfinished job.')
+            return 2
+    elif iRankID:
+        oJob = create_job(oConnector, GBIF_SOURCE, iRankID)
+        if not oJob:
+            print('The job can not be created.')
+            return 2
+    else:
+        print('The rank is required for a new job.')
+        return 2
+
+    print(f'Job {oJob.iJobID}, rank {oJob.iRankID}.')
+    oHarvester = get_harvester(get_harvester_profile(oConfig,
+                                                     sBasePath=sBasePath))
+    try:
+        bDone = gbif_sync(oConnector, oJob, oHarvester)
+    except KeyboardInterrupt:
+        print('The job is interrupted, it can be continued with --resume.')
+        bDone = False
+    finally:
+        oHarvester.close()
+
+    dProgress = oJob.get_progress()
+    for sPhase in PHASES:
+        dPhase = dProgress[sPhase]
+        print(f'{sPhase}: {dPhase["done"]} of {dPhase["total"]} done, '
+              f'{dPhase["failed"]} failed.')
+
+    return 0 if bDone else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" Benchmarks for the database API. They are not a part of the unit tests,
+run them by hand:
+
+.. code-block::
+
+    python bench_sql.py
+"""
+import logging
+from os import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from mli.lib.migration import migrate_db
+from mli.lib.sql import SQL
+
+SIZES = (1000, 10000, 100000)
+REPEAT = 200
+BULK_ROWS = 2000
+
+
+def get_structure_file():
+    """ Finds the dump of the database structure.
+
+    :return: The path to db_structure.sql.
+    :rtype: str
+    """
+    sDir = path.dirname(path.realpath(__file__))
+    return path.join(sDir, '..', 'db', 'db_structure.sql')
+
+
+def create_db(iRows):
+    """ Creates the database in memory from the dump and adds synthetic taxa
+    to it, so that Taxa, TaxonTree and DBIndexes contain about iRows rows.
+
+    :param iRows: A number of synthetic taxa.
+    :type iRows: int
+    :return: The connector to the database.
+    :rtype: SQL
+    """
+    oConnector = SQL(':memory:')
+    with open(get_structure_file()) as fFile:
+        oConnector.execute_script(fFile.read())
+
+    iStart = oConnector.sql_count('Taxa') + 1000
+    oConnection = oConnector.oConnector
+    oConnection.executemany(
+        'INSERT INTO Taxa (taxonID, scientificName, canonicalName, '
+        'authorship, rankID) VALUES (?, ?, ?, ?, 21)',
+        ((i, f'Bench taxon{i} Auth.', f'Bench taxon{i}', 'Auth.')
+         for i in range(iStart, iStart + iRows)))
+    oConnection.executemany(
+        'INSERT INTO TaxonTree (taxonID, mainTaxonID, statusID) '
+        'VALUES (?, ?, 1)',
+        ((i, iStart + i % 100) for i in range(iStart, iStart + iRows)))
+    oConnection.executemany(
+        'INSERT INTO DBIndexes (taxonID, sourceID, taxonIndex) '
+        'VALUES (?, 12, ?)',
+        ((i, str(i)) for i in range(iStart, iStart + iRows)))
+    oConnection.commit()
+
+    return oConnector
+
+
+def get_latency(fFunction, *args):
+    """ Measures an average latency of the function call.
+
+    :param fFunction: The function which should be measured.
+    :type fFunction: function
+    :return: The average latency in microseconds.
+    :rtype: float
+    """
+    fStart = perf_counter()
+    for _ in range(REPEAT):
+        fFunction(*args)
+
+    return (perf_counter() - fStart) / REPEAT * 1000000
+
+
+def bench_lookups(oConnector):
+    """ Measures the latency of the lookups which use the indexed columns.
+
+    :param oConnector: The connector to the database.
+    :type oConnector: SQL
+    :return: A dictionary where a key is the name of the lookup, and a value
+        is its latency in microseconds.
+    :rtype: dict[str, float]
+    """
+    iTaxonID = oConnector.sql_count('Taxa')
+    sName = oConnector.get_name_author(1)[0][0]
+    return {
+        'get_taxon_id': get_latency(oConnector.get_taxon_id, sName),
+        'get_taxon_info': get_latency(oConnector.get_taxon_info, sName),
+        'get_synonyms': get_latency(oConnector.get_synonyms, iTaxonID),
+        'get_taxon_children': get_latency(oConnector.get_taxon_children,
+                                          iTaxonID, 'действительный'),
+        'get_taxon_db_link': get_latency(oConnector.get_taxon_db_link,
+                                         iTaxonID)}
+
+
+def bench_indexes():
+    """ Prints how the latency of lookups scales with the number of rows
+    before and after the migration which adds indexes.
+    """
+    print(f'{"lookup":<20}{"rows":>8}{"before, us":>14}{"after, us":>14}')
+    for iRows in SIZES:
+        oConnector = create_db(iRows)
+        dBefore = bench_lookups(oConnector)
+        migrate_db(oConnector)
+        dAfter = bench_lookups(oConnector)
+        for sLookup in dBefore:
+            print(f'{sLookup:<20}{iRows:>8}'
+                  f'{dBefore[sLookup]:>14.1f}{dAfter[sLookup]:>14.1f}')
+        del oConnector
+
+
+def bench_search():
+    """ Prints the latency of search_taxa and of the substring search over
+    the list of all names, which was used by the completer before.
+    """
+    print(f'{"search":<20}{"rows":>8}{"list, us":>14}{"fts, us":>14}')
+    for iRows in SIZES:
+        oConnector = create_db(iRows)
+        migrate_db(oConnector)
+
+        def search_list(sQuery):
+            lNames = [tRow[0] for tRow in oConnector.get_full_taxon_list()]
+            return [sName for sName in lNames if sQuery in sName][:20]
+
+        fList = get_latency(search_list, 'taxon99')
+        fSearch = get_latency(oConnector.search_taxa, 'taxon99')
+        print(f'{"search_taxa":<20}{iRows:>8}{fList:>14.1f}{fSearch:>14.1f}')
+        del oConnector
+
+
+def bench_bulk():
+    """ Prints how long it takes to insert rows in DBIndexes of the database
+    on the disk one by one and with insert_rows.
+    """
+    with TemporaryDirectory() as sDir:
+        oConnector = SQL(path.join(sDir, 'bench.db'))
+        oConnector.execute_script('CREATE TABLE DBIndexes ('
+                                  'dbIndexID INTEGER PRIMARY KEY, '
+                                  'taxonID INTEGER, sourceID INTEGER, '
+                                  'taxonIndex TEXT);')
+        sColumns = 'taxonID, sourceID, taxonIndex'
+
+        fStart = perf_counter()
+        for i in range(BULK_ROWS):
+            oConnector.insert_row('DBIndexes', sColumns, (i, 12, str(i),))
+        fRow = perf_counter() - fStart
+
+        fStart = perf_counter()
+        oConnector.insert_rows('DBIndexes', sColumns,
+                               ((i, 12, str(i)) for i in range(BULK_ROWS)))
+        fRows = perf_counter() - fStart
+        del oConnector
+
+    print(f'{"insert_row":<20}{BULK_ROWS:>8}{fRow * 1000:>14.1f} ms')
+    print(f'{"insert_rows":<20}{BULK_ROWS:>8}{fRows * 1000:>14.1f} ms')
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+    bench_indexes()
+    bench_search()
+    bench_bulk()
@@ -19,9 +19,17 @@
 """ The main module for UnitTest. Runs all tests for the program. """
 import unittest
 
+from ut_dwca_import import TestDwCAImport
+from ut_harvester import TestHarvester
+from ut_http_cache import TestHTTPCache
+from ut_name_parser import TestNameParser
 from ut_pep8 import TestPEP8
 from ut_sql import TestSQLite
 from ut_str import TestStr
+from ut_sync_job import TestSyncJob
+from ut_page_cache import TestPageCache
+from ut_taxonomy import TestTaxonomy
+from ut_trigram import TestTrigram
 
 
 def suite():
@@ -33,7 +41,9 @@ def suite():
     oSuite.addTest(unittest.makeSuite(TestPEP8))
     oSuite.addTest(TestStr('test_str_sep_name_taxon'))
     oSuite.addTest(TestSQLite('test_sql_get_columns'))
+    oSuite.addTest(TestSQLite('test_sql_get_sql_text'))
     oSuite.addTest(TestSQLite('test_sql__init__'))
+    oSuite.addTest(TestSQLite('test_sql_profile'))
     oSuite.addTest(TestSQLite('test_sql_execute'))
     oSuite.addTest(TestSQLite('test_sql_insert_row'))
     oSuite.addTest(TestSQLite('test_sql_select'))
@@ -43,6 +53,42 @@ def suite():
     oSuite.addTest(TestSQLite('test_sql_sql_get_id'))
     oSuite.addTest(TestSQLite('test_sql_sql_table_clean'))
     oSuite.addTest(TestSQLite('test_sql_export_db'))
+    oSuite.addTest(TestSQLite('test_sql_migrate_db'))
+    oSuite.addTest(TestSQLite('test_sql_check_connect_db'))
+    oSuite.addTest(TestSQLite('test_sql_snapshot'))
+    oSuite.addTest(TestSQLite('test_sql_transaction'))
+    oSuite.addTest(TestSQLite('test_sql_insert_taxon'))
+    oSuite.addTest(TestSQLite('test_sql_bulk_rows'))
+    oSuite.addTest(TestSQLite('test_sql_connection_pool'))
+    oSuite.addTest(TestSQLite('test_sql_taxon_tree'))
+    oSuite.addTest(TestSQLite('test_sql_taxon_closure'))
+    oSuite.addTest(TestSQLite('test_sql_search_taxa'))
+    oSuite.addTest(TestSQLite('test_sql_match_name'))
+    oSuite.addTest(TestSQLite('test_sql_write_listener'))
+    oSuite.addTest(TestSQLite('test_sql_get_taxon_page'))
+    oSuite.addTest(TestTrigram('test_trigram_get_trigrams'))
+    oSuite.addTest(TestTrigram('test_trigram_index'))
+    oSuite.addTest(TestTaxonomy('test_taxonomy_load'))
+    oSuite.addTest(TestTaxonomy('test_taxonomy_on_write'))
+    oSuite.addTest(TestPageCache('test_page_cache_lru'))
+    oSuite.addTest(TestPageCache('test_page_cache_on_write'))
+    oSuite.addTest(TestPageCache('test_page_cache_persist'))
+    oSuite.addTest(TestDwCAImport('test_dwca_import_rows'))
+    oSuite.addTest(TestDwCAImport('test_dwca_import_run'))
+    oSuite.addTest(TestDwCAImport('test_dwca_import_cli'))
+    oSuite.addTest(TestHarvester('test_harvester_token_bucket'))
+    oSuite.addTest(TestHarvester('test_harvester_get_json'))
+    oSuite.addTest(TestHarvester('test_harvester_get_many'))
+    oSuite.addTest(TestHarvester('test_harvester_map'))
+    oSuite.addTest(TestHarvester('test_harvester_cache'))
+    oSuite.addTest(TestHTTPCache('test_http_cache_store'))
+    oSuite.addTest(TestHTTPCache('test_http_cache_evict'))
+    oSuite.addTest(TestNameParser('test_name_parser_parse_name'))
+    oSuite.addTest(TestNameParser('test_name_parser_corpus'))
+    oSuite.addTest(TestNameParser('test_name_parser_parse_names'))
+    oSuite.addTest(TestSyncJob('test_sync_job_tasks'))
+    oSuite.addTest(TestSyncJob('test_sync_job_resume'))
+    oSuite.addTest(TestSyncJob('test_sync_job_cli'))
 
     return oSuite
 
@@ -0,0 +1,159 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import io
+import logging
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from os import path
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from mli.lib.dwca_import import DwCAImporter, get_taxon_rows
+from mli.lib.snapshot import get_snapshot, load_snapshot
+from mli.lib.sql import SQL
+from mli.sync import import_archive
+
+
+def suite():
+    oSuite = unittest.TestSuite()
+    oSuite.addTest(TestDwCAImport('test_dwca_import_rows'))
+    oSuite.addTest(TestDwCAImport('test_dwca_import_run'))
+    oSuite.addTest(TestDwCAImport('test_dwca_import_cli'))
+
+    return oSuite
+
+
+HEAD = ('taxonID', 'parentNameUsageID', 'acceptedNameUsageID',
+        'scientificName', 'scientificNameAuthorship', 'canonicalName',
+        'taxonRank', 'namePublishedIn', 'taxonomicStatus', 'kingdom',
+        'phylum', 'class', 'order', 'family', 'genus')
+LINEAGE = ('Fungi', 'Ascomycota', 'Dothideomycetes', 'Strigulales',
+           'Strigulaceae')
+ROWS = (
+    # The family is in the database, its parent isn't in the archive.
+    ('8000', '7999', '', 'Strigulaceae Zahlbr.', 'Zahlbr.', 'Strigulaceae',
+     'family', '', 'accepted') + LINEAGE + ('',),
+    ('8001', '8000', '', 'Stubula Auth.', 'Auth.', 'Stubula', 'genus',
+     'J. Stub. 1', 'accepted') + LINEAGE + ('Stubula',),
+    ('8002', '8001', '', 'Stubula alba Auth., 1900', 'Auth., 1900',
+     'Stubula alba', 'species', '', 'accepted') + LINEAGE + ('Stubula',),
+    ('8003', '', '8002', 'Stubula candida Other', 'Other',
+     'Stubula candida', 'species', '', 'homotypic synonym') + LINEAGE +
+    ('Stubula',),
+    ('8004', '7999', '', 'Strigula Fr.', 'Fr.', 'Strigula', 'genus', '',
+     'accepted') + LINEAGE + ('Strigula',),
+    # The informal name is skipped.
+    ('8005', '8001', '', 'Stubula sp.', '', '', 'unranked', '',
+     'accepted') + LINEAGE + ('Stubula',),
+    # The fungus isn't a lichen.
+    ('8006', '9000', '', 'Agaricus L.', 'L.', 'Agaricus', 'genus', '',
+     'accepted', 'Fungi', 'Basidiomycota', 'Agaricomycetes', 'Agaricales',
+     'Agaricaceae', 'Agaricus'),
+    # The accepted taxon of the synonym isn't in the archive.
+    ('8007', '', '9998', 'Stubula rubra X', 'X', 'Stubula rubra',
+     'species', '', 'synonym') + LINEAGE + ('Stubula',),
+)
+
+
+class TestDwCAImport(unittest.TestCase):
+    def setUp(self):
+        """ Creates the database in memory and the archive for test. """
+        logging.disable(logging.CRITICAL)
+        self.oConnector = SQL(':memory:')
+        load_snapshot(self.oConnector, get_snapshot('../db'))
+        self.oDir = tempfile.TemporaryDirectory()
+        self.sArchive = path.join(self.oDir.name, 'backbone.zip')
+        with ZipFile(self.sArchive, 'w', ZIP_DEFLATED) as oZip:
+            oZip.writestr('backbone/Taxon.tsv',
+                          '\n'.join('\t'.join(tRow)
+                                    for tRow in (HEAD,) + ROWS) + '\n')
+            oZip.writestr('backbone/meta.xml', '<archive/>')
+
+    def tearDown(self):
+        """ Deletes the database and the archive. """
+        del self.oConnector
+        self.oDir.cleanup()
+        logging.disable(logging.NOTSET)
+
+    def test_dwca_import_rows(self):
+        """ Check if rows are read from the archive by names of columns. """
+        lRows = list(get_taxon_rows(self.sArchive))
+        self.assertEqual(len(lRows), len(ROWS))
+        self.assertEqual(lRows[2]['scientificNameAuthorship'], 'Auth., 1900')
+        self.assertEqual(lRows[3]['acceptedNameUsageID'], '8002')
+        with self.assertRaises(KeyError):
+            list(get_taxon_rows(self.sArchive, 'Absent.tsv'))
+
+    def test_dwca_import_run(self):
+        """ Check if lichens are loaded with parents and synonyms, and if the
+        second import doesn't duplicate taxa. """
+        iFamilyID = self.oConnector.get_taxon_id('Strigulaceae')
+        lProgress = []
+        oImporter = DwCAImporter(self.oConnector, 2,
+                                 lambda sStage, dStats:
+                                 lProgress.append(sStage))
+        dStats = oImporter.run(self.sArchive)
+        self.assertEqual({sKey: dStats[sKey] for sKey in
+                          ('read', 'lichens', 'staged', 'inserted',
+                           'existing', 'skipped')},
+                         {'read': 8, 'lichens': 7, 'staged': 6,
+                          'inserted': 3, 'existing': 2, 'skipped': 2})
+        self.assertGreater(dStats['rows_per_second'], 0)
+        self.assertGreater(lProgress.count('load'), 3)
+        self.assertEqual(lProgress[-1], 'done')
+
+        iGenusID = self.oConnector.get_taxon_id('Stubula Auth.')
+        iSpeciesID = self.oConnector.get_taxon_id('Stubula alba Auth.')
+        iSynonymID = self.oConnector.get_taxon_id('Stubula candida Other')
+        self.assertEqual(self.oConnector.get_main_taxon(iGenusID)[0],
+                         'Strigulaceae')
+        self.assertEqual(self.oConnector.sql_get_values(
+            'Taxa', 'yearPublishing, namePublishedIn', 'taxonID',
+            (iGenusID,)), [(None, 'J. Stub. 1',)])
+        self.assertEqual(self.oConnector.sql_get_id(
+            'Taxa', 'yearPublishing', 'taxonID', (iSpeciesID,)), 1900)
+        self.assertEqual(self.oConnector.get_tree_status(iSynonymID), 5)
+        self.assertTrue(self.oConnector.is_descendant(iSpeciesID, iFamilyID))
+        self.assertEqual(self.oConnector.sql_get_id(
+            'DBIndexes', 'taxonIndex', 'taxonID, sourceID', (iFamilyID, 12,)),
+            '8000')
+        self.assertFalse(self.oConnector.get_taxon_id('Stubula rubra X'))
+        self.assertFalse(self.oConnector.execute_query(
+            "SELECT name FROM sqlite_master WHERE name='DwCATaxa';")
+            .fetchall())
+
+        iCount = self.oConnector.sql_count('Taxa')
+        dStats = DwCAImporter(self.oConnector).run(self.sArchive)
+        self.assertEqual((dStats['inserted'], dStats['existing']), (0, 5))
+        self.assertEqual(self.oConnector.sql_count('Taxa'), iCount)
+
+    def test_dwca_import_cli(self):
+        """ Check if the command line program reports the result. """
+        with redirect_stdout(io.StringIO()) as oOutput:
+            self.assertEqual(import_archive(self.oConnector, self.sArchive),
+                             0)
+            self.assertEqual(import_archive(self.oConnector,
+                                            f'{self.sArchive}.absent'), 1)
+        self.assertIn('3 taxa inserted, 2 existing', oOutput.getvalue())
+        self.assertIn('rows/s', oOutput.getvalue())
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -0,0 +1,229 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import logging
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter, sleep
+from urllib.parse import parse_qs, urlparse
+
+from mli.lib.harvester import Harvester, TokenBucket
+from mli.lib.http_cache import HTTPCache
+
+
+def suite():
+    oSuite = unittest.TestSuite()
+    oSuite.addTest(TestHarvester('test_harvester_token_bucket'))
+    oSuite.addTest(TestHarvester('test_harvester_get_json'))
+    oSuite.addTest(TestHarvester('test_harvester_get_many'))
+    oSuite.addTest(TestHarvester('test_harvester_map'))
+    oSuite.addTest(TestHarvester('test_harvester_cache'))
+
+    return oSuite
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """ Answers like the GBIF API. The path /species/N gives the taxon N,
+    /flaky/N fails N times before the answer, /busy asks to retry later,
+    /children gives 2500 records by pages, /etag answers 304 to the known
+    ETag, and /once fails after the first answer.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def send_json(self, iStatus, Data, dHeaders=None):
+        bBody = json.dumps(Data).encode()
+        self.send_response(iStatus)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(bBody)))
+        for sHeader, sValue in (dHeaders or {}).items():
+            self.send_header(sHeader, sValue)
+        self.end_headers()
+        self.wfile.write(bBody)
+
+    def do_GET(self):
+        oServer = self.server
+        oURL = urlparse(self.path)
+        dQuery = {sKey: lValues[0]
+                  for sKey, lValues in parse_qs(oURL.query).items()}
+        lPath = oURL.path.strip('/').split('/')
+        with oServer.oLock:
+            oServer.iActive += 1
+            oServer.iMaxActive = max(oServer.iMaxActive, oServer.iActive)
+            oServer.setPorts.add(self.client_address[1])
+            oServer.dHits[oURL.path] = oServer.dHits.get(oURL.path, 0) + 1
+            iHits = oServer.dHits[oURL.path]
+        try:
+            if lPath[0] == 'species':
+                sleep(0.02)
+                self.send_json(200, {'key': int(lPath[1]), 'rank': 'SPECIES'})
+            elif lPath[0] == 'flaky' and iHits <= int(lPath[1]):
+                self.send_json(503, {})
+            elif lPath[0] == 'flaky':
+                self.send_json(200, {'hits': iHits})
+            elif lPath[0] == 'busy' and iHits == 1:
+                self.send_json(429, {}, {'Retry-After': '0.2'})
+            elif lPath[0] == 'busy':
+                self.send_json(200, {'hits': iHits})
+            elif lPath[0] == 'etag' and \
+                    self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+            elif lPath[0] == 'etag':
+                self.send_json(200, {'hits': iHits}, {'ETag': '"v1"'})
+            elif lPath[0] == 'once' and iHits > 1:
+                self.send_json(503, {})
+            elif lPath[0] == 'once':
+                self.send_json(200, {'hits': iHits})
+            elif lPath[0] == 'children':
+                iOffset = int(dQuery['offset'])
+                iLimit = int(dQuery['limit'])
+                lResults = [{'key': i}
+                            for i in range(iOffset, min(iOffset + iLimit,
+                                                        2500))]
+                self.send_json(200, {'results': lResults,
+                                     'endOfRecords': iOffset + iLimit >= 2500})
+            else:
+                self.send_json(404, {})
+        finally:
+            with oServer.oLock:
+                oServer.iActive -= 1
+
+    def log_message(self, sFormat, *args):
+        pass
+
+
+class TestHarvester(unittest.TestCase):
+    def setUp(self):
+        """ Starts the stub server in the thread. """
+        logging.disable(logging.CRITICAL)
+        self.oServer = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.oServer.daemon_threads = True
+        self.oServer.oLock = threading.Lock()
+        self.oServer.iActive = 0
+        self.oServer.iMaxActive = 0
+        self.oServer.setPorts = set()
+        self.oServer.dHits = {}
+        self.oThread = threading.Thread(target=self.oServer.serve_forever,
+                                        daemon=True)
+        self.oThread.start()
+        sHost, iPort = self.oServer.server_address
+        self.sURL = f'http://{sHost}:{iPort}/'
+
+    def tearDown(self):
+        """ Stops the stub server. """
+        self.oServer.shutdown()
+        self.oServer.server_close()
+        logging.disable(logging.NOTSET)
+
+    def test_harvester_token_bucket(self):
+        """ Check if the token bucket limits the rate after the burst. """
+        oBucket = TokenBucket(50, 5)
+        fStart = perf_counter()
+        for _ in range(5):
+            oBucket.acquire()
+        self.assertLess(perf_counter() - fStart, 0.05)
+        for _ in range(10):
+            oBucket.acquire()
+        self.assertGreater(perf_counter() - fStart, 0.18)
+
+        oBucket.pause(0.1)
+        self.assertGreater(oBucket.acquire(), 0.1)
+        self.assertEqual(TokenBucket(0).acquire(), 0.0)
+
+    def test_harvester_get_json(self):
+        """ Check if failed requests are repeated with backoff. """
+        with Harvester(self.sURL, iWorkers=2, fRate=0, iRetries=2,
+                       fBackoff=0.01) as oHarvester:
+            self.assertEqual(oHarvester.get_json('species/7')['key'], 7)
+            self.assertEqual(oHarvester.get_json('flaky/2'), {'hits': 3})
+            self.assertIsNone(oHarvester.get_json('flaky/5'))
+            self.assertIsNone(oHarvester.get_json('absent'))
+
+            fStart = perf_counter()
+            self.assertEqual(oHarvester.get_json('busy'), {'hits': 2})
+            self.assertGreater(perf_counter() - fStart, 0.15)
+            self.assertEqual(oHarvester.get_stats(),
+                             {'requests': 10, 'retried': 5, 'failed': 1})
+
+    def test_harvester_get_many(self):
+        """ Check if all pages of the paged answer are fetched. """
+        with Harvester(self.sURL, fRate=0) as oHarvester:
+            lRecords = oHarvester.get_many('children')
+            self.assertEqual([dRecord['key'] for dRecord in lRecords],
+                             list(range(2500)))
+            self.assertEqual(self.oServer.dHits['/children'], 3)
+
+            lOffsets = [iOffset for iOffset, _ in
+                        oHarvester.get_pages('children', 2000)]
+            self.assertEqual(lOffsets, [2000])
+
+    def test_harvester_map(self):
+        """ Check if map keeps the order of items, limits the number of
+        requests at once, and reuses connections. """
+        with Harvester(self.sURL, iWorkers=4, fRate=0) as oHarvester:
+            def fetch(iKey):
+                if iKey == 13:
+                    raise ValueError
+                return oHarvester.get_json(f'species/{iKey}')['key']
+
+            lResults = list(oHarvester.map(fetch, range(40)))
+            self.assertEqual([Item for Item, _ in lResults], list(range(40)))
+            self.assertEqual([Result for _, Result in lResults],
+                             [i if i != 13 else None for i in range(40)])
+            self.assertLessEqual(self.oServer.iMaxActive, 4)
+            self.assertGreater(self.oServer.iMaxActive, 1)
+            self.assertLessEqual(len(self.oServer.setPorts), 4)
+
+        with Harvester(self.sURL, iWorkers=4, fRate=100,
+                       iBurst=1) as oHarvester:
+            fStart = perf_counter()
+            list(oHarvester.map(lambda i: oHarvester.get_json('flaky/0'),
+                                range(20)))
+            self.assertGreater(perf_counter() - fStart, 0.18)
+
+    def test_harvester_cache(self):
+        """ Check if answers are taken from the cache, revalidated, and
+        used when the server fails. """
+        oCache = HTTPCache()
+        with Harvester(self.sURL, fRate=0, iRetries=0,
+                       oCache=oCache) as oHarvester:
+            self.assertEqual(oHarvester.get_json('etag'), {'hits': 1})
+            self.assertEqual(oHarvester.get_json('etag'), {'hits': 1})
+            self.assertEqual(self.oServer.dHits['/etag'], 1)
+
+            oCache.fTTL = 0
+            self.assertEqual(oHarvester.get_json('etag'), {'hits': 1})
+            self.assertEqual(self.oServer.dHits['/etag'], 2)
+
+            self.assertEqual(oHarvester.get_json('once'), {'hits': 1})
+            self.assertEqual(oHarvester.get_json('once'), {'hits': 1})
+            self.assertEqual(self.oServer.dHits['/once'], 2)
+            self.assertIsNone(oHarvester.get_json('absent'))
+
+            dStats = oCache.get_stats()
+            self.assertEqual((dStats['hits'], dStats['misses'],
+                              dStats['revalidated'], dStats['stale']),
+                             (1, 2, 1, 1))
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -0,0 +1,92 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import unittest
+import zlib
+from os import path
+from tempfile import TemporaryDirectory
+
+from mli.lib.http_cache import HTTPCache, get_cache_key
+
+
+def suite():
+    oSuite = unittest.TestSuite()
+    oSuite.addTest(TestHTTPCache('test_http_cache_store'))
+    oSuite.addTest(TestHTTPCache('test_http_cache_evict'))
+
+    return oSuite
+
+
+class TestHTTPCache(unittest.TestCase):
+    def test_http_cache_store(self):
+        """ Check if answers are kept between runs and expire. """
+        self.assertEqual(get_cache_key('http://a/b', {'q': 'x', 'limit': 5}),
+                         get_cache_key('http://a/b', {'limit': 5, 'q': 'x'}))
+        self.assertEqual(get_cache_key('http://a/b'), 'http://a/b')
+
+        with TemporaryDirectory() as sDir:
+            sFile = path.join(sDir, 'cache.db')
+            oCache = HTTPCache(sFile)
+            self.assertIsNone(oCache.get('key'))
+            self.assertTrue(oCache.put('key', b'{"a": 1}', '"v1"'))
+            self.assertTrue(oCache.put('key', b'{"a": 2}', '"v2"', 'Mon'))
+            oCache.close()
+
+            oCache = HTTPCache(sFile, fTTL=0)
+            self.assertEqual(len(oCache), 1)
+            dEntry = oCache.get('key')
+            self.assertEqual(dEntry['body'], b'{"a": 2}')
+            self.assertEqual((dEntry['etag'], dEntry['last_modified']),
+                             ('"v2"', 'Mon'))
+            self.assertFalse(oCache.is_fresh(dEntry))
+            oCache.fTTL = 60
+            self.assertTrue(oCache.is_fresh(dEntry))
+
+            oCache.count('hits')
+            oCache.count('misses')
+            dStats = oCache.get_stats()
+            self.assertEqual(dStats['hit_rate'], 0.5)
+            self.assertEqual(dStats['size'], oCache.iSize)
+            self.assertGreater(dStats['size'], 0)
+            oCache.clear()
+            self.assertEqual(len(oCache), 0)
+            self.assertEqual(oCache.get_stats()['size'], 0)
+            oCache.close()
+
+    def test_http_cache_evict(self):
+        """ Check if the least recently used answers are evicted. """
+        bBody = bytes(range(256))
+        iSize = len(zlib.compress(bBody))
+        oCache = HTTPCache(iMaxSize=iSize * 4 + iSize // 2)
+        for i in range(4):
+            oCache.put(f'key{i}', bBody)
+        self.assertEqual(oCache.get_stats()['evictions'], 0)
+        oCache.get('key0')
+        oCache.put('key4', bBody)
+
+        self.assertEqual(oCache.iSize, iSize * 4)
+        self.assertIsNotNone(oCache.get('key0'))
+        self.assertIsNotNone(oCache.get('key4'))
+        self.assertIsNone(oCache.get('key1'))
+        self.assertGreater(oCache.get_stats()['evictions'], 0)
+        oCache.close()
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -0,0 +1,135 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import unittest
+from time import perf_counter
+
+from mli.lib.name_parser import parse_name, parse_names
+from mli.lib.snapshot import get_snapshot, load_snapshot
+from mli.lib.sql import SQL
+
+
+def suite():
+    oSuite = unittest.TestSuite()
+    oSuite.addTest(TestNameParser('test_name_parser_parse_name'))
+    oSuite.addTest(TestNameParser('test_name_parser_corpus'))
+    oSuite.addTest(TestNameParser('test_name_parser_parse_names'))
+
+    return oSuite
+
+
+class TestNameParser(unittest.TestCase):
+    def test_name_parser_parse_name(self):
+        """ Check if parts of names are separated correctly. """
+        self.assertEqual(parse_name('Lobaria (Schreb.) Hoffm., 1796'),
+                         {'scientificName': 'Lobaria (Schreb.) Hoffm., 1796',
+                          'canonicalName': 'Lobaria',
+                          'bracketAuthorship': 'Schreb.',
+                          'authorship': 'Hoffm.',
+                          'year': 1796})
+        self.assertEqual(parse_name('Lecanora'),
+                         {'scientificName': 'Lecanora',
+                          'canonicalName': 'Lecanora'})
+
+        dName = parse_name('Xanthoria parietina (L., 1753) Th.Fr. (1860)')
+        self.assertEqual(dName['canonicalName'], 'Xanthoria parietina')
+        self.assertEqual(dName['bracketYear'], 1753)
+        self.assertEqual(dName['year'], 1860)
+
+        dName = parse_name('Acarospora (Xanthothallia) schleicheri A.Massal.')
+        self.assertEqual(dName['canonicalName'], 'Acarospora schleicheri')
+        self.assertEqual(dName['authorship'], 'A.Massal.')
+
+        dName = parse_name('Caloplaca citrina ssp. major Nyl.')
+        self.assertEqual(dName['canonicalName'], 'Caloplaca citrina major')
+        self.assertEqual(dName['rankMarker'], 'subsp.')
+
+        self.assertEqual(parse_name('Biota Cavalier-Smith')['authorship'],
+                         'Cavalier-Smith')
+        self.assertEqual(parse_name('Parmelia van den Boom')['authorship'],
+                         'van den Boom')
+        self.assertEqual(parse_name('Lecanora novae-zelandiae Zahlbr.')
+                         ['canonicalName'], 'Lecanora novae-zelandiae')
+        self.assertIsNone(parse_name('Lecanora sp.'))
+        self.assertIsNone(parse_name('SH1169675.09FU'))
+        self.assertIsNone(parse_name('Usnea subsp. ex'))
+        self.assertIsNone(parse_name(
+            'Lecanora dispersa (Pers.) Sommerf. var. albescens Nyl.'))
+        self.assertIsNone(parse_name('Lecidea fusca Ach., nom. illeg.'))
+        self.assertIsNone(parse_name('Lecidea fusca auct.'))
+        self.assertEqual(parse_name('Usnea hirta L. f.')['authorship'],
+                         'L. f.')
+        self.assertIsNone(parse_name(''))
+
+    def test_name_parser_corpus(self):
+        """ Check if names of taxa of the database are parsed as they are
+        split in the database. """
+        logging.disable(logging.CRITICAL)
+        oConnector = SQL(':memory:')
+        load_snapshot(oConnector, get_snapshot('../db'))
+        # Some rows have the wrong canonical name, they are skipped.
+        lRows = oConnector.execute_query(
+            'SELECT scientificName, canonicalName, authorship FROM Taxa '
+            'WHERE instr(scientificName, canonicalName) = 1;').fetchall()
+        self.assertGreater(len(lRows), 3000)
+
+        fStart = perf_counter()
+        lNames = parse_names([tRow[0] for tRow in lRows])
+        self.assertGreater(len(lRows) / (perf_counter() - fStart), 5000)
+        for tRow, dName in zip(lRows, lNames):
+            sAuthor = dName.get('authorship', '')
+            if 'bracketAuthorship' in dName:
+                sAuthor = f'({dName["bracketAuthorship"]}) {sAuthor}'.strip()
+            self.assertTrue(dName['parsed'])
+            self.assertEqual((dName['canonicalName'], sAuthor),
+                             (tRow[1], tRow[2] or ''))
+
+    def test_name_parser_parse_names(self):
+        """ Check if only names, which aren't parsed, go to the remote
+        parser. """
+        lCalls = []
+
+        def remote(lNames):
+            lCalls.append(lNames)
+            return [{'scientificName': sName, 'canonicalName': 'Lecanora',
+                     'year': '1810', 'parsed': True} for sName in lNames]
+
+        lNames = ['Lecanora Ach.', 'Lecanora sp.', 'Lecanora cf. rupicola',
+                  'Parmelia']
+        lParsed = parse_names(lNames, remote, 1)
+        self.assertEqual(lCalls, [['Lecanora sp.'], ['Lecanora cf. rupicola']])
+        self.assertEqual([dName['canonicalName'] for dName in lParsed],
+                         ['Lecanora', 'Lecanora', 'Lecanora', 'Parmelia'])
+        self.assertEqual(lParsed[1]['year'], 1810)
+        self.assertTrue(all(dName['parsed'] for dName in lParsed))
+
+        def fail(lNames):
+            raise ConnectionError
+
+        logging.disable(logging.CRITICAL)
+        lParsed = parse_names(lNames, fail)
+        self.assertEqual([dName['parsed'] for dName in lParsed],
+                         [True, False, False, True])
+        self.assertEqual(parse_names(lNames)[1],
+                         {'scientificName': 'Lecanora sp.', 'parsed': False})
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -0,0 +1,128 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import unittest
+
+from mli.lib.page_cache import PageCache
+from mli.lib.snapshot import get_snapshot, load_snapshot
+from mli.lib.sql import SQL
+
+
+def suite():
+    oSuite = unittest.TestSuite()
+    oSuite.addTest(TestPageCache('test_page_cache_lru'))
+    oSuite.addTest(TestPageCache('test_page_cache_on_write'))
+    oSuite.addTest(TestPageCache('test_page_cache_persist'))
+
+    return oSuite
+
+
+class TestPageCache(unittest.TestCase):
+    def setUp(self):
+        """ Creates the database in memory for test. """
+        self.oConnector = SQL(':memory:')
+        load_snapshot(self.oConnector, get_snapshot('../db'))
+        logging.disable(logging.CRITICAL)
+        self.iGenusID = self.oConnector.get_taxon_id('Acarospora A.Massal., '
+                                                     '1852')
+        self.iFamilyID = self.oConnector.sql_get_id('TaxonTree',
+                                                    'mainTaxonID', 'taxonID',
+                                                    (self.iGenusID,))
+
+    def tearDown(self):
+        """ Deletes the database. """
+        del self.oConnector
+
+    def test_page_cache_lru(self):
+        """ Check if the least recently used page is dropped. """
+        oPageCache = PageCache(self.oConnector, 2)
+        self.assertIsNone(oPageCache.get(1, 'en'))
+        oPageCache.put(1, 'en', 'page 1')
+        oPageCache.put(1, 'ru', 'страница 1')
+        self.assertEqual(oPageCache.get(1, 'en'), 'page 1')
+        oPageCache.put(2, 'en', 'page 2')
+        self.assertEqual(len(oPageCache), 2)
+        self.assertIsNone(oPageCache.get(1, 'ru'))
+        self.assertEqual(oPageCache.get(2, 'en'), 'page 2')
+        self.assertEqual(oPageCache.dKeys, {1: {(1, 'en')}, 2: {(2, 'en')}})
+
+        dStats = oPageCache.get_stats()
+        self.assertEqual((dStats['hits'], dStats['misses']), (2, 2))
+        self.assertEqual(dStats['hit_rate'], 0.5)
+        self.assertEqual((dStats['size'], dStats['max_size']), (2, 2))
+
+    def test_page_cache_on_write(self):
+        """ Check if pages are dropped after writes of taxa shown on them. """
+        oPageCache = PageCache(self.oConnector)
+        oPageCache.put(self.iFamilyID, 'en', 'family', [self.iGenusID])
+        oPageCache.put(self.iGenusID, 'en', 'genus', [self.iFamilyID])
+        oPageCache.put(3, 'en', 'fungi')
+        oPageCache.put(1, 'en', 'biota')
+
+        self.oConnector.insert_row('Colors', 'colorName', ('check',))
+        self.assertEqual(len(oPageCache), 4)
+        self.assertEqual(oPageCache.iVersion, 0)
+
+        self.oConnector.update('Taxa', 'authorship', 'taxonID',
+                               ('A.Massal.', self.iGenusID,))
+        self.assertIsNone(oPageCache.get(self.iFamilyID, 'en'))
+        self.assertIsNone(oPageCache.get(self.iGenusID, 'en'))
+        self.assertEqual(oPageCache.get(3, 'en'), 'fungi')
+        self.assertEqual(oPageCache.iVersion, 1)
+
+        # The number of descendants of all ancestors is changed.
+        self.oConnector.insert_taxon('Acarospora check', 'Author', 2000, '',
+                                     21, self.iGenusID, 1)
+        self.assertIsNone(oPageCache.get(3, 'en'))
+        self.assertIsNone(oPageCache.get(1, 'en'))
+
+        oPageCache.put(3, 'en', 'fungi')
+        self.oConnector.execute_script('SELECT 1;')
+        self.assertEqual(len(oPageCache), 0)
+
+    def test_page_cache_persist(self):
+        """ Check if pages are kept in the database and dropped there by
+        triggers. """
+        oPageCache = PageCache(self.oConnector, bPersist=True)
+        oPageCache.put(self.iGenusID, 'en', 'genus', [self.iFamilyID])
+        oPageCache.put(3, 'en', 'fungi')
+
+        oPageCache = PageCache(self.oConnector, bPersist=True)
+        self.assertEqual(oPageCache.get(self.iGenusID, 'en'), 'genus')
+        self.assertEqual(oPageCache.get_stats()['hits'], 1)
+
+        # The write goes around SQL, so only triggers drop the pages.
+        self.oConnector.oConnector.execute(
+            'UPDATE Taxa SET authorship=authorship WHERE taxonID=?;',
+            (self.iFamilyID,))
+        oPageCache.clear()
+        self.assertIsNone(oPageCache.get(self.iGenusID, 'en'))
+        self.assertEqual(oPageCache.get(3, 'en'), 'fungi')
+        self.assertEqual(self.oConnector.sql_count('PageCacheDependencies'),
+                         1)
+
+        self.oConnector.oConnector.execute(
+            'DELETE FROM TaxonTree WHERE taxonID=?;', (self.iGenusID,))
+        oPageCache.clear()
+        self.assertIsNone(oPageCache.get(3, 'en'))
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -17,10 +17,17 @@
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from configparser import ConfigParser
+from os import path, utime
+from tempfile import TemporaryDirectory
 from unittest import TestCase
 
+from mli.lib.migration import MIGRATIONS, get_schema_version, \
+    log_duplicate_indexes, migrate_db
+from mli.lib import snapshot
+from mli.lib.snapshot import *
 from mli.lib.sql import *
-from mli.lib.str import str_get_file_patch
 
 
 def type_connector():
@@ -35,7 +42,9 @@ def type_connector():
 def suite():
     oSuite = unittest.TestSuite()
     oSuite.addTest(TestSQLite('test_sql_get_columns'))
+    oSuite.addTest(TestSQLite('test_sql_get_sql_text'))
     oSuite.addTest(TestSQLite('test_sql__init__'))
+    oSuite.addTest(TestSQLite('test_sql_profile'))
     oSuite.addTest(TestSQLite('test_sql_execute'))
     oSuite.addTest(TestSQLite('test_sql_insert_row'))
     oSuite.addTest(TestSQLite('test_sql_select'))
@@ -45,6 +54,19 @@ def suite():
     oSuite.addTest(TestSQLite('test_sql_sql_get_id'))
     oSuite.addTest(TestSQLite('test_sql_sql_table_clean'))
     oSuite.addTest(TestSQLite('test_sql_export_db'))
+    oSuite.addTest(TestSQLite('test_sql_migrate_db'))
+    oSuite.addTest(TestSQLite('test_sql_check_connect_db'))
+    oSuite.addTest(TestSQLite('test_sql_snapshot'))
+    oSuite.addTest(TestSQLite('test_sql_transaction'))
+    oSuite.addTest(TestSQLite('test_sql_insert_taxon'))
+    oSuite.addTest(TestSQLite('test_sql_bulk_rows'))
+    oSuite.addTest(TestSQLite('test_sql_connection_pool'))
+    oSuite.addTest(TestSQLite('test_sql_taxon_tree'))
+    oSuite.addTest(TestSQLite('test_sql_taxon_closure'))
+    oSuite.addTest(TestSQLite('test_sql_search_taxa'))
+    oSuite.addTest(TestSQLite('test_sql_match_name'))
+    oSuite.addTest(TestSQLite('test_sql_write_listener'))
+    oSuite.addTest(TestSQLite('test_sql_get_taxon_page'))
 
     return oSuite
 
@@ -52,14 +74,8 @@ def suite():
 class TestSQLite(TestCase):
     def setUp(self):
         """ Creates temporal object of sqlite3.Connection for test. """
-        file_script = str_get_file_patch('../../mli/db', 'db_structure.sql')
         self.oConnector = SQL(":memory:")
-        sSQL = ''
-        with open(file_script, "r") as f:
-            for s in f:
-                sSQL = sSQL + s
-
-        self.oConnector.execute_script(sSQL)
+        load_snapshot(self.oConnector, get_snapshot('../db'))
         logging.disable(logging.CRITICAL)
 
     def tearDown(self):
@@ -75,6 +91,31 @@ class TestSQLite(TestCase):
         sAnswer = 'check=?'
         self.assertEqual(sString, sAnswer)
 
+    def test_sql_get_sql_text(self):
+        """ Check if texts of queries are built and cached correctly. """
+        sSQL = get_sql_text('SELECT', 'Taxa', 'taxonID',
+                            'scientificName, rankID', 'OR')
+        sAnswer = 'SELECT taxonID FROM Taxa ' \
+                  'WHERE scientificName=? OR rankID=?'
+        self.assertEqual(sSQL, sAnswer)
+        sSQL = get_sql_text('UPDATE', 'Colors', 'colorName, hexCode',
+                            'colorID')
+        sAnswer = 'UPDATE Colors SET colorName=?, hexCode=? WHERE colorID=?'
+        self.assertEqual(sSQL, sAnswer)
+        sSQL = get_sql_text('INSERT', 'Colors', 'colorName, hexCode')
+        sAnswer = 'INSERT INTO Colors (colorName, hexCode) VALUES (?, ?)'
+        self.assertEqual(sSQL, sAnswer)
+        self.assertEqual(get_sql_text('DELETE', 'Colors'),
+                         'DELETE FROM Colors')
+
+        dBefore = self.oConnector.get_cache_stats()
+        for _ in range(10):
+            self.oConnector.get_taxon_id('Fungi')
+        dAfter = self.oConnector.get_cache_stats()
+        self.assertGreaterEqual(dAfter['hits'] - dBefore['hits'], 9)
+        self.assertLessEqual(dAfter['misses'] - dBefore['misses'], 1)
+        self.assertEqual(dAfter['maxsize'], SQL_CACHE_SIZE)
+
     def test_sql__init__(self):
         """ Check if the object being created has an instance of
             the sqlite3.Connection class.
@@ -83,6 +124,40 @@ class TestSQLite(TestCase):
         self.assertEqual(type(oInstanceSQL.oConnector), type_connector(), )
         del oInstanceSQL
 
+    def test_sql_profile(self):
+        """ Check if the profile of connection is applied. """
+        oConfig = ConfigParser()
+        oConfig.read_string('[DB]\nsynchronous = OFF\ncache_size = 100\n')
+        dProfile = get_db_profile(oConfig)
+        self.assertEqual(dProfile['synchronous'], 'OFF')
+        self.assertEqual(dProfile['journal_mode'], 'WAL')
+        self.assertFalse(dProfile['read_only'])
+
+        with TemporaryDirectory() as sDir:
+            sFile = path.join(sDir, 'test.db')
+            oConnector = SQL(sFile, dProfile)
+            oCursor = oConnector.execute_query('PRAGMA journal_mode;')
+            self.assertEqual(oCursor.fetchone()[0], 'wal')
+            oCursor = oConnector.execute_query('PRAGMA user_version;')
+            self.assertEqual(oCursor.fetchone()[0], 0)
+            oCursor = oConnector.execute_query('PRAGMA cache_size;')
+            self.assertEqual(oCursor.fetchone()[0], 100)
+            oConnector.execute_script('CREATE TABLE Check_ (name TEXT);'
+                                      'PRAGMA wal_checkpoint(TRUNCATE);')
+            del oConnector
+
+            dProfile['read_only'] = True
+            oConnector = SQL(sFile, dProfile)
+            self.assertEqual(oConnector.sql_get_all('Check_'), [])
+            self.assertFalse(oConnector.insert_row('Check_', 'name',
+                                                   ('check',)))
+            del oConnector
+
+        dProfile['journal_mode'] = 'WAL; DROP TABLE Taxa'
+        oConnector = SQL(':memory:', dProfile)
+        self.assertEqual(type(oConnector.oConnector), type_connector())
+        del oConnector
+
     def test_sql_execute(self):
         """ Check if execute_script and execute_query work. """
         oCursor = self.oConnector.execute_query('SELECT scientificName '
@@ -118,7 +193,9 @@ class TestSQLite(TestCase):
         lRows = oCursor.fetchall()
         self.assertEqual(lRows[0][0], 'check')
 
-        oCursor = self.oConnector.select('Taxa', 'scientificName')
+        # The index of names isn't covering for two columns, so rows go in
+        # order of taxonID.
+        oCursor = self.oConnector.select('Taxa', 'scientificName, rankID')
         lRows = oCursor.fetchall()
         self.assertEqual(lRows[0][0], 'Biota Cavalier-Smith')
         self.assertEqual(lRows[1][0], 'Eukaryota Tomas')
@@ -131,10 +208,10 @@ class TestSQLite(TestCase):
         self.oConnector.insert_row('Taxa', 'scientificName', ('check',))
         oCursor = self.oConnector.select('Taxa',
                                          'scientificName', sFunc='DISTINCT')
-        lRows = oCursor.fetchall()
-        self.assertEqual(lRows[0][0], 'Biota Cavalier-Smith')
-        self.assertEqual(lRows[1][0], 'Eukaryota Tomas')
-        self.assertEqual(lRows[2][0], 'Fungi')
+        lRows = [tRow[0] for tRow in oCursor.fetchall()]
+        self.assertEqual(lRows.count('check'), 1)
+        self.assertEqual(len(lRows), len(set(lRows)))
+        self.assertIn('Biota Cavalier-Smith', lRows)
 
     def test_sql_delete_row(self):
         """ Check if delete_row work correctly. """
@@ -207,6 +284,449 @@ class TestSQLite(TestCase):
         iDel = self.oConnector.delete_row('Mistake')
         self.assertFalse(iDel)
 
+    def test_sql_migrate_db(self):
+        """ Check if migrate_db creates indexes and remembers the version,
+        and if duplicate rows of DBIndexes are moved, rather than deleted. """
+        self.oConnector = SQL(":memory:")
+        bootstrap_db(self.oConnector, '../db/db_structure.sql')
+        self.assertEqual(get_schema_version(self.oConnector), 0)
+        self.oConnector.insert_rows('DBIndexes',
+                                    'taxonID, sourceID, taxonIndex',
+                                    [(3, 12, '5'), (3, 12, '6')])
+        self.assertEqual(log_duplicate_indexes(self.oConnector), 2)
+        self.assertTrue(migrate_db(self.oConnector))
+        self.assertEqual(self.oConnector.sql_get_values(
+            'DBIndexes', 'taxonIndex', 'taxonID, sourceID', (3, 12,)),
+            [('5',)])
+        self.assertEqual(self.oConnector.execute_query(
+            'SELECT taxonIndex FROM DBIndexesDuplicates '
+            'ORDER BY dbIndexID;').fetchall(), [('5',), ('6',)])
+        iVersion = get_schema_version(self.oConnector)
+        self.assertEqual(iVersion, MIGRATIONS[-1][0])
+        self.assertTrue(migrate_db(self.oConnector))
+
+        lIndexes = self.oConnector.select('sqlite_master', 'name',
+                                          'type', ('index',)).fetchall()
+        lIndexes = [tRow[0] for tRow in lIndexes]
+        self.assertIn('idxTaxaScientificName', lIndexes)
+        self.assertIn('idxDBIndexesTaxonSource', lIndexes)
+
+        oCursor = self.oConnector.execute_query(
+            'EXPLAIN QUERY PLAN SELECT taxonID FROM Taxa '
+            'WHERE scientificName=?', ('Fungi',))
+        self.assertIn('idxTaxaScientificName', oCursor.fetchall()[0][3])
+
+    def test_sql_check_connect_db(self):
+        """ Check if the absent database is created from the dump. """
+        lLines = ['-- A comment\n', '\n', 'BEGIN TRANSACTION;\n',
+                  "INSERT INTO Colors VALUES ('a;\n", "b');\n", 'COMMIT;\n']
+        self.assertEqual(list(get_sql_statements(lLines)),
+                         ["INSERT INTO Colors VALUES ('a;\nb');"])
+        self.assertEqual(get_missing_tables(self.oConnector), [])
+
+        oConnector = SQL(':memory:')
+        self.assertIn('Taxa', get_missing_tables(oConnector))
+        self.assertFalse(check_connect_db(oConnector, '..', 'absent'))
+
+        oConnector = SQL(':memory:')
+        self.assertGreater(check_connect_db(oConnector, '..', 'db'), 0)
+        self.assertEqual(get_missing_tables(oConnector), [])
+        self.assertEqual(oConnector.sql_count('Taxa'),
+                         self.oConnector.sql_count('Taxa'))
+        self.assertEqual(get_schema_version(oConnector), MIGRATIONS[-1][0])
+        self.assertIsNone(check_connect_db(oConnector, '..', 'db'))
+
+    def test_sql_snapshot(self):
+        """ Check if the snapshot is built, rebuilt and loaded. """
+        with TemporaryDirectory() as sDir:
+            sDumpFile = path.join(sDir, STRUCTURE_FILE)
+            with open('../db/db_structure.sql') as fDump:
+                with open(sDumpFile, 'w') as fFile:
+                    fFile.write(fDump.read())
+            self.assertFalse(is_snapshot_fresh(sDumpFile,
+                                               path.join(sDir, 'absent.db')))
+
+            sSnapshotFile = get_snapshot(sDir)
+            self.assertEqual(sSnapshotFile, path.join(sDir, SNAPSHOT_FILE))
+            self.assertTrue(is_snapshot_fresh(sDumpFile, sSnapshotFile))
+            fTime = path.getmtime(sDumpFile) - 10
+            utime(sSnapshotFile, (fTime, fTime))
+            self.assertFalse(is_snapshot_fresh(sDumpFile, sSnapshotFile))
+            self.assertEqual(get_snapshot(sDir), sSnapshotFile)
+            self.assertTrue(is_snapshot_fresh(sDumpFile, sSnapshotFile))
+
+            # The changed script of an applied migration outdates the
+            # snapshot, though the number of the last migration is the same.
+            iDigest = get_snapshot_digest(sDumpFile)
+            tMigration = MIGRATIONS[0]
+            snapshot.MIGRATIONS = ((tMigration[0], tMigration[1],
+                                    f'{tMigration[2]} '),) + MIGRATIONS[1:]
+            try:
+                self.assertNotEqual(get_snapshot_digest(sDumpFile), iDigest)
+                self.assertFalse(is_snapshot_fresh(sDumpFile, sSnapshotFile))
+            finally:
+                snapshot.MIGRATIONS = MIGRATIONS
+            self.assertTrue(is_snapshot_fresh(sDumpFile, sSnapshotFile))
+            self.assertIsNone(get_snapshot_digest(
+                path.join(sDir, 'absent.sql')))
+
+            oConnector = SQL(path.join(sDir, 'mli.db'),
+                             {'journal_mode': 'WAL'})
+            self.assertTrue(load_snapshot(oConnector, sSnapshotFile))
+            self.assertEqual(oConnector.sql_count('Taxa'),
+                             self.oConnector.sql_count('Taxa'))
+            self.assertEqual(get_schema_version(oConnector),
+                             MIGRATIONS[-1][0])
+            oCursor = oConnector.execute_query('PRAGMA journal_mode;')
+            self.assertEqual(oCursor.fetchone()[0], 'wal')
+            del oConnector
+
+        self.assertIsNone(get_snapshot(sDir))
+        self.assertFalse(load_snapshot(SQL(':memory:'), None))
+
+    def test_sql_transaction(self):
+        """ Check if transaction commits and rolls back units of work. """
+        iCount = self.oConnector.sql_count('Colors')
+        with self.oConnector.transaction():
+            self.oConnector.insert_row('Colors', 'colorName', ('check',))
+            self.assertTrue(self.oConnector.oConnector.in_transaction)
+        self.assertFalse(self.oConnector.oConnector.in_transaction)
+        self.assertEqual(self.oConnector.sql_count('Colors'), iCount + 1)
+
+        with self.assertRaises(ValueError):
+            with self.oConnector.transaction():
+                self.oConnector.insert_row('Colors', 'colorName', ('bad',))
+                raise ValueError
+        self.assertEqual(self.oConnector.sql_count('Colors'), iCount + 1)
+
+        with self.oConnector.transaction():
+            self.oConnector.insert_row('Colors', 'colorName', ('outer',))
+            with self.oConnector.transaction():
+                self.oConnector.insert_row('Colors', 'colorName', ('inner',))
+                self.oConnector.insert_row('Mistake', 'colorName', ('x',))
+        self.assertEqual(self.oConnector.sql_count('Colors'), iCount + 2)
+        self.assertFalse(self.oConnector.get_color_id('colorName', 'inner'))
+        self.assertTrue(self.oConnector.get_color_id('colorName', 'outer'))
+
+    def test_sql_insert_taxon(self):
+        """ Check if insert_taxon saves Taxa and TaxonTree together. """
+        migrate_db(self.oConnector)
+        iTaxonID = self.oConnector.insert_taxon('Check', 'Author', 2000, '',
+                                                15, 3, 1)
+        self.assertTrue(iTaxonID)
+        self.assertTrue(self.oConnector.is_descendant(iTaxonID, 1))
+        self.assertEqual(self.oConnector.get_taxon_id('Check Author'),
+                         iTaxonID)
+        lRows = self.oConnector.sql_get_values('TaxonTree', 'mainTaxonID',
+                                               'taxonID', (iTaxonID,))
+        self.assertEqual(lRows[0][0], 3)
+
+        self.oConnector.execute_script('DROP TABLE TaxonTree;')
+        iTaxonID = self.oConnector.insert_taxon('Broken', 'Author', 2000, '',
+                                                15, 3, 1)
+        self.assertFalse(iTaxonID)
+        self.assertFalse(self.oConnector.get_taxon_id('Broken Author'))
+
+    def test_sql_bulk_rows(self):
+        """ Check if insert_rows, update_rows and upsert_rows work. """
+        iCount = self.oConnector.sql_count('Colors')
+        oRows = ((f'color{i}', f'{i:06}') for i in range(2500))
+        iRows, lRanges = self.oConnector.insert_rows('Colors',
+                                                     'colorName, hexCode',
+                                                     oRows, iChunk=1000)
+        self.assertEqual(iRows, 2500)
+        self.assertEqual(len(lRanges), 1)
+        self.assertEqual(lRanges[0][1] - lRanges[0][0] + 1, 2500)
+        self.assertEqual(self.oConnector.sql_count('Colors'), iCount + 2500)
+        iColorID = self.oConnector.get_color_id('colorName', 'color0')
+        self.assertEqual(iColorID, lRanges[0][0])
+
+        oRows = ((f'new{i}', f'color{i}') for i in range(10))
+        iRows = self.oConnector.update_rows('Colors', 'colorLocalName',
+                                            'colorName', oRows, iChunk=3)
+        self.assertEqual(iRows, 10)
+        self.assertTrue(self.oConnector.get_color_id('colorLocalName',
+                                                     'new9'))
+
+        self.assertFalse(self.oConnector.insert_rows('Mistake', 'colorName',
+                                                     [('check',)]))
+        self.assertEqual(self.oConnector.sql_count('Colors'), iCount + 2500)
+
+        migrate_db(self.oConnector)
+        iCount = self.oConnector.sql_count('DBIndexes')
+        lRows = [(1, 12, 'first'), (2, 12, 'second')]
+        iRows = self.oConnector.upsert_rows('DBIndexes',
+                                            'taxonID, sourceID, taxonIndex',
+                                            lRows, 'taxonID, sourceID')
+        self.assertEqual(iRows, 2)
+        lRows = [(1, 12, 'changed')]
+        self.oConnector.upsert_rows('DBIndexes',
+                                    'taxonID, sourceID, taxonIndex',
+                                    lRows, 'taxonID, sourceID')
+        self.assertEqual(self.oConnector.sql_count('DBIndexes'), iCount + 2)
+        sIndex = self.oConnector.sql_get_id('DBIndexes', 'taxonIndex',
+                                            'taxonID, sourceID', (1, 12,))
+        self.assertEqual(sIndex, 'changed')
+
+    def test_sql_connection_pool(self):
+        """ Check if other threads get read-only connections from the pool,
+        and if read_rows reads by the pool in the main thread too. """
+        self.assertEqual(self.oConnector.get_pool_stats(), {})
+
+        def get_count(oConnector):
+            oConnection = oConnector.get_connection()
+            iCount = oConnector.sql_count('Check_')
+            bInsert = oConnector.insert_row('Check_', 'name', ('thread',))
+            oConnector.release_connection()
+            return oConnection, iCount, bInsert
+
+        with TemporaryDirectory() as sDir:
+            sFile = path.join(sDir, 'test.db')
+            oConnector = SQL(sFile, {'journal_mode': 'WAL', 'readers': 2})
+            oConnector.execute_script('CREATE TABLE Check_ (name TEXT);')
+            oConnector.insert_row('Check_', 'name', ('main',))
+
+            with ThreadPoolExecutor(max_workers=4) as oExecutor:
+                lResults = list(oExecutor.map(get_count, [oConnector] * 8))
+
+            for oConnection, iCount, bInsert in lResults:
+                self.assertIsNot(oConnection, oConnector.oConnector)
+                self.assertEqual(iCount, 1)
+                self.assertFalse(bInsert)
+            self.assertEqual(oConnector.sql_count('Check_'), 1)
+
+            dStats = oConnector.get_pool_stats()
+            self.assertEqual(dStats['checkouts'], 8)
+            self.assertLessEqual(dStats['connections'], 2)
+            self.assertEqual(dStats['idle'], dStats['connections'])
+            self.assertIs(oConnector.get_connection(), oConnector.oConnector)
+
+            self.assertEqual(oConnector.read_rows('SELECT name FROM Check_;'),
+                             [('main',)])
+            self.assertFalse(oConnector.read_rows('SELECT * FROM Mistake;'))
+            self.assertEqual(oConnector.get_pool_stats()['checkouts'], 10)
+            self.assertEqual(self.oConnector.read_rows(
+                'SELECT COUNT(*) FROM Taxa WHERE taxonID<?;', (3,)), [(2,)])
+            del oConnector
+
+    def test_sql_taxon_tree(self):
+        """ Check if get_lineage, get_subtree and count_descendants work. """
+        migrate_db(self.oConnector)
+        iTaxonID = self.oConnector.get_taxon_id('Acarospora irregularis',
+                                                'H.Magn.')
+        lLineage = list(self.oConnector.get_lineage(iTaxonID))
+        self.assertEqual(lLineage[0][:3], (1, 'superregio', 'Biota',))
+        self.assertEqual(lLineage[-1][0], iTaxonID)
+        self.assertEqual(lLineage[-1][4], 0)
+        self.assertEqual(lLineage[-2][2], 'Acarospora')
+
+        iGenusID = lLineage[-2][0]
+        lSubtree = list(self.oConnector.get_subtree(iGenusID))
+        self.assertEqual(lSubtree[0][0], iGenusID)
+        self.assertIn(iTaxonID, [tRow[0] for tRow in lSubtree])
+        iCount = self.oConnector.count_descendants(iGenusID)
+        self.assertEqual(iCount, len(lSubtree) - 1)
+        self.assertEqual(self.oConnector.count_descendants(iTaxonID), 0)
+
+        lSubtree = list(self.oConnector.get_subtree(1, 1))
+        self.assertEqual(max(tRow[4] for tRow in lSubtree), 1)
+        lChildren = self.oConnector.get_taxon_children(1, 'действительный')
+        self.assertEqual(len(lSubtree) - 1, len(lChildren))
+        iCount = self.oConnector.sql_count('TaxonTree')
+        self.assertEqual(self.oConnector.count_descendants(1), iCount - 1)
+
+    def test_sql_taxon_closure(self):
+        """ Check if the closure of TaxonTree follows changes of the tree. """
+        migrate_db(self.oConnector)
+        iGenusID = self.oConnector.get_id_by_name_author(('Acarospora',
+                                                          'A.Massal.',))
+        iFamilyID = self.oConnector.get_taxon_id('Acarosporaceae')
+        iKingdomID = self.oConnector.get_taxon_id('Fungi')
+        iSpecies = self.oConnector.count_descendants(iGenusID)
+        iFamily = self.oConnector.count_descendants(iFamilyID)
+        self.assertTrue(iSpecies)
+        self.assertGreater(iFamily, iSpecies)
+        self.assertTrue(self.oConnector.is_descendant(iGenusID, iFamilyID))
+        self.assertFalse(self.oConnector.is_descendant(iFamilyID, iGenusID))
+
+        iTaxonID = self.oConnector.insert_taxon('Acarospora check', 'Author',
+                                                2000, '', 21, iGenusID, 1)
+        self.assertEqual(self.oConnector.count_descendants(iFamilyID),
+                         iFamily + 1)
+        iSynonymID = self.oConnector.insert_taxon('Acarospora synonym', '',
+                                                  2000, '', 21, iTaxonID, 2)
+        self.assertFalse(self.oConnector.is_descendant(iSynonymID, 1))
+
+        self.assertFalse(self.oConnector.set_main_taxon(iFamilyID, iTaxonID))
+        self.assertTrue(self.oConnector.set_main_taxon(iGenusID, iKingdomID))
+        self.assertFalse(self.oConnector.is_descendant(iTaxonID, iFamilyID))
+        self.assertTrue(self.oConnector.is_descendant(iTaxonID, iKingdomID))
+        lLineage = list(self.oConnector.get_lineage(iTaxonID))
+        self.assertEqual(lLineage[-3][0], iKingdomID)
+        self.assertEqual(self.oConnector.count_descendants(iFamilyID),
+                         iFamily - iSpecies - 1)
+
+        self.assertTrue(self.oConnector.set_taxon_status(iGenusID, 2))
+        self.assertFalse(self.oConnector.is_descendant(iTaxonID, iKingdomID))
+        self.assertTrue(self.oConnector.is_descendant(iTaxonID, iGenusID))
+        self.assertTrue(self.oConnector.set_taxon_status(iGenusID, 1))
+        self.assertTrue(self.oConnector.is_descendant(iTaxonID, 1))
+
+        # Deletes go around set_main_taxon, so triggers unlink the taxa.
+        iKingdom = self.oConnector.count_descendants(iKingdomID)
+        self.oConnector.delete_row('Taxa', 'taxonID', (iTaxonID,))
+        self.assertEqual(self.oConnector.count_descendants(iKingdomID),
+                         iKingdom - 1)
+        self.oConnector.delete_row('TaxonTree', 'taxonID', (iTaxonID,))
+        self.oConnector.delete_row('TaxonTree', 'taxonID', (iGenusID,))
+        self.assertFalse(self.oConnector.is_descendant(iGenusID, iKingdomID))
+        self.assertEqual(self.oConnector.count_descendants(iKingdomID),
+                         iKingdom - iSpecies - 2)
+        self.assertEqual(self.oConnector.count_descendants(iGenusID),
+                         iSpecies)
+
+        lClosure = self.oConnector.sql_get_all('TaxonClosure')
+        self.assertTrue(self.oConnector.rebuild_closure())
+        self.assertEqual(sorted(self.oConnector.sql_get_all('TaxonClosure')),
+                         sorted(lClosure))
+
+    def test_sql_search_taxa(self):
+        """ Check if search_taxa finds taxa by beginnings of names. """
+        self.assertEqual(get_fts_query('Acaro irr.'), '"Acaro"* "irr"*')
+        self.assertEqual(get_fts_query('"*'), '')
+        migrate_db(self.oConnector)
+        self.assertEqual(self.oConnector.search_taxa(''), [])
+
+        lRows = self.oConnector.search_taxa('acaro irr')
+        self.assertEqual(lRows[0][1], 'Acarospora irregularis H.Magn.')
+        lRows = self.oConnector.search_taxa('Acarospora', 3)
+        self.assertEqual(len(lRows), 3)
+        self.assertEqual(lRows[0][1], 'Acarospora A.Massal., 1852')
+
+        iTaxonID = self.oConnector.insert_row('Taxa', 'scientificName, '
+                                              'canonicalName, authorship',
+                                              ('Checkia Author', 'Checkia',
+                                               'Author',))
+        self.assertEqual(self.oConnector.search_taxa('check')[0][0],
+                         iTaxonID)
+        self.oConnector.insert_row('LocalNames', 'taxonID, localName',
+                                   (iTaxonID, 'Проверочник',))
+        self.assertEqual(self.oConnector.search_taxa('провер')[0][0],
+                         iTaxonID)
+        self.oConnector.update('Taxa', 'canonicalName', 'taxonID',
+                               ('Renamed', iTaxonID,))
+        self.assertEqual(self.oConnector.search_taxa('renamed')[0][0],
+                         iTaxonID)
+        self.oConnector.delete_row('LocalNames', 'taxonID', (iTaxonID,))
+        self.assertEqual(self.oConnector.search_taxa('провер'), [])
+        self.oConnector.delete_row('Taxa', 'taxonID', (iTaxonID,))
+        self.assertEqual(self.oConnector.search_taxa('renamed'), [])
+
+    def test_sql_match_name(self):
+        """ Check if match_name finds taxa by names with typos. """
+        lMatches = self.oConnector.match_name('Acarospora iregularis', 0.8)
+        self.assertEqual(len(lMatches), 1)
+        self.assertEqual(lMatches[0][1], 'Acarospora irregularis')
+        oIndex = self.oConnector.get_name_index()
+        self.assertEqual(len(oIndex), self.oConnector.sql_count('Taxa'))
+        self.assertIs(self.oConnector.get_name_index(), oIndex)
+
+        self.assertEqual(self.oConnector.match_name('Checkia iregularis',
+                                                    0.8), [])
+        iTaxonID = self.oConnector.insert_row('Taxa', 'canonicalName',
+                                              ('Checkia irregularis',))
+        lMatches = self.oConnector.match_name('Checkia iregularis', 0.8)
+        self.assertEqual(lMatches[0][0], iTaxonID)
+
+        # Written taxa are updated in place, other tables don't touch the
+        # index.
+        dNames = oIndex.dNames
+        self.oConnector.insert_row('DBIndexes', 'taxonID, sourceID, '
+                                   'taxonIndex', (iTaxonID, 12, '1',))
+        self.oConnector.update('Taxa', 'canonicalName', 'taxonID',
+                               ('Checkia regularis', iTaxonID,))
+        self.assertEqual(self.oConnector.match_name('Checkia regularis',
+                                                    0.9)[0][0], iTaxonID)
+        self.assertEqual(self.oConnector.match_name('Checkia irregularis',
+                                                    0.9), [])
+        self.oConnector.delete_row('Taxa', 'taxonID', (iTaxonID,))
+        self.assertEqual(self.oConnector.match_name('Checkia regularis',
+                                                    0.9), [])
+        self.assertIs(oIndex.dNames, dNames)
+
+    def test_sql_write_listener(self):
+        """ Check if write listeners get changed tables and taxa. """
+        self.assertEqual(get_taxon_ids('taxonID, sourceID', (5, 12,)), (5,))
+        self.assertEqual(get_taxon_ids('mainTaxonID, TaxonID', (3, 5,)),
+                         (3, 5,))
+        self.assertEqual(get_taxon_ids('colorName', ('check',)), ())
+
+        lWrites = []
+
+        def on_write(sTable, tTaxonIDs):
+            lWrites.append((sTable, tTaxonIDs,))
+
+        self.oConnector.add_write_listener(on_write)
+        self.oConnector.add_write_listener(on_write)
+        iTaxonID = self.oConnector.insert_row('Taxa', 'canonicalName',
+                                              ('Check',))
+        self.oConnector.update('TaxonTree', 'mainTaxonID', 'taxonID',
+                               (3, iTaxonID,))
+        self.oConnector.delete_row('Taxa', 'taxonID', (iTaxonID,))
+        self.oConnector.insert_rows('Colors', 'colorName', [('check',)])
+        self.oConnector.execute_script('SELECT 1;')
+        self.assertFalse(self.oConnector.insert_row('Mistake', 'name',
+                                                    ('check',)))
+        self.assertEqual(lWrites, [('Taxa', (iTaxonID,)),
+                                   ('TaxonTree', (3, iTaxonID,)),
+                                   ('Taxa', (iTaxonID,)),
+                                   ('Colors', ()),
+                                   (None, ())])
+
+        self.oConnector.remove_write_listener(on_write)
+        self.oConnector.insert_row('Colors', 'colorName', ('check',))
+        self.assertEqual(len(lWrites), 5)
+
+    def test_sql_get_taxon_page(self):
+        """ Check if get_taxon_page gets the whole page of the taxon. """
+        migrate_db(self.oConnector)
+        iGenusID = self.oConnector.get_id_by_name_author(('Acarospora',
+                                                          'A.Massal.',))
+        iTaxonID = self.oConnector.insert_taxon('Acarospora check', 'Author',
+                                                2000, '', 21, iGenusID, 1)
+        iSynonymID = self.oConnector.insert_taxon('Acarospora synonym', '',
+                                                  2000, '', 21, iTaxonID, 2)
+        self.oConnector.insert_row('DBIndexes',
+                                   'taxonID, sourceID, taxonIndex',
+                                   (iTaxonID, 12, '123',))
+
+        dPage = self.oConnector.get_taxon_page(iTaxonID)
+        self.assertEqual(dPage['scientificName'], 'Acarospora check Author')
+        self.assertEqual(dPage['rankName'], 'species')
+        self.assertEqual(dPage['statusID'], 1)
+        self.assertEqual(dPage['mainName'], 'Acarospora')
+        lLineage = [tRow[0] for tRow in
+                    self.oConnector.get_lineage(iTaxonID)][:-1]
+        self.assertEqual([lRow[0] for lRow in dPage['lineage']], lLineage)
+        self.assertEqual(dPage['synonyms'],
+                         [[iSynonymID, 'species', 'Acarospora synonym', '']])
+        self.assertEqual(dPage['children'], [])
+        self.assertEqual(dPage['descendants'], 0)
+        self.assertEqual(dPage['links'][0][0], 'GBIF')
+        self.assertEqual(dPage['links'][0][2], '123')
+
+        dPage = self.oConnector.get_taxon_page(iGenusID)
+        lChildren = self.oConnector.get_taxon_children(iGenusID,
+                                                       'действительный')
+        self.assertEqual([lRow[1:] for lRow in dPage['children']],
+                         [list(tRow) for tRow in lChildren])
+        self.assertEqual(dPage['descendants'], len(lChildren))
+
+        dPage = self.oConnector.get_taxon_page(iSynonymID)
+        self.assertEqual(dPage['statusID'], 2)
+        self.assertEqual(dPage['mainTaxonID'], iTaxonID)
+        self.assertIsNone(self.oConnector.get_taxon_page(0))
+
 
 if __name__ == '__main__':
     runner = unittest.TextTestRunner()
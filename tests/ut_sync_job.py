@@ -0,0 +1,251 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import io
+import json
+import logging
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import path
+from string import ascii_lowercase
+from urllib.parse import parse_qs, urlparse
+
+from mli.lib.gbif_parser import GBIF_SOURCE, gbif_sync
+from mli.lib.harvester import Harvester
+from mli.lib.snapshot import get_snapshot, load_snapshot
+from mli.lib.sql import SQL
+from mli.lib.sync_job import PHASES, create_job, get_last_job
+from mli.sync import main
+
+
+def suite():
+    oSuite = unittest.TestSuite()
+    oSuite.addTest(TestSyncJob('test_sync_job_tasks'))
+    oSuite.addTest(TestSyncJob('test_sync_job_resume'))
+    oSuite.addTest(TestSyncJob('test_sync_job_cli'))
+
+    return oSuite
+
+
+def get_stub_name(i):
+    """ Makes the name of the genus without digits from its number. """
+    sName = ''
+    for _ in range(3):
+        i, iLetter = divmod(i, 26)
+        sName = ascii_lowercase[iLetter] + sName
+    return f'Stub{sName}'
+
+
+class GBIFHandler(BaseHTTPRequestHandler):
+    """ Answers like the GBIF API for the kingdom Fungi with the key 5. It
+    has 1500 children, and pages after the first one fail, while the server
+    has the flag bFail.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def send_json(self, iStatus, Data):
+        bBody = json.dumps(Data).encode()
+        self.send_response(iStatus)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(bBody)))
+        self.end_headers()
+        self.wfile.write(bBody)
+
+    def do_GET(self):
+        oServer = self.server
+        oURL = urlparse(self.path)
+        dQuery = {sKey: lValues[0]
+                  for sKey, lValues in parse_qs(oURL.query).items()}
+        iOffset = int(dQuery.get('offset', 0))
+        iLimit = int(dQuery.get('limit', 20))
+        sHit = f'{oURL.path}?{iOffset}'
+        with oServer.oLock:
+            oServer.dHits[sHit] = oServer.dHits.get(sHit, 0) + 1
+
+        if oURL.path == '/species/5':
+            self.send_json(200, {'key': 5, 'rank': 'KINGDOM',
+                                 'scientificName': 'Fungi R.T.Moore, 1980',
+                                 'synonym': False,
+                                 'taxonomicStatus': 'ACCEPTED',
+                                 'parent': 'Eukaryota'})
+        elif oURL.path == '/species/5/children' and oServer.bFail and \
+                iOffset:
+            self.send_json(503, {})
+        elif oURL.path == '/species/5/children':
+            lResults = [{'key': 1000 + i, 'rank': 'GENUS',
+                         'scientificName': f'{get_stub_name(i)} Auth., 1900',
+                         'synonym': False, 'taxonomicStatus': 'ACCEPTED',
+                         'parent': 'Fungi'}
+                        for i in range(iOffset, min(iOffset + iLimit, 1500))]
+            self.send_json(200, {'results': lResults,
+                                 'endOfRecords': iOffset + iLimit >= 1500})
+        elif oURL.path == '/species/5/synonyms':
+            lResults = [{'key': 10 + i, 'rank': 'KINGDOM',
+                         'scientificName': f'{sName} Auth.',
+                         'synonym': True,
+                         'taxonomicStatus': 'HOMOTYPIC_SYNONYM',
+                         'accepted': 'Fungi R.T.Moore, 1980',
+                         'parent': 'Eukaryota'}
+                        for i, sName in enumerate(('Mycota', 'Fungaceae'))]
+            self.send_json(200, {'results': lResults, 'endOfRecords': True})
+        else:
+            self.send_json(404, {})
+
+    def log_message(self, sFormat, *args):
+        pass
+
+
+class TestSyncJob(unittest.TestCase):
+    def setUp(self):
+        """ Creates the database in memory and starts the stub server. """
+        logging.disable(logging.CRITICAL)
+        self.oConnector = SQL(':memory:')
+        load_snapshot(self.oConnector, get_snapshot('../db'))
+        self.oServer = ThreadingHTTPServer(('127.0.0.1', 0), GBIFHandler)
+        self.oServer.daemon_threads = True
+        self.oServer.oLock = threading.Lock()
+        self.oServer.dHits = {}
+        self.oServer.bFail = False
+        self.oThread = threading.Thread(target=self.oServer.serve_forever,
+                                        daemon=True)
+        self.oThread.start()
+        sHost, iPort = self.oServer.server_address
+        self.sURL = f'http://{sHost}:{iPort}/'
+
+    def tearDown(self):
+        """ Stops the stub server and deletes the database. """
+        self.oServer.shutdown()
+        self.oServer.server_close()
+        del self.oConnector
+        logging.disable(logging.NOTSET)
+
+    def get_stub_taxa(self):
+        """ Gives names of children, which were saved from the stub. """
+        oCursor = self.oConnector.execute_query(
+            "SELECT Taxa.canonicalName FROM Taxa "
+            "JOIN TaxonTree ON TaxonTree.taxonID=Taxa.taxonID "
+            "WHERE Taxa.canonicalName LIKE 'Stub%' AND "
+            "TaxonTree.mainTaxonID=3;")
+        return [tRow[0] for tRow in oCursor]
+
+    def test_sync_job_tasks(self):
+        """ Check if the job has tasks for all accepted taxa of the rank, and
+        if it gives only unfinished tasks. """
+        iGenus = self.oConnector.get_rank_id('rankName', 'genus')
+        iCount = self.oConnector.execute_query(
+            'SELECT COUNT(*) FROM Taxa '
+            'JOIN TaxonTree ON TaxonTree.taxonID=Taxa.taxonID '
+            'WHERE Taxa.rankID=? AND TaxonTree.statusID=1;',
+            (iGenus,)).fetchone()[0]
+        oJob = create_job(self.oConnector, GBIF_SOURCE, iGenus)
+        self.assertEqual(get_last_job(self.oConnector, GBIF_SOURCE).iJobID,
+                         oJob.iJobID)
+        self.assertIsNone(get_last_job(self.oConnector, GBIF_SOURCE, 3))
+
+        lTasks = list(oJob.get_tasks())
+        self.assertEqual(len(lTasks), iCount)
+        self.assertEqual(len({tTask[0] for tTask in lTasks}), iCount)
+        self.assertEqual(set(lTasks[0][2]), set(PHASES))
+        self.assertEqual(lTasks[0][2]['children'], (None, 0))
+
+        iTaxonID = lTasks[0][0]
+        oJob.set_key(iTaxonID, 42)
+        oJob.save_task(iTaxonID, 'taxon')
+        oJob.save_task(iTaxonID, 'children', 2000, False)
+        oJob.fail_taxon(lTasks[1][0])
+        dTasks = next(oJob.get_tasks())[2]
+        self.assertEqual(dTasks, {'children': ('42', 2000),
+                                  'synonyms': ('42', 0)})
+        self.assertEqual(len(list(oJob.get_tasks(False))), iCount - 1)
+
+        dProgress = oJob.get_progress()
+        self.assertEqual(dProgress['taxon'],
+                         {'pending': iCount - 2, 'done': 1, 'failed': 1,
+                          'total': iCount})
+        self.assertFalse(oJob.finish())
+
+    def test_sync_job_resume(self):
+        """ Check if the interrupted job continues from the saved offset, and
+        the data of pages isn't saved twice. """
+        iSynonyms = len(self.oConnector.get_synonyms(3))
+        self.oServer.bFail = True
+        oJob = create_job(self.oConnector, GBIF_SOURCE, 3)
+        with Harvester(self.sURL, iWorkers=2, fRate=0,
+                       iRetries=0) as oHarvester, \
+                redirect_stdout(io.StringIO()):
+            self.assertFalse(gbif_sync(self.oConnector, oJob, oHarvester))
+
+        self.assertEqual(len(self.get_stub_taxa()), 1000)
+        self.assertEqual(self.oConnector.get_name_author(3)[0],
+                         ('Fungi', 'R.T.Moore',))
+        self.assertEqual(len(self.oConnector.get_synonyms(3)),
+                         iSynonyms + 2)
+        dTasks = next(oJob.get_tasks())[2]
+        self.assertEqual(dTasks, {'children': ('5', 1000)})
+
+        self.oServer.bFail = False
+        self.oServer.dHits = {}
+        oJob = get_last_job(self.oConnector, GBIF_SOURCE)
+        with Harvester(self.sURL, iWorkers=2, fRate=0,
+                       iRetries=0) as oHarvester, \
+                redirect_stdout(io.StringIO()):
+            self.assertTrue(gbif_sync(self.oConnector, oJob, oHarvester))
+
+        self.assertEqual(self.oServer.dHits,
+                         {'/species/5/children?1000': 1})
+        lNames = self.get_stub_taxa()
+        self.assertEqual(len(lNames), 1500)
+        self.assertEqual(len(set(lNames)), 1500)
+        self.assertEqual(self.oConnector.sql_get_id(
+            'DBIndexes', 'taxonIndex', 'taxonID, sourceID',
+            (self.oConnector.get_taxon_id('Stubcfr Auth.'), 12,)), '2499')
+        self.assertEqual(oJob.get_progress()['children']['done'], 1)
+        self.assertIsNone(get_last_job(self.oConnector, GBIF_SOURCE))
+
+    def test_sync_job_cli(self):
+        """ Check if the command line program refuses to start without the
+        job. """
+        with redirect_stdout(io.StringIO()) as oOutput:
+            self.assertEqual(main(['gbif', '--db', ':memory:']), 2)
+            self.assertEqual(main(['gbif', '--resume', '--db', ':memory:']),
+                             2)
+            self.assertEqual(main(['gbif', '--rank', 'none',
+                                   '--db', ':memory:']), 2)
+        self.assertIn('There is no unfinished job.', oOutput.getvalue())
+
+        # The job isn't created, if the database refuses it.
+        with tempfile.TemporaryDirectory() as sDir:
+            sDBPath = path.join(sDir, 'mli.db')
+            oConnector = SQL(sDBPath)
+            load_snapshot(oConnector, get_snapshot('../db'))
+            oConnector.execute_script(
+                'CREATE TRIGGER NoJobs BEFORE INSERT ON SyncJobs '
+                "BEGIN SELECT RAISE(ABORT, 'no jobs'); END;")
+            del oConnector
+            with redirect_stdout(io.StringIO()) as oOutput:
+                self.assertEqual(main(['gbif', '--rank', 'genus',
+                                       '--db', sDBPath]), 2)
+        self.assertIn('The job can not be created.', oOutput.getvalue())
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
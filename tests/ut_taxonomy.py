@@ -0,0 +1,106 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import unittest
+
+from mli.lib.snapshot import get_snapshot, load_snapshot
+from mli.lib.sql import SQL
+
+
+def suite():
+    oSuite = unittest.TestSuite()
+    oSuite.addTest(TestTaxonomy('test_taxonomy_load'))
+    oSuite.addTest(TestTaxonomy('test_taxonomy_on_write'))
+
+    return oSuite
+
+
+class TestTaxonomy(unittest.TestCase):
+    def setUp(self):
+        """ Creates the database in memory for test. """
+        self.oConnector = SQL(':memory:')
+        load_snapshot(self.oConnector, get_snapshot('../db'))
+        logging.disable(logging.CRITICAL)
+        self.oTaxonomy = self.oConnector.get_taxonomy()
+
+    def tearDown(self):
+        """ Deletes the database. """
+        del self.oTaxonomy
+        del self.oConnector
+
+    def test_taxonomy_load(self):
+        """ Check if the index gives the same data as the database. """
+        self.assertEqual(len(self.oTaxonomy),
+                         self.oConnector.sql_count('Taxa'))
+        self.assertIs(self.oConnector.get_taxonomy(), self.oTaxonomy)
+
+        iTaxonID = self.oTaxonomy.get_id('Acarospora A.Massal., 1852')
+        self.assertEqual(iTaxonID,
+                         self.oConnector.get_taxon_id('Acarospora A.Massal., '
+                                                      '1852'))
+        self.assertEqual(self.oTaxonomy.get_names(iTaxonID),
+                         ('Acarospora A.Massal., 1852', 'Acarospora',
+                          'A.Massal.',))
+        self.assertEqual(self.oTaxonomy.get_rank(iTaxonID)[1], 'genus')
+        self.assertEqual(self.oTaxonomy.get_status(iTaxonID)[0], 1)
+        sFamily = self.oTaxonomy.get_names(
+            self.oTaxonomy.get_parent(iTaxonID))[1]
+        self.assertEqual(sFamily, 'Acarosporaceae')
+
+        lChildren = self.oConnector.get_taxon_children(iTaxonID,
+                                                       'действительный')
+        lNames = [self.oTaxonomy.get_names(iChildID)[1]
+                  for iChildID in self.oTaxonomy.get_children(iTaxonID)]
+        self.assertEqual(lNames, [tRow[1] for tRow in lChildren])
+        self.assertEqual(self.oTaxonomy.get_synonyms(iTaxonID), [])
+        self.assertEqual(self.oTaxonomy.get_roots(),
+                         [self.oTaxonomy.get_id('Biota Cavalier-Smith')])
+
+        self.assertIsNone(self.oTaxonomy.get_id('Mistake'))
+        self.assertIsNone(self.oTaxonomy.get_names(0))
+        self.assertEqual(self.oTaxonomy.get_children(0), [])
+
+        dMemory = self.oTaxonomy.get_memory()
+        self.assertEqual(dMemory['taxa'], len(self.oTaxonomy))
+        self.assertGreater(dMemory['per_taxon'], 0)
+
+    def test_taxonomy_on_write(self):
+        """ Check if the index is loaded again after writes. """
+        iGenusID = self.oTaxonomy.get_id('Acarospora A.Massal., 1852')
+        iCount = len(self.oTaxonomy.get_children(iGenusID))
+        iTaxonID = self.oConnector.insert_taxon('Acarospora check', 'Author',
+                                                2000, '', 21, iGenusID, 1)
+        self.assertFalse(self.oTaxonomy.bValid)
+        self.assertEqual(len(self.oTaxonomy.get_children(iGenusID)),
+                         iCount + 1)
+        self.assertEqual(self.oTaxonomy.get_id('Acarospora check Author'),
+                         iTaxonID)
+
+        iSynonymID = self.oConnector.insert_taxon('Acarospora synonym', '',
+                                                  2000, '', 21, iTaxonID, 2)
+        self.assertEqual(self.oTaxonomy.get_synonyms(iTaxonID), [iSynonymID])
+        self.assertEqual(self.oTaxonomy.get_parent(iSynonymID), iTaxonID)
+
+        self.oConnector.insert_row('Colors', 'colorName', ('check',))
+        self.assertTrue(self.oTaxonomy.bValid)
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -0,0 +1,74 @@
+#     This code is a part of program Manual Lichen identification
+#     Copyright (C) 2022 contributors Manual Lichen identification
+#     The full list is available at the link
+#     https://github.com/tagezi/mli/blob/master/contributors.txt
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import unittest
+
+from mli.lib.trigram import TrigramIndex, get_similarity, get_trigrams
+
+
+def suite():
+    oSuite = unittest.TestSuite()
+    oSuite.addTest(TestTrigram('test_trigram_get_trigrams'))
+    oSuite.addTest(TestTrigram('test_trigram_index'))
+
+    return oSuite
+
+
+class TestTrigram(unittest.TestCase):
+    def test_trigram_get_trigrams(self):
+        """ Check if get_trigrams and get_similarity work correctly. """
+        self.assertEqual(get_trigrams('Ab'), {'  a', ' ab', 'ab '})
+        self.assertEqual(get_trigrams('Vĕzda'), get_trigrams('vezda'))
+        self.assertEqual(get_trigrams('(Zahlbr.)'), get_trigrams('Zahlbr'))
+        self.assertEqual(get_trigrams(''), set())
+
+        self.assertEqual(get_similarity('Lecanora', 'lecanora'), 1.0)
+        self.assertEqual(get_similarity('Lecanora', 'Parmelia'), 0.0)
+        fSimilarity = get_similarity('Acarospora irregularis',
+                                     'Acarospora iregularis')
+        self.assertGreater(fSimilarity, 0.8)
+
+    def test_trigram_index(self):
+        """ Check if TrigramIndex finds names with typos. """
+        oIndex = TrigramIndex()
+        oIndex.add(1, 'Acarospora irregularis')
+        oIndex.add(2, 'Acarospora hilaris')
+        oIndex.add(3, 'Lecanora')
+        self.assertEqual(len(oIndex), 3)
+
+        lMatches = oIndex.match('Acarospora iregularis', 0.5)
+        self.assertEqual(lMatches[0][:2], (1, 'Acarospora irregularis',))
+        self.assertEqual(len(lMatches), 2)
+        self.assertEqual(oIndex.match('Acarospora iregularis', 0.8, 5),
+                         lMatches[:1])
+        self.assertEqual(oIndex.match('Parmelia'), [])
+        self.assertEqual(oIndex.match(''), [])
+
+        oIndex.add(3, 'Lecanorra')
+        self.assertEqual(oIndex.match('Lecanorra')[0][2], 1.0)
+        oIndex.remove(3)
+        oIndex.remove(4)
+        self.assertEqual(oIndex.match('Lecanorra'), [])
+        self.assertEqual(len(oIndex), 2)
+        oIndex.clear()
+        self.assertEqual(len(oIndex), 0)
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())